@@ -13,6 +13,8 @@
 # limitations under the License.
 
 # [START bigquery_remote_function_document]
+from concurrent import futures
+import threading
 import urllib.request
 
 import flask
@@ -24,6 +26,44 @@ _PROJECT_ID = "YOUR_PROJECT_ID"
 _LOCATION = "us"  # Change to "eu"
 _PROCESSOR_ID = "YOUR_PROCESSOR_ID"
 
+# Rows downloaded and processed at the same time. Keep this within the
+# processor's requests per minute quota.
+_MAX_WORKERS = 16
+_DOWNLOAD_TIMEOUT = 60
+
+# The client is created once per instance and shared by all requests.
+_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> documentai.DocumentProcessorServiceClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = documentai.DocumentProcessorServiceClient(
+                client_options=ClientOptions(
+                    api_endpoint=f"{_LOCATION}-documentai.googleapis.com"
+                )
+            )
+        return _client
+
+
+def _process(url: str, content_type: str) -> dict:
+    """Downloads a document and returns its text, or the error for the row."""
+    try:
+        with urllib.request.urlopen(url, timeout=_DOWNLOAD_TIMEOUT) as response:
+            content = response.read()
+        client = _get_client()
+        results = client.process_document(
+            {
+                "name": client.processor_path(_PROJECT_ID, _LOCATION, _PROCESSOR_ID),
+                "raw_document": {"content": content, "mime_type": content_type},
+            }
+        )
+        return {"text": results.document.text}
+    except Exception as e:  # Check error message if GoogleAPIException
+        return {"errorMessage": str(e)}
+
 
 @functions_framework.http
 def document_ocr(request: flask.Request) -> flask.Response:
@@ -32,6 +72,9 @@ def document_ocr(request: flask.Request) -> flask.Response:
     For complete Document AI use cases:
     https://cloud.google.com/document-ai/docs/samples/documentai-process-ocr-document
 
+    Rows are processed concurrently. A row that fails gets an `errorMessage`
+    reply instead of failing the whole batch.
+
     Args:
         request: HTTP request from BigQuery
         https://cloud.google.com/bigquery/docs/reference/standard-sql/remote-functions#input_format
@@ -41,26 +84,14 @@ def document_ocr(request: flask.Request) -> flask.Response:
         https://cloud.google.com/bigquery/docs/reference/standard-sql/remote-functions#output_format
     """
     try:
-        client = documentai.DocumentProcessorServiceClient(
-            client_options=ClientOptions(
-                api_endpoint=f"{_LOCATION}-documentai.googleapis.com"
-            )
-        )
-        processor_name = client.processor_path(_PROJECT_ID, _LOCATION, _PROCESSOR_ID)
         calls = request.get_json()["calls"]
-        replies = []
-        for call in calls:
-            content = urllib.request.urlopen(call[0]).read()
-            content_type = call[1]
-            results = client.process_document(
-                {
-                    "name": processor_name,
-                    "raw_document": {"content": content, "mime_type": content_type},
-                }
-            )
-            replies.append({"text": results.document.text})
+        urls = [call[0] for call in calls]
+        content_types = [call[1] for call in calls]
+        with futures.ThreadPoolExecutor(_MAX_WORKERS) as executor:
+            # map returns the replies in the order of the rows.
+            replies = list(executor.map(_process, urls, content_types))
         return flask.make_response(flask.jsonify({"replies": replies}))
-    except Exception as e:  # Check error message if GoogleAPIException
+    except Exception as e:
         return flask.make_response(flask.jsonify({"errorMessage": str(e)}), 400)
 
 
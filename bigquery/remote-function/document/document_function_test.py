@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 from unittest import mock
 
 import flask
@@ -40,6 +41,23 @@ def app() -> flask.Flask:
     return flask.Flask(__name__)
 
 
+@pytest.fixture(autouse=True)
+def reset_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(document_function, "_client", None)
+
+
+def fake_urlopen(url: str, timeout: float) -> io.BytesIO:
+    if url.endswith("missing"):
+        raise OSError("HTTP Error 404: Not Found")
+    return io.BytesIO(url.rsplit("/", 1)[-1].encode())
+
+
+def fake_process_document(request: dict) -> documentai.ProcessResponse:
+    """Returns the document's content as its text."""
+    text = request["raw_document"]["content"].decode()
+    return documentai.ProcessResponse({"document": {"text": text}})
+
+
 @mock.patch("document_function.urllib.request")
 @mock.patch("document_function.documentai")
 def test_document_function(
@@ -47,13 +65,8 @@ def test_document_function(
     mock_request: object,
     app: flask.Flask,
 ) -> None:
-    mock_request.urlopen = mock.Mock(read=mock.Mock(return_value=b"filedata"))
-    process_document_mock = mock.Mock(
-        side_effect=[
-            documentai.ProcessResponse({"document": {"text": "apple"}}),
-            documentai.ProcessResponse({"document": {"text": "banana"}}),
-        ]
-    )
+    mock_request.urlopen = mock.MagicMock(side_effect=fake_urlopen)
+    process_document_mock = mock.Mock(side_effect=fake_process_document)
     mock_documentai.DocumentProcessorServiceClient = mock.Mock(
         return_value=mock.Mock(process_document=process_document_mock)
     )
@@ -63,6 +76,36 @@ def test_document_function(
         assert response.get_json() == _BIGQUERY_RESPONSE_JSON
 
 
+@mock.patch("document_function.urllib.request")
+@mock.patch("document_function.documentai")
+def test_document_function_many_rows(
+    mock_documentai: object,
+    mock_request: object,
+    app: flask.Flask,
+) -> None:
+    mock_request.urlopen = mock.MagicMock(side_effect=fake_urlopen)
+    mock_documentai.DocumentProcessorServiceClient = mock.Mock(
+        return_value=mock.Mock(
+            process_document=mock.Mock(side_effect=fake_process_document)
+        )
+    )
+    calls = [
+        [f"https://storage.googleapis.com/bucket/doc{i}", "application/pdf"]
+        for i in range(50)
+    ]
+    calls[7][0] = "https://storage.googleapis.com/bucket/missing"
+    with app.test_request_context(json={"calls": calls}):
+        response = document_function.document_ocr(flask.request)
+        replies = response.get_json()["replies"]
+    assert response.status_code == 200
+    assert "404" in replies[7]["errorMessage"]
+    assert [reply.get("text") for reply in replies] == [
+        None if i == 7 else f"doc{i}" for i in range(50)
+    ]
+    # The client is created once and shared by all rows.
+    assert mock_documentai.DocumentProcessorServiceClient.call_count == 1
+
+
 @mock.patch("document_function.urllib.request")
 @mock.patch("document_function.documentai")
 def test_document_function_error(
@@ -70,12 +113,20 @@ def test_document_function_error(
     mock_request: object,
     app: flask.Flask,
 ) -> None:
-    mock_request.urlopen = mock.Mock(read=mock.Mock(return_value=b"filedata"))
+    mock_request.urlopen = mock.MagicMock(side_effect=fake_urlopen)
     process_document_mock = mock.Mock(side_effect=Exception("API error"))
     mock_documentai.DocumentProcessorServiceClient = mock.Mock(
         return_value=mock.Mock(process_document=process_document_mock)
     )
     with app.test_request_context(json=_BIGQUERY_REQUEST_JSON):
+        response = document_function.document_ocr(flask.request)
+        assert response.status_code == 200
+        assert response.get_json() == {
+            "replies": [{"errorMessage": "API error"}, {"errorMessage": "API error"}]
+        }
+
+
+def test_document_function_invalid_request(app: flask.Flask) -> None:
+    with app.test_request_context(json={}):
         response = document_function.document_ocr(flask.request)
         assert response.status_code == 400
-        assert "API error" in str(response.get_data())
@@ -15,6 +15,9 @@
 # [START bigquery_remote_function_translation]
 from __future__ import annotations
 
+import collections
+from concurrent import futures
+import threading
 
 import flask
 import functions_framework
@@ -24,6 +27,17 @@ from google.cloud import translate
 # Construct a Translation Client object
 translate_client = translate.TranslationServiceClient()
 
+# Limits of a single translate_text request.
+MAX_CODEPOINTS_PER_REQUEST = 30000
+MAX_SEGMENTS_PER_REQUEST = 1024
+MAX_CONCURRENT_REQUESTS = 8
+
+# Translations kept across invocations of this instance, keyed by
+# (text, target language code), least recently used first.
+CACHE_SIZE = 100000
+_cache: collections.OrderedDict[tuple[str, str], str] = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
 
 # Register an HTTP function with the Functions Framework
 @functions_framework.http
@@ -84,11 +98,37 @@ def extract_project_from_caller(job: str) -> str:
     return path[4] if len(path) > 4 else None
 
 
+def split_requests(texts: list[str]) -> list[list[str]]:
+    """Splits texts into chunks within the per-request limits of the API.
+
+    A text longer than MAX_CODEPOINTS_PER_REQUEST is sent on its own.
+    """
+    chunks: list[list[str]] = []
+    chunk: list[str] = []
+    codepoints = 0
+    for text in texts:
+        if chunk and (
+            len(chunk) == MAX_SEGMENTS_PER_REQUEST
+            or codepoints + len(text) > MAX_CODEPOINTS_PER_REQUEST
+        ):
+            chunks.append(chunk)
+            chunk, codepoints = [], 0
+        chunk.append(text)
+        codepoints += len(text)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
 def translate_text(
     calls: list[str], project: str, target_language_code: str
 ) -> list[str]:
     """Translates the input text to specified language using Translation API.
 
+    Each distinct text is translated once, and only if it is not cached from
+    a previous call. The remaining texts are sent in concurrent requests
+    within the limits of the API.
+
     Args:
         calls: a list of input text to translate.
         project: the project where the translate service will be used.
@@ -102,18 +142,42 @@ def translate_text(
     """
     location = "<your location>"
     parent = f"projects/{project}/locations/{location}"
-    # Call the Translation API, passing a list of values and the target language
-    response = translate_client.translate_text(
-        request={
-            "parent": parent,
-            "contents": calls,
-            "target_language_code": target_language_code,
-            "mime_type": "text/plain",
-        },
-        retry=Retry(),
-    )
-    # Convert the translated value to a list and return it
-    return [translation.translated_text for translation in response.translations]
+
+    translations = {}
+    with _cache_lock:
+        for text in dict.fromkeys(calls):
+            key = (text, target_language_code)
+            if key in _cache:
+                _cache.move_to_end(key)
+                translations[text] = _cache[key]
+    missing = [text for text in dict.fromkeys(calls) if text not in translations]
+
+    def translate_chunk(chunk: list[str]) -> list[str]:
+        # Call the Translation API, passing a list of values and the target language
+        response = translate_client.translate_text(
+            request={
+                "parent": parent,
+                "contents": chunk,
+                "target_language_code": target_language_code,
+                "mime_type": "text/plain",
+            },
+            retry=Retry(),
+        )
+        return [translation.translated_text for translation in response.translations]
+
+    chunks = split_requests(missing)
+    with futures.ThreadPoolExecutor(MAX_CONCURRENT_REQUESTS) as executor:
+        for chunk, translated in zip(chunks, executor.map(translate_chunk, chunks)):
+            translations.update(zip(chunk, translated))
+
+    with _cache_lock:
+        for text in missing:
+            _cache[(text, target_language_code)] = translations[text]
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    # Return the translated values in the order of the calls
+    return [translations[text] for text in calls]
 
 
 # [END bigquery_remote_function_translation]
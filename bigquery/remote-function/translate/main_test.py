@@ -25,6 +25,22 @@ def app() -> flask.Flask:
     return flask.Flask(__name__)
 
 
+@pytest.fixture(autouse=True)
+def clear_cache() -> None:
+    import main
+
+    main._cache.clear()
+
+
+def fake_translate_text(
+    request: dict, retry: object
+) -> translate.TranslateTextResponse:
+    """Translates each text to upper case."""
+    return translate.TranslateTextResponse(
+        {"translations": [{"translated_text": t.upper()} for t in request["contents"]]}
+    )
+
+
 @mock.patch("main.translate_client")
 def test_main(mock_translate: object, app: flask.Flask) -> None:
     import main
@@ -75,3 +91,50 @@ def test_translate_client_error(mock_translate: object, app: flask.Flask) -> Non
         assert response.status_code == 400
         assert "errorMessage" in response.get_json()
         assert response.get_json()["errorMessage"].endswith("API error")
+
+
+@mock.patch("main.translate_client")
+def test_translate_text_dedup_and_cache(mock_translate: object) -> None:
+    import main
+
+    mock_translate.translate_text.side_effect = fake_translate_text
+
+    calls = ["hello", "world", "hello", "hello"]
+    assert main.translate_text(calls, "test-project", "es") == [
+        "HELLO",
+        "WORLD",
+        "HELLO",
+        "HELLO",
+    ]
+    request = mock_translate.translate_text.call_args.kwargs["request"]
+    assert request["contents"] == ["hello", "world"]
+
+    # Cached texts are not sent again.
+    assert main.translate_text(["world", "again"], "test-project", "es") == [
+        "WORLD",
+        "AGAIN",
+    ]
+    request = mock_translate.translate_text.call_args.kwargs["request"]
+    assert request["contents"] == ["again"]
+    # The cache is per target language.
+    main.translate_text(["hello"], "test-project", "fr")
+    assert mock_translate.translate_text.call_count == 3
+
+
+@mock.patch("main.translate_client")
+def test_translate_text_splits_requests(mock_translate: object) -> None:
+    import main
+
+    mock_translate.translate_text.side_effect = fake_translate_text
+
+    calls = [f"text {i}" for i in range(3000)] + ["x" * 40000]
+    assert main.translate_text(calls, "test-project", "es") == [
+        call.upper() for call in calls
+    ]
+    for call in mock_translate.translate_text.call_args_list:
+        contents = call.kwargs["request"]["contents"]
+        assert len(contents) <= main.MAX_SEGMENTS_PER_REQUEST
+        assert (
+            len(contents) == 1
+            or sum(map(len, contents)) <= main.MAX_CODEPOINTS_PER_REQUEST
+        )
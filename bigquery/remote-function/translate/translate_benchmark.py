@@ -0,0 +1,114 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares translate_text with and without deduplication and caching.
+
+Batches are drawn from a vocabulary with Zipf distributed frequencies, as
+repeated values are in real tables, and translated by a local stub with a
+fixed latency per request and per codepoint. No API calls are made:
+
+    python translate_benchmark.py --batches 20 --rows 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import random
+import threading
+import time
+from unittest import mock
+
+from google.cloud import translate
+
+
+class StubTranslationClient:
+    """Translates to upper case after a simulated request latency."""
+
+    def __init__(
+        self,
+        *args: object,
+        request_latency: float = 0.05,
+        codepoint_latency: float = 1e-5,
+    ) -> None:
+        self.request_latency = request_latency
+        self.codepoint_latency = codepoint_latency
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+
+    def translate_text(
+        self, request: dict, retry: object = None
+    ) -> translate.TranslateTextResponse:
+        codepoints = sum(len(text) for text in request["contents"])
+        with self._lock:
+            self.calls["requests"] += 1
+            self.calls["codepoints"] += codepoints
+        time.sleep(self.request_latency + codepoints * self.codepoint_latency)
+        return translate.TranslateTextResponse(
+            {
+                "translations": [
+                    {"translated_text": text.upper()} for text in request["contents"]
+                ]
+            }
+        )
+
+
+def make_batches(batches: int, rows: int, vocabulary: int) -> list[list[str]]:
+    words = [f"product description number {i}" for i in range(vocabulary)]
+    weights = [1 / rank**1.1 for rank in range(1, vocabulary + 1)]
+    rng = random.Random(0)
+    return [rng.choices(words, weights, k=rows) for _ in range(batches)]
+
+
+def uncached_translate(
+    client: StubTranslationClient, calls: list[str], split_requests
+) -> list[str]:
+    """Sends every row, in sequential requests within the API limits."""
+    translated = []
+    for chunk in split_requests(calls):
+        response = client.translate_text(request={"contents": chunk})
+        translated.extend(t.translated_text for t in response.translations)
+    return translated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    args = parser.parse_args()
+
+    # main creates its client on import. Replace it with the stub.
+    with mock.patch.object(
+        translate, "TranslationServiceClient", StubTranslationClient
+    ):
+        import main
+
+    batches = make_batches(args.batches, args.rows, args.vocabulary)
+
+    client = StubTranslationClient()
+    start = time.perf_counter()
+    for batch in batches:
+        uncached_translate(client, batch, main.split_requests)
+    elapsed = time.perf_counter() - start
+    print(f"without cache: {dict(client.calls)}, {elapsed:.2f}s")
+
+    client = main.translate_client
+    start = time.perf_counter()
+    for batch in batches:
+        main.translate_text(batch, "test-project", "es")
+    elapsed = time.perf_counter() - start
+    print(f"with cache:    {dict(client.calls)}, {elapsed:.2f}s")
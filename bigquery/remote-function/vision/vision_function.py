@@ -13,12 +13,105 @@
 # limitations under the License.
 
 # [START bigquery_remote_function_vision]
+from __future__ import annotations
+
+from concurrent import futures
+import threading
 import urllib.request
 
 import flask
 import functions_framework
 from google.cloud import vision
 
+# Limits of a single batch_annotate_images request. Image content is sent
+# base64 encoded, within a 10 MB request size limit.
+_MAX_IMAGES_PER_REQUEST = 16
+_MAX_BYTES_PER_REQUEST = 7 * 1024 * 1024
+
+_MAX_DOWNLOADS = 32
+_MAX_CONCURRENT_REQUESTS = 8
+_DOWNLOAD_TIMEOUT = 60
+
+# The client is created once per instance and shared by all requests.
+_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client() -> vision.ImageAnnotatorClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = vision.ImageAnnotatorClient()
+        return _client
+
+
+def _download(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=_DOWNLOAD_TIMEOUT) as response:
+        return response.read()
+
+
+def _annotate_batch(batch: list[tuple[int, bytes]]) -> list[tuple[int, dict]]:
+    """Labels a batch of (row, image content) pairs in one API request."""
+    rows = [row for row, _ in batch]
+    try:
+        results = _get_client().batch_annotate_images(
+            requests=[
+                {
+                    "image": {"content": content},
+                    "features": [{"type_": vision.Feature.Type.LABEL_DETECTION}],
+                }
+                for _, content in batch
+            ]
+        )
+    except Exception as e:
+        return [(row, {"errorMessage": str(e)}) for row in rows]
+    return [
+        (
+            row,
+            {"errorMessage": result.error.message}
+            if result.error.message
+            else vision.AnnotateImageResponse.to_dict(result),
+        )
+        for row, result in zip(rows, results.responses)
+    ]
+
+
+def _label_images(urls: list[str]) -> list[dict]:
+    """Labels images, downloading them and calling the API concurrently.
+
+    Replies are in the order of `urls`. A row whose image cannot be
+    downloaded or labeled gets an `errorMessage` instead of failing the batch.
+    """
+    replies = [None] * len(urls)
+    downloads = futures.ThreadPoolExecutor(_MAX_DOWNLOADS)
+    requests = futures.ThreadPoolExecutor(_MAX_CONCURRENT_REQUESTS)
+    with downloads, requests:
+        contents = [downloads.submit(_download, url) for url in urls]
+        annotations = []
+        batch, batch_bytes = [], 0
+        # Requests are sent as soon as a batch is full, while later images
+        # are still downloading.
+        for row, content in enumerate(contents):
+            try:
+                content = content.result()
+            except Exception as e:
+                replies[row] = {"errorMessage": str(e)}
+                continue
+            if batch and (
+                len(batch) == _MAX_IMAGES_PER_REQUEST
+                or batch_bytes + len(content) > _MAX_BYTES_PER_REQUEST
+            ):
+                annotations.append(requests.submit(_annotate_batch, batch))
+                batch, batch_bytes = [], 0
+            batch.append((row, content))
+            batch_bytes += len(content)
+        if batch:
+            annotations.append(requests.submit(_annotate_batch, batch))
+        for annotation in annotations:
+            for row, reply in annotation.result():
+                replies[row] = reply
+    return replies
+
 
 @functions_framework.http
 def label_detection(request: flask.Request) -> flask.Response:
@@ -31,13 +124,8 @@ def label_detection(request: flask.Request) -> flask.Response:
         https://cloud.google.com/bigquery/docs/reference/standard-sql/remote-functions#output_format
     """
     try:
-        client = vision.ImageAnnotatorClient()
         calls = request.get_json()["calls"]
-        replies = []
-        for call in calls:
-            content = urllib.request.urlopen(call[0]).read()
-            results = client.label_detection({"content": content})
-            replies.append(vision.AnnotateImageResponse.to_dict(results))
+        replies = _label_images([call[0] for call in calls])
         return flask.make_response(flask.jsonify({"replies": replies}))
     except Exception as e:
         return flask.make_response(flask.jsonify({"errorMessage": str(e)}), 400)
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 from unittest import mock
 
 import flask
@@ -27,26 +28,42 @@ def app() -> flask.Flask:
     return flask.Flask(__name__)
 
 
-@mock.patch("vision_function.urllib.request")
-@mock.patch("vision_function.vision")
-def test_vision_function(
-    mock_vision: object, mock_request: object, app: flask.Flask
-) -> None:
-    mock_request.urlopen = mock.Mock(read=mock.Mock(return_value=b"filedata"))
-    label_detection_mock = mock.Mock(
-        side_effect=[
-            vision.AnnotateImageResponse(
-                {"label_annotations": [{"description": "apple"}]}
-            ),
-            vision.AnnotateImageResponse(
-                {"label_annotations": [{"description": "banana"}]}
-            ),
+@pytest.fixture(autouse=True)
+def reset_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(vision_function, "_client", None)
+
+
+def fake_urlopen(url: str, timeout: float) -> io.BytesIO:
+    if url.endswith("missing"):
+        raise OSError("HTTP Error 404: Not Found")
+    return io.BytesIO(url.rsplit("/", 1)[-1].encode())
+
+
+def fake_batch_annotate_images(requests: list) -> vision.BatchAnnotateImagesResponse:
+    """Labels each image with its content."""
+    return vision.BatchAnnotateImagesResponse(
+        responses=[
+            {"label_annotations": [{"description": r["image"]["content"].decode()}]}
+            for r in requests
         ]
     )
+
+
+def mock_client(mock_vision: mock.Mock, batch_annotate_images: mock.Mock) -> None:
     mock_vision.ImageAnnotatorClient = mock.Mock(
-        return_value=mock.Mock(label_detection=label_detection_mock)
+        return_value=mock.Mock(batch_annotate_images=batch_annotate_images)
     )
     mock_vision.AnnotateImageResponse = vision.AnnotateImageResponse
+
+
+@mock.patch("vision_function.urllib.request")
+@mock.patch("vision_function.vision")
+def test_vision_function(
+    mock_vision: object, mock_request: object, app: flask.Flask
+) -> None:
+    mock_request.urlopen = mock.MagicMock(side_effect=fake_urlopen)
+    batch_annotate_images = mock.Mock(side_effect=fake_batch_annotate_images)
+    mock_client(mock_vision, batch_annotate_images)
     with app.test_request_context(
         json={
             "calls": [
@@ -60,6 +77,49 @@ def test_vision_function(
         assert len(response.get_json()["replies"]) == 2
         assert "apple" in str(response.get_json()["replies"][0])
         assert "banana" in str(response.get_json()["replies"][1])
+    # Both images are labeled in one request.
+    assert batch_annotate_images.call_count == 1
+
+
+@mock.patch("vision_function.urllib.request")
+@mock.patch("vision_function.vision")
+def test_vision_function_batches(
+    mock_vision: object, mock_request: object, app: flask.Flask
+) -> None:
+    mock_request.urlopen = mock.MagicMock(side_effect=fake_urlopen)
+    batch_annotate_images = mock.Mock(side_effect=fake_batch_annotate_images)
+    mock_client(mock_vision, batch_annotate_images)
+    urls = [f"https://storage.googleapis.com/bucket/image{i}" for i in range(40)]
+    with app.test_request_context(json={"calls": [[url] for url in urls]}):
+        response = vision_function.label_detection(flask.request)
+        replies = response.get_json()["replies"]
+    assert response.status_code == 200
+    assert [reply["label_annotations"][0]["description"] for reply in replies] == [
+        f"image{i}" for i in range(40)
+    ]
+    assert batch_annotate_images.call_count == 3
+
+
+@mock.patch("vision_function.urllib.request")
+@mock.patch("vision_function.vision")
+def test_vision_function_download_error(
+    mock_vision: object, mock_request: object, app: flask.Flask
+) -> None:
+    mock_request.urlopen = mock.MagicMock(side_effect=fake_urlopen)
+    mock_client(mock_vision, mock.Mock(side_effect=fake_batch_annotate_images))
+    with app.test_request_context(
+        json={
+            "calls": [
+                ["https://storage.googleapis.com/bucket/missing"],
+                ["https://storage.googleapis.com/bucket/banana"],
+            ]
+        }
+    ):
+        response = vision_function.label_detection(flask.request)
+        replies = response.get_json()["replies"]
+    assert response.status_code == 200
+    assert "404" in replies[0]["errorMessage"]
+    assert "banana" in str(replies[1])
 
 
 @mock.patch("vision_function.urllib.request")
@@ -67,11 +127,8 @@ def test_vision_function(
 def test_vision_function_error(
     mock_vision: object, mock_request: object, app: flask.Flask
 ) -> None:
-    mock_request.urlopen = mock.Mock(read=mock.Mock(return_value=b"filedata"))
-    label_detection_mock = mock.Mock(side_effect=Exception("API error"))
-    mock_vision.ImageAnnotatorClient = mock.Mock(
-        return_value=mock.Mock(label_detection=label_detection_mock)
-    )
+    mock_request.urlopen = mock.MagicMock(side_effect=fake_urlopen)
+    mock_client(mock_vision, mock.Mock(side_effect=Exception("API error")))
     with app.test_request_context(
         json={
             "calls": [
@@ -80,6 +137,15 @@ def test_vision_function_error(
             ]
         }
     ):
+        response = vision_function.label_detection(flask.request)
+        assert response.status_code == 200
+        assert response.get_json()["replies"] == [
+            {"errorMessage": "API error"},
+            {"errorMessage": "API error"},
+        ]
+
+
+def test_vision_function_invalid_request(app: flask.Flask) -> None:
+    with app.test_request_context(json={}):
         response = vision_function.label_detection(flask.request)
         assert response.status_code == 400
-        assert "API error" in str(response.get_data())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+#
+# Copyright 2024 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Signs Cloud CDN URLs and cookies in bulk, for example on every page render.
+
+`UrlSigner` holds a ring of decoded signing keys, so that keys can be rotated,
+and signs with the active one. Unless given an expiration time, signatures
+expire at the end of a time bucket after the TTL, so that the same URL signed
+again within a bucket is served from an LRU cache. With an expiration time,
+the results are the same as those of snippets.py.
+
+Measure the throughput against snippets.py with:
+
+    python url_signer.py --urls 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+from datetime import datetime
+import functools
+import hashlib
+import hmac
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+_EPOCH = datetime.utcfromtimestamp(0)
+
+DEFAULT_TTL = 3600
+DEFAULT_EXPIRY_BUCKET = 300
+DEFAULT_CACHE_SIZE = 100000
+
+
+def _has_query_params(url: str) -> bool:
+    if "?" not in url:
+        return False
+    query = urlsplit(url).query
+    return bool(query) and bool(parse_qs(query, keep_blank_values=True))
+
+
+def _encode_url_prefix(url_prefix: str) -> str:
+    return base64.urlsafe_b64encode(url_prefix.strip().encode("utf-8")).decode("utf-8")
+
+
+class UrlSigner:
+    """Signs URLs and cookies with a ring of Cloud CDN signing keys.
+
+    Args:
+        keys: The base64 encoded signing keys, by key name.
+        active_key_name: The name of the key to sign with. Defaults to the
+            first key. The other keys are only used to verify signatures.
+        ttl: The minimum number of seconds for which default signatures are
+            valid.
+        expiry_bucket: Default expiration times are rounded up to a multiple
+            of this number of seconds.
+        cache_size: The number of signatures to cache.
+    """
+
+    def __init__(
+        self,
+        keys: Dict[str, str],
+        active_key_name: Optional[str] = None,
+        ttl: int = DEFAULT_TTL,
+        expiry_bucket: int = DEFAULT_EXPIRY_BUCKET,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ) -> None:
+        if not keys:
+            raise ValueError("At least one signing key is required.")
+        # Copies of these objects skip hashing the key for every signature.
+        self._keys = {
+            key_name: hmac.new(base64.urlsafe_b64decode(base64_key), None, hashlib.sha1)
+            for key_name, base64_key in keys.items()
+        }
+        self.active_key_name = active_key_name or next(iter(keys))
+        if self.active_key_name not in self._keys:
+            raise ValueError(f"Unknown key name: {self.active_key_name}")
+        self.ttl = ttl
+        self.expiry_bucket = expiry_bucket
+        self._sign_cached = functools.lru_cache(cache_size)(self._sign)
+
+    def add_key(self, key_name: str, base64_key: str, active: bool = True) -> None:
+        """Adds a key to the ring, to sign with from now on if `active`.
+
+        Replacing the key material of an existing key name drops the
+        signatures cached with the old key.
+        """
+        if key_name in self._keys:
+            self._sign_cached.cache_clear()
+        self._keys[key_name] = hmac.new(
+            base64.urlsafe_b64decode(base64_key), None, hashlib.sha1
+        )
+        if active:
+            self.active_key_name = key_name
+
+    def remove_key(self, key_name: str) -> None:
+        """Removes a key from the ring. Signatures cached with it are dropped."""
+        if key_name == self.active_key_name:
+            raise ValueError("The active key cannot be removed.")
+        del self._keys[key_name]
+        self._sign_cached.cache_clear()
+
+    def cache_info(self) -> functools._CacheInfo:
+        """Returns the hits and misses of the signature cache."""
+        return self._sign_cached.cache_info()
+
+    def _expires(self, expiration_time: Optional[datetime]) -> int:
+        if expiration_time is not None:
+            return int((expiration_time - _EPOCH).total_seconds())
+        expires = int(time.time()) + self.ttl
+        return -(-expires // self.expiry_bucket) * self.expiry_bucket
+
+    def _signature(self, key_name: str, value: str) -> str:
+        mac = self._keys[key_name].copy()
+        mac.update(value.encode("utf-8"))
+        return base64.urlsafe_b64encode(mac.digest()).decode("utf-8")
+
+    def _sign(
+        self, kind: str, url: str, url_prefix: str, expires: int, key_name: str
+    ) -> str:
+        """Signs like the function of snippets.py named after `kind`."""
+        if kind == "cookie":
+            policy = (
+                f"URLPrefix={_encode_url_prefix(url_prefix)}:Expires={expires}"
+                f":KeyName={key_name}"
+            )
+            return f"Cloud-CDN-Cookie={policy}:Signature={self._signature(key_name, policy)}"
+
+        stripped_url = url.strip()
+        separator = "&" if _has_query_params(stripped_url) else "?"
+        if kind == "url":
+            url_to_sign = (
+                f"{stripped_url}{separator}Expires={expires}&KeyName={key_name}"
+            )
+            return f"{url_to_sign}&Signature={self._signature(key_name, url_to_sign)}"
+
+        policy = (
+            f"URLPrefix={_encode_url_prefix(url_prefix)}&Expires={expires}"
+            f"&KeyName={key_name}"
+        )
+        signature = self._signature(key_name, policy)
+        return f"{stripped_url}{separator}{policy}&Signature={signature}"
+
+    def sign_url(self, url: str, expiration_time: Optional[datetime] = None) -> str:
+        """Signs a URL, as `snippets.sign_url`."""
+        return self._sign_cached(
+            "url", url, "", self._expires(expiration_time), self.active_key_name
+        )
+
+    def sign_url_prefix(
+        self, url: str, url_prefix: str, expiration_time: Optional[datetime] = None
+    ) -> str:
+        """Signs a URL prefix for a URL, as `snippets.sign_url_prefix`."""
+        return self._sign_cached(
+            "url_prefix",
+            url,
+            url_prefix,
+            self._expires(expiration_time),
+            self.active_key_name,
+        )
+
+    def sign_cookie(
+        self, url_prefix: str, expiration_time: Optional[datetime] = None
+    ) -> str:
+        """Signs a cookie for a URL prefix, as `snippets.sign_cookie`."""
+        return self._sign_cached(
+            "cookie",
+            "",
+            url_prefix,
+            self._expires(expiration_time),
+            self.active_key_name,
+        )
+
+    def sign_urls(
+        self, urls: Iterable[str], expiration_time: Optional[datetime] = None
+    ) -> List[str]:
+        """Signs URLs with the same expiration time, in the order given."""
+        expires = self._expires(expiration_time)
+        key_name = self.active_key_name
+        return [self._sign_cached("url", url, "", expires, key_name) for url in urls]
+
+    def _check(self, policy: str, now: Optional[float]) -> Tuple[bool, Dict]:
+        """Checks the signature and expiration time of a signed policy.
+
+        Returns:
+            Whether the policy is valid, and its parameters.
+        """
+        if policy.startswith("Cloud-CDN-Cookie="):
+            signed, _, signature = policy[len("Cloud-CDN-Cookie=") :].rpartition(
+                ":Signature="
+            )
+            params_list = signed.split(":")
+        else:
+            signed, _, signature = policy.rpartition("&Signature=")
+            params_list = signed.rpartition("?")[2].split("&")
+        params = dict(param.partition("=")[::2] for param in params_list)
+        key_name = params.get("KeyName")
+        if not signature or key_name not in self._keys:
+            return False, params
+        try:
+            if int(params.get("Expires", "")) < (time.time() if now is None else now):
+                return False, params
+        except ValueError:
+            return False, params
+        return hmac.compare_digest(self._signature(key_name, signed), signature), params
+
+    def verify_signed_url(self, signed_url: str, now: Optional[float] = None) -> bool:
+        """Checks a URL signed by `sign_url` or `sign_url_prefix`.
+
+        Args:
+            signed_url: The signed URL.
+            now: The time to check the expiration time against, in seconds
+                since the epoch. Defaults to the current time.
+
+        Returns:
+            True if the URL is signed with a key of the ring and not expired.
+        """
+        start = signed_url.find("URLPrefix=")
+        if start == -1:
+            return self._check(signed_url, now)[0]
+        valid, params = self._check(signed_url[start:], now)
+        if not valid:
+            return False
+        url_prefix = base64.urlsafe_b64decode(params["URLPrefix"]).decode("utf-8")
+        return signed_url.startswith(url_prefix)
+
+    def verify_signed_cookie(
+        self, cookie: str, url: Optional[str] = None, now: Optional[float] = None
+    ) -> bool:
+        """Checks a cookie signed by `sign_cookie`, optionally for a URL.
+
+        Args:
+            cookie: The signed cookie.
+            url: The requested URL, to check against the URL prefix.
+            now: The time to check the expiration time against, in seconds
+                since the epoch. Defaults to the current time.
+
+        Returns:
+            True if the cookie is signed with a key of the ring, not expired,
+            and its URL prefix matches the URL.
+        """
+        valid, params = self._check(cookie, now)
+        if not valid or url is None:
+            return valid
+        url_prefix = base64.urlsafe_b64decode(params["URLPrefix"]).decode("utf-8")
+        return url.startswith(url_prefix)
+
+
+if __name__ == "__main__":
+    import snippets
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--urls", type=int, default=10000)
+    parser.add_argument(
+        "--distinct", type=int, default=1000, help="The number of distinct URLs."
+    )
+    args = parser.parse_args()
+
+    base64_key = "nZtRohdNF9m3cKM24IcK4w=="
+    urls = [
+        f"https://cdn.example.com/static/{i % args.distinct}.js?v=1"
+        for i in range(args.urls)
+    ]
+    expiration_time = datetime.utcfromtimestamp(time.time() + DEFAULT_TTL)
+
+    def report(name: str, sign) -> List[str]:
+        start = time.perf_counter()
+        signed_urls = sign()
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(signed_urls) / elapsed:.0f} URLs/s")
+        return signed_urls
+
+    expected = report(
+        "snippets.sign_url",
+        lambda: [
+            snippets.sign_url(url, "my-key", base64_key, expiration_time)
+            for url in urls
+        ],
+    )
+    signer = UrlSigner({"my-key": base64_key}, cache_size=0)
+    assert (
+        report(
+            "UrlSigner.sign_urls, no cache",
+            lambda: signer.sign_urls(urls, expiration_time),
+        )
+        == expected
+    )
+    signer = UrlSigner({"my-key": base64_key})
+    assert (
+        report(
+            f"UrlSigner.sign_urls, {args.distinct} distinct URLs",
+            lambda: signer.sign_urls(urls, expiration_time),
+        )
+        == expected
+    )
+    report("UrlSigner.sign_urls, default expiry", lambda: signer.sign_urls(urls))
+    print(signer.cache_info())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+# Copyright 2024 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for url_signer."""
+
+import datetime
+
+import pytest
+
+import snippets
+import url_signer
+
+KEY = "nZtRohdNF9m3cKM24IcK4w=="
+OTHER_KEY = "gvBwCunzl9FWr2GEsg_WKQ=="
+EXPIRATION_TIME = datetime.datetime.utcfromtimestamp(1549751401)
+URLS = [
+    "http://35.186.234.33/index.html",
+    "http://www.example.com/",
+    "http://www.example.com/some/path?some=query&another=param",
+]
+
+
+def test_sign_matches_snippets():
+    signer = url_signer.UrlSigner({"my-key": KEY})
+
+    assert signer.sign_urls(URLS, EXPIRATION_TIME) == [
+        snippets.sign_url(url, "my-key", KEY, EXPIRATION_TIME) for url in URLS
+    ]
+    for url in URLS:
+        assert signer.sign_url(url, EXPIRATION_TIME) == snippets.sign_url(
+            url, "my-key", KEY, EXPIRATION_TIME
+        )
+        assert signer.sign_url_prefix(
+            url, "http://www.example.com/", EXPIRATION_TIME
+        ) == snippets.sign_url_prefix(
+            url, "http://www.example.com/", "my-key", KEY, EXPIRATION_TIME
+        )
+        assert signer.sign_cookie(url, EXPIRATION_TIME) == snippets.sign_cookie(
+            url, "my-key", KEY, EXPIRATION_TIME
+        )
+
+
+def test_default_expiration_is_bucketed(monkeypatch):
+    monkeypatch.setattr(url_signer.time, "time", lambda: 1000000)
+    signer = url_signer.UrlSigner({"my-key": KEY}, ttl=3600, expiry_bucket=300)
+
+    first = signer.sign_urls(URLS * 2)
+    monkeypatch.setattr(url_signer.time, "time", lambda: 1000100)
+    assert signer.sign_urls(URLS) == first[:3]
+    assert "Expires=1003800&" in first[0]
+    # Each distinct URL was signed once.
+    assert signer.cache_info().misses == 3
+
+
+def test_key_rotation():
+    signer = url_signer.UrlSigner({"old-key": KEY})
+    old_url = signer.sign_url(URLS[0])
+
+    signer.add_key("new-key", OTHER_KEY)
+    new_url = signer.sign_url(URLS[0])
+    assert "KeyName=new-key&" in new_url
+    assert signer.verify_signed_url(old_url)
+    assert signer.verify_signed_url(new_url)
+
+    signer.remove_key("old-key")
+    assert not signer.verify_signed_url(old_url)
+    assert signer.verify_signed_url(new_url)
+    with pytest.raises(ValueError):
+        signer.remove_key("new-key")
+
+
+def test_replacing_key_material_clears_cache():
+    signer = url_signer.UrlSigner({"my-key": KEY})
+    old_url = signer.sign_url(URLS[0], EXPIRATION_TIME)
+
+    signer.add_key("my-key", OTHER_KEY)
+    new_url = signer.sign_url(URLS[0], EXPIRATION_TIME)
+    assert new_url != old_url
+    assert new_url == snippets.sign_url(URLS[0], "my-key", OTHER_KEY, EXPIRATION_TIME)
+    assert not signer.verify_signed_url(old_url, now=1549751401)
+
+
+def test_verify_signed_url():
+    signer = url_signer.UrlSigner({"my-key": KEY})
+    now = 1549751401
+    for url in URLS:
+        signed_url = signer.sign_url(url, EXPIRATION_TIME)
+        assert signer.verify_signed_url(signed_url, now)
+        assert not signer.verify_signed_url(signed_url, now + 1)
+        assert not signer.verify_signed_url(signed_url.replace("http:", "https:"), now)
+
+    prefix_url = signer.sign_url_prefix(
+        URLS[2], "http://www.example.com/some/", EXPIRATION_TIME
+    )
+    assert signer.verify_signed_url(prefix_url, now)
+    assert not signer.verify_signed_url(
+        prefix_url.replace("/some/path", "/other/path"), now
+    )
+
+    cookie = signer.sign_cookie("http://www.example.com/foo/", EXPIRATION_TIME)
+    assert signer.verify_signed_cookie(cookie, now=now)
+    assert signer.verify_signed_cookie(cookie, "http://www.example.com/foo/a", now)
+    assert not signer.verify_signed_cookie(cookie, "http://www.example.com/bar", now)
+    assert not signer.verify_signed_cookie(cookie.replace("my-key", "key"), now=now)
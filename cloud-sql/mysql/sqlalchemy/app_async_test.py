@@ -0,0 +1,68 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from typing import Iterator
+
+import pytest
+from starlette.testclient import TestClient
+
+import app_async
+
+
+# load proper environment variables
+def setup_test_env():
+    os.environ["DB_USER"] = os.environ["MYSQL_USER"]
+    os.environ["DB_PASS"] = os.environ["MYSQL_PASSWORD"]
+    os.environ["DB_NAME"] = os.environ["MYSQL_DATABASE"]
+    os.environ["DB_PORT"] = os.environ["MYSQL_PORT"]
+    os.environ["INSTANCE_UNIX_SOCKET"] = os.environ["MYSQL_UNIX_SOCKET"]
+    os.environ["INSTANCE_HOST"] = os.environ["MYSQL_INSTANCE_HOST"]
+    os.environ["INSTANCE_CONNECTION_NAME"] = os.environ["MYSQL_INSTANCE"]
+
+
+@pytest.fixture(scope="module")
+def client() -> Iterator[TestClient]:
+    setup_test_env()
+    # Entering the client runs the app's startup and shutdown.
+    with TestClient(app_async.app) as client:
+        yield client
+
+
+def test_get_votes(client: TestClient) -> None:
+    response = client.get("/")
+    assert response.status_code == 200
+    assert "Tabs VS Spaces" in response.text
+
+
+def test_cast_vote(client: TestClient) -> None:
+    response = client.post("/votes", data={"team": "SPACES"})
+    assert response.status_code == 200
+    assert "Vote successfully cast for 'SPACES'" in response.text
+
+
+def test_invalid_vote(client: TestClient) -> None:
+    response = client.post("/votes", data={"team": "EMACS"})
+    assert response.status_code == 400
+
+
+def test_metrics(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("ENABLE_METRICS", raising=False)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setenv("ENABLE_METRICS", "true")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    # The pool was warmed up at startup.
+    assert response.json()["pool"]["checked_in"] >= 1
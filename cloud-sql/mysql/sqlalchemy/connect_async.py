@@ -0,0 +1,122 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Async connection pools for a Cloud SQL instance of MySQL.
+
+These mirror connect_tcp.py and connect_unix.py, using SQLAlchemy's asyncio
+extension with the aiomysql driver. Queries then wait on the event loop
+instead of blocking a worker thread each.
+
+The Cloud SQL Python Connector only supports asyncpg for async connections,
+so an async pool connects over TCP or a Unix socket, for example through the
+Cloud SQL Auth Proxy.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+
+def pool_options() -> dict:
+    """Returns pool sizing options, with the defaults of the synchronous pools.
+
+    Tune them with DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and
+    DB_POOL_RECYCLE.
+    """
+    return {
+        # Pool size is the maximum number of permanent connections to keep.
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        # Temporarily exceeds the set pool_size if no connections are available.
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 2)),
+        # 'pool_timeout' is the maximum number of seconds to wait when retrieving a
+        # new connection from the pool.
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        # 'pool_recycle' is the maximum number of seconds a connection can persist.
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    }
+
+
+def connect_tcp_socket_async() -> AsyncEngine:
+    """Initializes an async TCP connection pool for MySQL."""
+    return create_async_engine(
+        # Equivalent URL:
+        # mysql+aiomysql://<db_user>:<db_pass>@<db_host>:<db_port>/<db_name>
+        sqlalchemy.engine.url.URL.create(
+            drivername="mysql+aiomysql",
+            username=os.environ["DB_USER"],
+            password=os.environ["DB_PASS"],
+            host=os.environ["INSTANCE_HOST"],
+            port=os.environ["DB_PORT"],
+            database=os.environ["DB_NAME"],
+        ),
+        **pool_options(),
+    )
+
+
+def connect_unix_socket_async() -> AsyncEngine:
+    """Initializes an async Unix socket connection pool for MySQL."""
+    return create_async_engine(
+        # Equivalent URL:
+        # mysql+aiomysql://<db_user>:<db_pass>@/<db_name>
+        #                         ?unix_socket=<INSTANCE_UNIX_SOCKET>
+        sqlalchemy.engine.url.URL.create(
+            drivername="mysql+aiomysql",
+            username=os.environ["DB_USER"],
+            password=os.environ["DB_PASS"],
+            database=os.environ["DB_NAME"],
+            query={"unix_socket": os.environ["INSTANCE_UNIX_SOCKET"]},
+        ),
+        **pool_options(),
+    )
+
+
+async def init_connection_pool_async() -> AsyncEngine:
+    """Sets up an async connection pool, chosen like app.init_connection_pool."""
+    if os.environ.get("INSTANCE_HOST"):
+        return connect_tcp_socket_async()
+    if os.environ.get("INSTANCE_UNIX_SOCKET"):
+        return connect_unix_socket_async()
+    if os.environ.get("INSTANCE_CONNECTION_NAME"):
+        raise ValueError(
+            "The Cloud SQL Python Connector has no async driver for MySQL. "
+            "Please define INSTANCE_HOST or INSTANCE_UNIX_SOCKET instead."
+        )
+    raise ValueError(
+        "Missing database connection type. Please define one of INSTANCE_HOST or INSTANCE_UNIX_SOCKET"
+    )
+
+
+async def prewarm_pool(engine: AsyncEngine, connections: int | None = None) -> None:
+    """Opens `connections` pooled connections up front, the pool size by default.
+
+    The first requests after startup then skip the TCP, TLS and
+    authentication handshakes of opening connections.
+    """
+    if connections is None:
+        connections = engine.pool.size()
+    # Hold every connection at once, otherwise the pool would hand the same
+    # connection out again.
+    opened = await asyncio.gather(
+        *(engine.connect().start() for _ in range(connections))
+    )
+    await asyncio.gather(*(conn.close() for conn in opened))
+
+
+async def dispose_pool(engine: AsyncEngine) -> None:
+    """Closes the pool's connections."""
+    await engine.dispose()
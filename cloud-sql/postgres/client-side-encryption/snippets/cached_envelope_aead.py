@@ -0,0 +1,326 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Envelope encryption that reuses data encryption keys (DEKs).
+
+`tink.aead.KmsEnvelopeAead` wraps a fresh DEK with Cloud KMS for every
+encrypt call, and unwraps it again for every decrypt call. Bulk encryption
+of a table is then bound by KMS latency and quota. `CachedEnvelopeAead`
+produces the same ciphertext format, so the two can read each other's rows.
+It differs in two ways:
+
+* A DEK encrypts up to `max_uses` values or for `max_age` seconds before a
+  new one is generated and wrapped.
+* Unwrapped DEKs are kept in an LRU cache keyed by the wrapped DEK bytes.
+
+Compare both against a fake KMS with simulated latency by running:
+
+    python -m snippets.cached_envelope_aead --rows 2000 --kms-latency-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+from concurrent import futures
+import logging
+import struct
+import threading
+import time
+from typing import Optional, Sequence
+
+import tink
+from tink import aead
+from tink import core
+from tink.integration import gcpkms
+from tink.proto import tink_pb2
+
+DEK_LEN_BYTES = 4
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEnvelopeAead(aead.Aead):
+    """
+    Envelope AEAD with bounded DEK reuse and a cache of unwrapped DEKs.
+
+    Ciphertexts match `tink.aead.KmsEnvelopeAead`: the 4 byte big endian
+    length of the wrapped DEK, the wrapped DEK, then the AEAD payload.
+    """
+
+    def __init__(
+        self,
+        key_template: tink_pb2.KeyTemplate,
+        remote_aead: aead.Aead,
+        max_uses: int = 10000,
+        max_age: float = 300.0,
+        cache_size: int = 1000,
+        max_workers: int = 8,
+    ) -> None:
+        self.key_template = key_template
+        self.remote_aead = remote_aead
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.cache_size = cache_size
+        self.max_workers = max_workers
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+        # Held while a new DEK is wrapped, see _dek_for_encryption.
+        self._rotation_lock = threading.Lock()
+        # (header, DEK primitive, time created, uses) of the current DEK
+        self._current: Optional[list] = None
+        self._cache: collections.OrderedDict[
+            bytes, aead.Aead
+        ] = collections.OrderedDict()
+
+    def _new_dek(self) -> tuple[bytes, list]:
+        """Generates a DEK and wraps it with KMS, without taking any lock."""
+        dek = core.Registry.new_key_data(self.key_template)
+        dek_aead = core.Registry.primitive(dek, aead.Aead)
+        wrapped_dek = self.remote_aead.encrypt(dek.value, b"")
+        header = struct.pack(">I", len(wrapped_dek)) + wrapped_dek
+        return wrapped_dek, [header, dek_aead, time.monotonic(), 0]
+
+    def _is_spent(self, current: Optional[list]) -> bool:
+        return (
+            current is None
+            or current[3] >= self.max_uses
+            or time.monotonic() - current[2] >= self.max_age
+        )
+
+    def _dek_for_encryption(self, count: int) -> list[tuple[bytes, aead.Aead]]:
+        """Reserves `count` uses of DEKs, rotating them as limits are hit."""
+        reserved: list[tuple[bytes, aead.Aead]] = []
+
+        def reserve(current: list) -> None:
+            uses = min(self.max_uses - current[3], count - len(reserved))
+            current[3] += uses
+            reserved.extend([(current[0], current[1])] * uses)
+
+        while len(reserved) < count:
+            with self._lock:
+                current = self._current
+                if not self._is_spent(current):
+                    reserve(current)
+                    continue
+            # The KMS call runs outside of `_lock`, so decryption goes on
+            # meanwhile. `_rotation_lock` makes threads that find the DEK
+            # spent at the same time wrap a single new one.
+            with self._rotation_lock:
+                if self._current is not current:
+                    # Another thread rotated the DEK while this one waited.
+                    continue
+                wrapped_dek, new = self._new_dek()
+                with self._lock:
+                    self.stats["kms_encrypt"] += 1
+                    self._remember(wrapped_dek, new[1])
+                    self._current = new
+                    reserve(new)
+        return reserved
+
+    def _remember(self, wrapped_dek: bytes, dek_aead: aead.Aead) -> None:
+        self._cache[wrapped_dek] = dek_aead
+        self._cache.move_to_end(wrapped_dek)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _cached_dek(self, wrapped_dek: bytes) -> Optional[aead.Aead]:
+        with self._lock:
+            dek_aead = self._cache.get(wrapped_dek)
+            if dek_aead is not None:
+                self._cache.move_to_end(wrapped_dek)
+                self.stats["cache_hit"] += 1
+            return dek_aead
+
+    def _unwrap(self, wrapped_dek: bytes) -> aead.Aead:
+        dek_aead = self._cached_dek(wrapped_dek)
+        if dek_aead is not None:
+            return dek_aead
+        dek = tink_pb2.KeyData(
+            type_url=self.key_template.type_url,
+            value=self.remote_aead.decrypt(wrapped_dek, b""),
+            key_material_type=tink_pb2.KeyData.SYMMETRIC,
+        )
+        dek_aead = core.Registry.primitive(dek, aead.Aead)
+        with self._lock:
+            self.stats["kms_decrypt"] += 1
+            self._remember(wrapped_dek, dek_aead)
+        return dek_aead
+
+    @staticmethod
+    def _split(ciphertext: bytes) -> tuple[bytes, bytes]:
+        if len(ciphertext) < DEK_LEN_BYTES:
+            raise tink.TinkError("ciphertext too short")
+        dek_len = struct.unpack(">I", ciphertext[:DEK_LEN_BYTES])[0]
+        if dek_len > len(ciphertext) - DEK_LEN_BYTES:
+            raise tink.TinkError("invalid wrapped DEK length")
+        end = DEK_LEN_BYTES + dek_len
+        return ciphertext[DEK_LEN_BYTES:end], ciphertext[end:]
+
+    def encrypt(self, plaintext: bytes, associated_data: bytes) -> bytes:
+        return self.encrypt_batch([plaintext], [associated_data])[0]
+
+    def decrypt(self, ciphertext: bytes, associated_data: bytes) -> bytes:
+        wrapped_dek, payload = self._split(ciphertext)
+        return self._unwrap(wrapped_dek).decrypt(payload, associated_data)
+
+    def encrypt_batch(
+        self, plaintexts: Sequence[bytes], associated_data: Sequence[bytes]
+    ) -> list[bytes]:
+        """
+        Encrypts many values, wrapping one DEK per `max_uses` values at most.
+        """
+        if len(plaintexts) != len(associated_data):
+            raise ValueError("plaintexts and associated_data differ in length")
+        deks = self._dek_for_encryption(len(plaintexts))
+        return [
+            header + dek_aead.encrypt(plaintext, ad)
+            for (header, dek_aead), plaintext, ad in zip(
+                deks, plaintexts, associated_data
+            )
+        ]
+
+    def decrypt_batch(
+        self, ciphertexts: Sequence[bytes], associated_data: Sequence[bytes]
+    ) -> list[bytes]:
+        """
+        Decrypts many values, unwrapping each distinct DEK once.
+
+        DEKs missing from the cache are unwrapped concurrently.
+        """
+        if len(ciphertexts) != len(associated_data):
+            raise ValueError("ciphertexts and associated_data differ in length")
+        parts = [self._split(ciphertext) for ciphertext in ciphertexts]
+        wrapped_deks = dict.fromkeys(wrapped for wrapped, _ in parts)
+        deks = {wrapped: self._cached_dek(wrapped) for wrapped in wrapped_deks}
+        missing = [wrapped for wrapped, dek_aead in deks.items() if dek_aead is None]
+        if missing:
+            with futures.ThreadPoolExecutor(self.max_workers) as executor:
+                deks.update(zip(missing, executor.map(self._unwrap, missing)))
+        return [
+            deks[wrapped].decrypt(payload, ad)
+            for (wrapped, payload), ad in zip(parts, associated_data)
+        ]
+
+
+def init_tink_cached_env_aead(
+    key_uri: str,
+    credentials: str,
+    max_uses: int = 10000,
+    max_age: float = 300.0,
+    cache_size: int = 1000,
+) -> CachedEnvelopeAead:
+    """
+    Initiates a CachedEnvelopeAead object using the KMS credentials.
+    """
+    aead.register()
+
+    try:
+        gcp_client = gcpkms.GcpKmsClient(key_uri, credentials)
+        gcp_aead = gcp_client.get_aead(key_uri)
+    except tink.TinkError as e:
+        logger.error("Error initializing GCP client: %s", e)
+        raise e
+
+    env_aead = CachedEnvelopeAead(
+        aead.aead_key_templates.AES256_GCM,
+        gcp_aead,
+        max_uses=max_uses,
+        max_age=max_age,
+        cache_size=cache_size,
+    )
+
+    print(f"Created cached envelope AEAD Primitive using KMS URI: {key_uri}")
+
+    return env_aead
+
+
+class FakeKmsAead(aead.Aead):
+    """
+    A local stand-in for a Cloud KMS AEAD, for tests and benchmarks.
+
+    Wraps keys with a local AES-GCM key, after sleeping `latency` seconds to
+    simulate the KMS round trip, and counts the calls made.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        aead.register()
+        self._aead = tink.new_keyset_handle(
+            aead.aead_key_templates.AES256_GCM
+        ).primitive(aead.Aead)
+        self.latency = latency
+        self.calls = collections.Counter()
+
+    def encrypt(self, plaintext: bytes, associated_data: bytes) -> bytes:
+        self.calls["encrypt"] += 1
+        time.sleep(self.latency)
+        return self._aead.encrypt(plaintext, associated_data)
+
+    def decrypt(self, ciphertext: bytes, associated_data: bytes) -> bytes:
+        self.calls["decrypt"] += 1
+        time.sleep(self.latency)
+        return self._aead.decrypt(ciphertext, associated_data)
+
+
+def _benchmark(name: str, env_aead: aead.Aead, rows: int, kms: FakeKmsAead) -> None:
+    emails = [f"voter{i}@example.com".encode() for i in range(rows)]
+    teams = [b"TABS" if i % 2 else b"SPACES" for i in range(rows)]
+
+    start = time.perf_counter()
+    if isinstance(env_aead, CachedEnvelopeAead):
+        ciphertexts = env_aead.encrypt_batch(emails, teams)
+    else:
+        ciphertexts = [env_aead.encrypt(e, t) for e, t in zip(emails, teams)]
+    encrypt_seconds = time.perf_counter() - start
+
+    if isinstance(env_aead, CachedEnvelopeAead):
+        # Start from a cold cache, as a separate reader process would.
+        env_aead._cache.clear()
+        start = time.perf_counter()
+        decrypted = env_aead.decrypt_batch(ciphertexts, teams)
+    else:
+        start = time.perf_counter()
+        decrypted = [env_aead.decrypt(c, t) for c, t in zip(ciphertexts, teams)]
+    decrypt_seconds = time.perf_counter() - start
+    assert decrypted == emails
+
+    print(
+        f"{name}: encrypt {rows / encrypt_seconds:.0f} rows/s, "
+        f"decrypt {rows / decrypt_seconds:.0f} rows/s, "
+        f"KMS calls {dict(kms.calls)}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--kms-latency-ms", type=float, default=20)
+    parser.add_argument("--max-uses", type=int, default=500)
+    args = parser.parse_args()
+
+    aead.register()
+    template = aead.aead_key_templates.AES256_GCM
+    latency = args.kms_latency_ms / 1000
+
+    kms = FakeKmsAead(latency)
+    _benchmark("KmsEnvelopeAead", aead.KmsEnvelopeAead(template, kms), args.rows, kms)
+    kms = FakeKmsAead(latency)
+    _benchmark(
+        "CachedEnvelopeAead",
+        CachedEnvelopeAead(template, kms, max_uses=args.max_uses),
+        args.rows,
+        kms,
+    )
@@ -0,0 +1,108 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent import futures
+import time
+
+import pytest
+import tink
+from tink import aead
+
+from snippets.cached_envelope_aead import CachedEnvelopeAead, FakeKmsAead
+
+TEMPLATE = aead.aead_key_templates.AES256_GCM
+
+
+@pytest.fixture(name="kms")
+def setup_kms() -> FakeKmsAead:
+    yield FakeKmsAead()
+
+
+def make_rows(count: int) -> tuple[list[bytes], list[bytes]]:
+    emails = [f"voter{i}@example.com".encode() for i in range(count)]
+    teams = [b"TABS" if i % 2 else b"SPACES" for i in range(count)]
+    return emails, teams
+
+
+def test_batch_round_trip_reuses_deks(kms: FakeKmsAead) -> None:
+    env_aead = CachedEnvelopeAead(TEMPLATE, kms, max_uses=10)
+    emails, teams = make_rows(25)
+
+    ciphertexts = env_aead.encrypt_batch(emails, teams)
+    # 25 values at 10 uses per DEK need three wrapped DEKs.
+    assert kms.calls["encrypt"] == 3
+
+    reader = CachedEnvelopeAead(TEMPLATE, kms)
+    assert reader.decrypt_batch(ciphertexts, teams) == emails
+    assert kms.calls["decrypt"] == 3
+    assert reader.decrypt(ciphertexts[0], teams[0]) == emails[0]
+    assert kms.calls["decrypt"] == 3
+
+
+def test_dek_max_age(kms: FakeKmsAead) -> None:
+    env_aead = CachedEnvelopeAead(TEMPLATE, kms, max_age=0)
+    emails, teams = make_rows(3)
+    for email, team in zip(emails, teams):
+        env_aead.encrypt(email, team)
+    assert kms.calls["encrypt"] == 3
+
+
+def test_lru_is_bounded(kms: FakeKmsAead) -> None:
+    env_aead = CachedEnvelopeAead(TEMPLATE, kms, max_uses=1, cache_size=2)
+    emails, teams = make_rows(4)
+    ciphertexts = env_aead.encrypt_batch(emails, teams)
+
+    # Only the two most recent DEKs are still cached.
+    assert env_aead.decrypt_batch(ciphertexts, teams) == emails
+    assert kms.calls["decrypt"] == 2
+
+
+def test_rotation_wraps_one_dek_for_concurrent_callers(kms: FakeKmsAead) -> None:
+    env_aead = CachedEnvelopeAead(TEMPLATE, kms)
+    kms.latency = 0.05
+    emails, teams = make_rows(8)
+    with futures.ThreadPoolExecutor(8) as executor:
+        list(executor.map(env_aead.encrypt, emails, teams))
+    assert kms.calls["encrypt"] == 1
+
+
+def test_rotation_does_not_block_decryption(kms: FakeKmsAead) -> None:
+    env_aead = CachedEnvelopeAead(TEMPLATE, kms, max_uses=1)
+    ciphertext = env_aead.encrypt(b"a", b"TABS")
+    kms.latency = 0.5
+    with futures.ThreadPoolExecutor(1) as executor:
+        # The DEK is spent, so this waits on KMS to wrap a new one.
+        rotation = executor.submit(env_aead.encrypt, b"b", b"TABS")
+        time.sleep(0.1)
+        start = time.monotonic()
+        assert env_aead.decrypt(ciphertext, b"TABS") == b"a"
+        assert time.monotonic() - start < 0.25
+        rotation.result()
+
+
+def test_compatible_with_kms_envelope_aead(kms: FakeKmsAead) -> None:
+    env_aead = CachedEnvelopeAead(TEMPLATE, kms)
+    tink_aead = aead.KmsEnvelopeAead(TEMPLATE, kms)
+
+    assert tink_aead.decrypt(env_aead.encrypt(b"a", b"TABS"), b"TABS") == b"a"
+    assert env_aead.decrypt(tink_aead.encrypt(b"b", b"TABS"), b"TABS") == b"b"
+
+
+def test_associated_data_is_authenticated(kms: FakeKmsAead) -> None:
+    env_aead = CachedEnvelopeAead(TEMPLATE, kms)
+    ciphertext = env_aead.encrypt(b"hello@example.com", b"TABS")
+    with pytest.raises(tink.TinkError):
+        env_aead.decrypt(ciphertext, b"SPACES")
+    with pytest.raises(tink.TinkError):
+        env_aead.decrypt(b"\x00", b"TABS")
@@ -0,0 +1,182 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""ASGI variant of app.py, backed by an async connection pool.
+
+Each worker process serves many requests concurrently on one event loop, so
+a slow query no longer ties up a worker thread. Serve it with uvicorn, for
+example one worker per core:
+
+    uvicorn app_async:app --port 8080 --workers 1
+
+The connection pool is configured as in app.py, plus DB_POOL_SIZE,
+DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE to size it, and
+DB_POOL_PREWARM for the number of connections opened at startup.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import datetime
+import logging
+import os
+import time
+from typing import AsyncIterator
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+
+from app import add_to_tally, CANDIDATES, create_schema, INDEX_CACHE_TTL
+from connect_async import dispose_pool, init_connection_pool_async, prewarm_pool
+from vote_writer import pool_status
+
+logger = logging.getLogger()
+
+templates = Jinja2Templates(directory="templates")
+
+# (engine, time fetched, context) of the last index page data
+_index_cache = None
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncIterator[None]:
+    """Creates the connection pool and schema, and warms up the pool."""
+    db = await init_connection_pool_async()
+    async with db.connect() as conn:
+        await conn.run_sync(create_schema)
+    prewarm = os.environ.get("DB_POOL_PREWARM")
+    await prewarm_pool(db, int(prewarm) if prewarm else None)
+    app.state.db = db
+    yield
+    await dispose_pool(db)
+
+
+async def get_index_context(db: AsyncEngine, max_age: float = INDEX_CACHE_TTL) -> dict:
+    """Retrieves data from the database about the votes.
+
+    Args:
+        db: Connection pool to the database.
+        max_age: Seconds for which previously fetched data may be reused.
+    Returns:
+        A dictionary containing information about votes.
+    """
+    global _index_cache
+    cached = _index_cache
+    if cached and cached[0] is db and time.monotonic() - cached[1] < max_age:
+        return dict(cached[2])
+
+    fetched = time.monotonic()
+    async with db.connect() as conn:
+        recent_votes = (
+            await conn.execute(
+                sqlalchemy.text(
+                    "SELECT candidate, time_cast FROM votes "
+                    "ORDER BY time_cast DESC LIMIT 5"
+                )
+            )
+        ).fetchall()
+        tallies = dict(
+            (
+                await conn.execute(
+                    sqlalchemy.text("SELECT candidate, vote_count FROM vote_tallies")
+                )
+            ).fetchall()
+        )
+
+    context = {
+        "space_count": tallies.get("SPACES", 0),
+        "recent_votes": [
+            {"candidate": row[0], "time_cast": row[1]} for row in recent_votes
+        ],
+        "tab_count": tallies.get("TABS", 0),
+    }
+    _index_cache = (db, fetched, context)
+    return dict(context)
+
+
+async def save_vote(db: AsyncEngine, team: str) -> Response:
+    """Saves a single vote into the database.
+
+    Args:
+        db: Connection pool to the database.
+        team: The identifier of a team the vote is cast on.
+    Returns:
+        A HTTP response that can be sent to the client.
+    """
+    global _index_cache
+    # votes.time_cast is a timestamp without time zone, and asyncpg only
+    # binds naive datetimes to it.
+    time_cast = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+    if team not in CANDIDATES:
+        logger.warning(f"Received invalid 'team' property: '{team}'")
+        return Response(
+            "Invalid team specified. Should be one of 'TABS' or 'SPACES'",
+            status_code=400,
+        )
+
+    try:
+        # The vote and its tally are committed in the same transaction.
+        async with db.begin() as conn:
+            await conn.execute(
+                sqlalchemy.text(
+                    "INSERT INTO votes (time_cast, candidate) "
+                    "VALUES (:time_cast, :candidate)"
+                ),
+                {"time_cast": time_cast, "candidate": team},
+            )
+            await conn.run_sync(add_to_tally, team)
+    except Exception as e:
+        logger.exception(e)
+        return Response(
+            "Unable to successfully cast vote! Please check the "
+            "application logs for more details.",
+            status_code=500,
+        )
+    _index_cache = None
+
+    return Response(f"Vote successfully cast for '{team}' at time {time_cast}!")
+
+
+async def render_index(request: Request) -> Response:
+    """Serves the index page of the app."""
+    context = await get_index_context(request.app.state.db)
+    return templates.TemplateResponse(request, "index.html", context)
+
+
+async def cast_vote(request: Request) -> Response:
+    """Processes a single vote from user."""
+    form = await request.form()
+    return await save_vote(request.app.state.db, form["team"])
+
+
+async def metrics(request: Request) -> Response:
+    """Reports connection pool usage, when ENABLE_METRICS is set, as in app.py."""
+    if not os.environ.get("ENABLE_METRICS"):
+        return Response(status_code=404)
+    return JSONResponse({"pool": pool_status(request.app.state.db.sync_engine)})
+
+
+app = Starlette(
+    routes=[
+        Route("/", render_index, methods=["GET"]),
+        Route("/votes", cast_vote, methods=["POST"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
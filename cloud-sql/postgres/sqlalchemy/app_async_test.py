@@ -0,0 +1,84 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from typing import Iterator
+
+import pytest
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.testclient import TestClient
+
+import app_async
+
+
+# load proper environment variables
+def setup_test_env():
+    os.environ["DB_USER"] = os.environ["POSTGRES_USER"]
+    os.environ["DB_PASS"] = os.environ["POSTGRES_PASSWORD"]
+    os.environ["DB_NAME"] = os.environ["POSTGRES_DATABASE"]
+    os.environ["DB_PORT"] = os.environ["POSTGRES_PORT"]
+    os.environ["INSTANCE_UNIX_SOCKET"] = os.environ["POSTGRES_UNIX_SOCKET"]
+    os.environ["INSTANCE_HOST"] = os.environ["POSTGRES_INSTANCE_HOST"]
+    os.environ["INSTANCE_CONNECTION_NAME"] = os.environ["POSTGRES_INSTANCE"]
+
+
+@pytest.fixture(scope="module")
+def client() -> Iterator[TestClient]:
+    setup_test_env()
+    # Entering the client runs the app's startup and shutdown.
+    with TestClient(app_async.app) as client:
+        yield client
+
+
+def test_get_votes(client: TestClient) -> None:
+    response = client.get("/")
+    assert response.status_code == 200
+    assert "Tabs VS Spaces" in response.text
+
+
+async def count_votes(db: AsyncEngine, team: str) -> int:
+    async with db.connect() as conn:
+        return (
+            await conn.execute(
+                sqlalchemy.text("SELECT COUNT(*) FROM votes WHERE candidate=:team"),
+                {"team": team},
+            )
+        ).scalar()
+
+
+def test_cast_vote(client: TestClient) -> None:
+    db = client.app.state.db
+    votes = client.portal.call(count_votes, db, "SPACES")
+
+    response = client.post("/votes", data={"team": "SPACES"})
+    assert response.status_code == 200
+    assert "Vote successfully cast for 'SPACES'" in response.text
+    assert client.portal.call(count_votes, db, "SPACES") == votes + 1
+
+
+def test_invalid_vote(client: TestClient) -> None:
+    response = client.post("/votes", data={"team": "EMACS"})
+    assert response.status_code == 400
+
+
+def test_metrics(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("ENABLE_METRICS", raising=False)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setenv("ENABLE_METRICS", "true")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    # The pool was warmed up at startup.
+    assert response.json()["pool"]["checked_in"] >= 1
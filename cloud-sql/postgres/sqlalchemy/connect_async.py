@@ -0,0 +1,156 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Async connection pools for a Cloud SQL instance of Postgres.
+
+These mirror connect_tcp.py, connect_unix.py and connect_connector.py, using
+SQLAlchemy's asyncio extension with the asyncpg driver. Queries then wait on
+the event loop instead of blocking a worker thread each.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+
+from google.cloud.sql.connector import create_async_connector, IPTypes
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+# Connectors created for each engine, closed by dispose_pool.
+_connectors: dict = {}
+
+
+def pool_options() -> dict:
+    """Returns pool sizing options, with the defaults of the synchronous pools.
+
+    Tune them with DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and
+    DB_POOL_RECYCLE.
+    """
+    return {
+        # Pool size is the maximum number of permanent connections to keep.
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        # Temporarily exceeds the set pool_size if no connections are available.
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 2)),
+        # 'pool_timeout' is the maximum number of seconds to wait when retrieving a
+        # new connection from the pool.
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        # 'pool_recycle' is the maximum number of seconds a connection can persist.
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    }
+
+
+def connect_tcp_socket_async() -> AsyncEngine:
+    """Initializes an async TCP connection pool for Postgres."""
+    return create_async_engine(
+        # Equivalent URL:
+        # postgresql+asyncpg://<db_user>:<db_pass>@<db_host>:<db_port>/<db_name>
+        sqlalchemy.engine.url.URL.create(
+            drivername="postgresql+asyncpg",
+            username=os.environ["DB_USER"],
+            password=os.environ["DB_PASS"],
+            host=os.environ["INSTANCE_HOST"],
+            port=os.environ["DB_PORT"],
+            database=os.environ["DB_NAME"],
+        ),
+        **pool_options(),
+    )
+
+
+def connect_unix_socket_async() -> AsyncEngine:
+    """Initializes an async Unix socket connection pool for Postgres."""
+    return create_async_engine(
+        # Equivalent URL:
+        # postgresql+asyncpg://<db_user>:<db_pass>@/<db_name>
+        #                         ?host=<INSTANCE_UNIX_SOCKET>
+        # asyncpg takes the directory holding the socket as `host`.
+        sqlalchemy.engine.url.URL.create(
+            drivername="postgresql+asyncpg",
+            username=os.environ["DB_USER"],
+            password=os.environ["DB_PASS"],
+            database=os.environ["DB_NAME"],
+            query={"host": os.environ["INSTANCE_UNIX_SOCKET"]},
+        ),
+        **pool_options(),
+    )
+
+
+async def connect_with_connector_async() -> AsyncEngine:
+    """Initializes an async connection pool using the Cloud SQL Python Connector.
+
+    Uses Automatic IAM Database Authentication when DB_IAM_USER is set.
+    """
+    instance_connection_name = os.environ["INSTANCE_CONNECTION_NAME"]
+    db_iam_user = os.environ.get("DB_IAM_USER")
+    ip_type = IPTypes.PRIVATE if os.environ.get("PRIVATE_IP") else IPTypes.PUBLIC
+
+    # The async connector must be created on the event loop that uses it.
+    connector = await create_async_connector()
+    credentials = (
+        {"user": db_iam_user, "enable_iam_auth": True}
+        if db_iam_user
+        else {"user": os.environ["DB_USER"], "password": os.environ["DB_PASS"]}
+    )
+
+    async def getconn():
+        return await connector.connect_async(
+            instance_connection_name,
+            "asyncpg",
+            db=os.environ["DB_NAME"],
+            ip_type=ip_type,
+            **credentials,
+        )
+
+    engine = create_async_engine(
+        "postgresql+asyncpg://", async_creator=getconn, **pool_options()
+    )
+    _connectors[engine] = connector
+    return engine
+
+
+async def init_connection_pool_async() -> AsyncEngine:
+    """Sets up an async connection pool, chosen like app.init_connection_pool."""
+    if os.environ.get("INSTANCE_HOST"):
+        return connect_tcp_socket_async()
+    if os.environ.get("INSTANCE_UNIX_SOCKET"):
+        return connect_unix_socket_async()
+    if os.environ.get("INSTANCE_CONNECTION_NAME"):
+        return await connect_with_connector_async()
+    raise ValueError(
+        "Missing database connection type. Please define one of INSTANCE_HOST, INSTANCE_UNIX_SOCKET, or INSTANCE_CONNECTION_NAME"
+    )
+
+
+async def prewarm_pool(engine: AsyncEngine, connections: int | None = None) -> None:
+    """Opens `connections` pooled connections up front, the pool size by default.
+
+    The first requests after startup then skip the TCP, TLS and
+    authentication handshakes of opening connections.
+    """
+    if connections is None:
+        connections = engine.pool.size()
+    # Hold every connection at once, otherwise the pool would hand the same
+    # connection out again.
+    opened = await asyncio.gather(
+        *(engine.connect().start() for _ in range(connections))
+    )
+    await asyncio.gather(*(conn.close() for conn in opened))
+
+
+async def dispose_pool(engine: AsyncEngine) -> None:
+    """Closes the pool's connections, and its connector if it has one."""
+    await engine.dispose()
+    connector = _connectors.pop(engine, None)
+    if connector is not None:
+        await connector.close_async()
@@ -0,0 +1,109 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Drives a running vote app with concurrent keep-alive HTTP clients.
+
+Compare the threaded and the async app, each with one worker process:
+
+    gunicorn --bind :8080 --workers 1 --threads 8 app:app
+    uvicorn app_async:app --port 8080 --workers 1
+
+    python load_benchmark.py http://127.0.0.1:8080 --clients 64 --seconds 30
+
+Every client alternates between loading the index page and casting a vote.
+Requests per second and latency percentiles are reported per worker process.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+import urllib.parse
+
+VOTE_BODY = b"team=TABS"
+
+
+async def _request(reader, writer, host: str, method: str, path: str) -> int:
+    """Sends one HTTP/1.1 request on a kept-alive connection and reads it back."""
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+    body = b""
+    if method == "POST":
+        body = VOTE_BODY
+        head += (
+            "Content-Type: application/x-www-form-urlencoded\r\n"
+            f"Content-Length: {len(body)}\r\n"
+        )
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(url, deadline: float, latencies: list, errors: list) -> None:
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    try:
+        request = 0
+        while time.monotonic() < deadline:
+            method, path = ("POST", "/votes") if request % 2 else ("GET", "/")
+            start = time.perf_counter()
+            status = await _request(reader, writer, url.netloc, method, path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            request += 1
+    finally:
+        writer.close()
+
+
+async def run(url: str, clients: int, seconds: float, workers: int) -> None:
+    parsed = urllib.parse.urlsplit(url)
+    latencies: list[float] = []
+    errors: list[int] = []
+    deadline = time.monotonic() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(_client(parsed, deadline, latencies, errors) for _ in range(clients))
+    )
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{len(latencies)} requests, {len(errors)} errors, "
+        f"{len(latencies) / elapsed / workers:.0f} req/s per worker, "
+        f"p50 {quantiles[49] * 1000:.1f}ms, p95 {quantiles[94] * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("url", help="Base URL of the running app.")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker processes serving the app."
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, args.clients, args.seconds, args.workers))
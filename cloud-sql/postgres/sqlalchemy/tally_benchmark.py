@@ -0,0 +1,102 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures index page queries as the votes table grows.
+
+Seeds votes in steps up to `--votes` and, at each step, times the original
+per-candidate COUNT queries against get_index_context, which reads the
+vote_tallies table. Run it against a scratch database, for example:
+
+    INSTANCE_HOST=127.0.0.1 DB_PORT=5432 DB_USER=postgres DB_PASS=postgres \\
+        DB_NAME=votes_bench python tally_benchmark.py --votes 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Callable
+
+import sqlalchemy
+
+import app
+
+
+def count_votes(db: sqlalchemy.engine.base.Engine) -> None:
+    """The index page queries used before vote_tallies existed."""
+    stmt = sqlalchemy.text(
+        "SELECT COUNT(vote_id) FROM votes WHERE candidate=:candidate"
+    )
+    with db.connect() as conn:
+        for candidate in app.CANDIDATES:
+            conn.execute(stmt, parameters={"candidate": candidate}).scalar()
+
+
+def seed_votes(db: sqlalchemy.engine.base.Engine, count: int) -> None:
+    """Inserts `count` votes and adds them to the tallies."""
+    with db.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                "INSERT INTO votes (time_cast, candidate) "
+                "SELECT now() - n * interval '1 second', "
+                "CASE WHEN n % 2 = 0 THEN 'TABS' ELSE 'SPACES' END "
+                "FROM generate_series(1, :count) AS n"
+            ),
+            parameters={"count": count},
+        )
+        conn.execute(
+            sqlalchemy.text(
+                "UPDATE vote_tallies SET vote_count = vote_count + "
+                "CASE WHEN candidate = 'TABS' THEN :count / 2 "
+                "ELSE :count - :count / 2 END"
+            ),
+            parameters={"count": count},
+        )
+        conn.commit()
+        conn.execute(sqlalchemy.text("ANALYZE votes"))
+
+
+def p95(fn: Callable[[], object], requests: int) -> float:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.quantiles(latencies, n=20)[-1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--votes", type=int, default=1_000_000)
+    parser.add_argument("--steps", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    db = app.init_connection_pool()
+    app.migrate_db(db)
+
+    seeded = 0
+    for step in range(1, args.steps + 1):
+        target = args.votes * step // args.steps
+        seed_votes(db, target - seeded)
+        seeded = target
+        print(
+            f"{seeded} votes: COUNT queries p95 "
+            f"{p95(lambda: count_votes(db), args.requests):.2f} ms, "
+            "tallies p95 "
+            f"{p95(lambda: app.get_index_context(db, max_age=0), args.requests):.2f} ms"
+        )
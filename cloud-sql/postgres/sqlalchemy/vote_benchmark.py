@@ -0,0 +1,96 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares votes/sec with and without batched vote ingestion.
+
+Casts votes from many threads through save_vote, first one transaction per
+vote, then through a VoteWriter. Samples pool saturation along the way. Run
+it against a scratch database, for example:
+
+    INSTANCE_HOST=127.0.0.1 DB_PORT=5432 DB_USER=postgres DB_PASS=postgres \\
+        DB_NAME=votes_bench python vote_benchmark.py --votes 20000 --threads 64
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent import futures
+import os
+import threading
+import time
+
+import sqlalchemy
+
+import app
+from vote_writer import pool_status, VoteWriter
+
+
+def cast_votes(
+    db: sqlalchemy.engine.base.Engine,
+    votes: int,
+    threads: int,
+    writer: VoteWriter | None = None,
+) -> tuple[float, int, float]:
+    """Returns votes/sec, failed votes and peak pool saturation."""
+    peak = 0.0
+    done = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak
+        while not done.wait(0.01):
+            peak = max(peak, pool_status(db).get("saturation", 0))
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    start = time.perf_counter()
+    with futures.ThreadPoolExecutor(threads) as executor:
+        responses = list(
+            executor.map(
+                lambda i: app.save_vote(db, app.CANDIDATES[i % 2], writer),
+                range(votes),
+            )
+        )
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    failed = sum(response.status_code != 200 for response in responses)
+    return (votes - failed) / elapsed, failed, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--votes", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--interval-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    db = app.init_connection_pool()
+    app.migrate_db(db)
+
+    rate, failed, peak = cast_votes(db, args.votes, args.threads)
+    print(
+        f"one transaction per vote: {rate:.0f} votes/s, {failed} failed, "
+        f"peak pool saturation {peak:.0%}"
+    )
+
+    os.environ["VOTE_BATCH_INTERVAL_MS"] = str(args.interval_ms)
+    writer = app.init_vote_writer(db)
+    rate, failed, peak = cast_votes(db, args.votes, args.threads, writer)
+    writer.close()
+    print(
+        f"batched: {rate:.0f} votes/s, {failed} failed, "
+        f"peak pool saturation {peak:.0%}, {writer.stats()}"
+    )
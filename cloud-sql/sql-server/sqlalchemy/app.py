@@ -17,9 +17,12 @@ from __future__ import annotations
 import datetime
 import logging
 import os
+import threading
+import time
 
-from flask import Flask, render_template, request, Response
+from flask import Flask, jsonify, render_template, request, Response
 import sqlalchemy
+from sqlalchemy import BigInteger
 from sqlalchemy import Column
 from sqlalchemy import DateTime
 from sqlalchemy import Integer
@@ -28,11 +31,18 @@ from sqlalchemy import Table
 
 from connect_connector import connect_with_connector
 from connect_tcp import connect_tcp_socket
+from vote_writer import pool_status, VoteWriter
 
 app = Flask(__name__)
 
 logger = logging.getLogger()
 
+CANDIDATES = ("TABS", "SPACES")
+
+# The index page is rendered from an in-process copy of its data for this
+# many seconds, so a burst of page loads costs a single round of queries.
+INDEX_CACHE_TTL = 2.0
+
 
 def init_connection_pool() -> sqlalchemy.engine.base.Engine:
     # use a TCP socket when INSTANCE_HOST (e.g. 127.0.0.1) is defined
@@ -51,8 +61,8 @@ def init_connection_pool() -> sqlalchemy.engine.base.Engine:
 # create 'votes' table in database if it does not already exist
 def migrate_db(db: sqlalchemy.engine.base.Engine) -> None:
     inspector = sqlalchemy.inspect(db)
+    metadata = sqlalchemy.MetaData()
     if not inspector.has_table("votes"):
-        metadata = sqlalchemy.MetaData(db)
         Table(
             "votes",
             metadata,
@@ -60,7 +70,75 @@ def migrate_db(db: sqlalchemy.engine.base.Engine) -> None:
             Column("time_cast", DateTime, nullable=False),
             Column("candidate", String(6), nullable=False),
         )
-        metadata.create_all()
+    # Running totals per candidate, kept up to date by save_vote, so the
+    # index page never has to count the votes table.
+    if not inspector.has_table("vote_tallies"):
+        Table(
+            "vote_tallies",
+            metadata,
+            Column("candidate", String(6), primary_key=True, nullable=False),
+            Column("vote_count", BigInteger, nullable=False),
+        )
+    metadata.create_all(db)
+
+    with db.connect() as conn:
+        # Serves the recent votes query without sorting the whole table.
+        indexes = sqlalchemy.inspect(conn).get_indexes("votes")
+        if "votes_time_cast_idx" not in {index["name"] for index in indexes}:
+            conn.execute(
+                sqlalchemy.text(
+                    "CREATE INDEX votes_time_cast_idx ON votes (time_cast);"
+                )
+            )
+            conn.commit()
+        seed_vote_tallies(conn)
+
+
+def seed_vote_tallies(conn: sqlalchemy.engine.base.Connection) -> None:
+    """Creates the missing tally rows, counting the votes cast before them."""
+    for candidate in CANDIDATES:
+        create_tally(conn, candidate)
+    conn.commit()
+
+
+def create_tally(conn: sqlalchemy.engine.base.Connection, candidate: str) -> bool:
+    """Creates a candidate's tally row from a count of their votes.
+
+    The row is created by a single statement, so it is never created twice.
+    Returns False if the row already exists.
+    """
+    stmt = sqlalchemy.text(
+        "MERGE vote_tallies WITH (HOLDLOCK) AS tally "
+        "USING (SELECT :candidate AS candidate, COUNT(vote_id) AS vote_count "
+        "FROM votes WHERE candidate=:candidate AND NOT EXISTS "
+        "(SELECT 1 FROM vote_tallies WHERE candidate=:candidate)) AS source "
+        "ON tally.candidate = source.candidate "
+        "WHEN NOT MATCHED THEN INSERT (candidate, vote_count) "
+        "VALUES (source.candidate, source.vote_count);"
+    )
+    return conn.execute(stmt, parameters={"candidate": candidate}).rowcount > 0
+
+
+def add_to_tally(
+    conn: sqlalchemy.engine.base.Connection, candidate: str, count: int = 1
+) -> None:
+    """Adds votes to a candidate's tally in the caller's transaction.
+
+    A missing tally row is created from a count of the votes table, which
+    already holds the votes inserted by this transaction.
+    """
+    stmt = sqlalchemy.text(
+        "UPDATE vote_tallies SET vote_count = vote_count + :count "
+        "WHERE candidate=:candidate"
+    )
+    parameters = {"candidate": candidate, "count": count}
+    if conn.execute(stmt, parameters=parameters).rowcount:
+        return
+    if create_tally(conn, candidate):
+        return
+    # Another transaction created the row first. It could not see the votes
+    # of this one, so they are still added.
+    conn.execute(stmt, parameters=parameters)
 
 
 # This global variable is declared with a value of `None`, instead of calling
@@ -69,16 +147,22 @@ def migrate_db(db: sqlalchemy.engine.base.Engine) -> None:
 # -- there is no need to wait for the first request.
 db = None
 
+# Set VOTE_BATCH_INTERVAL_MS to write concurrent votes in batches, see
+# vote_writer.py. Cloud Functions instances handle one request at a time,
+# so main.py keeps writing votes one by one.
+vote_writer = None
+
 
 # init_db lazily instantiates a database connection pool. Users of Cloud Run or
 # App Engine may wish to skip this lazy instantiation and connect as soon
 # as the function is loaded. This is primarily to help testing.
 @app.before_request
 def init_db() -> sqlalchemy.engine.base.Engine:
-    global db
+    global db, vote_writer
     if db is None:
         db = init_connection_pool()
         migrate_db(db)
+        vote_writer = init_vote_writer(db)
 
 
 @app.route("/", methods=["GET"])
@@ -90,10 +174,62 @@ def render_index() -> str:
 @app.route("/votes", methods=["POST"])
 def cast_vote() -> Response:
     team = request.form["team"]
-    return save_vote(db, team)
+    return save_vote(db, team, vote_writer)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics() -> Response:
+    """Reports connection pool usage and vote batching statistics.
+
+    The endpoint isn't authenticated, so it's only served when the
+    ENABLE_METRICS environment variable is set.
+    """
+    if not os.environ.get("ENABLE_METRICS"):
+        return Response(status=404)
+    return jsonify(
+        pool=pool_status(db),
+        vote_writer=vote_writer.stats() if vote_writer else None,
+    )
+
+
+def init_vote_writer(db: sqlalchemy.engine.base.Engine) -> VoteWriter | None:
+    """Starts a VoteWriter when VOTE_BATCH_INTERVAL_MS is set."""
+    interval_ms = os.environ.get("VOTE_BATCH_INTERVAL_MS")
+    if not interval_ms:
+        return None
+    return VoteWriter(
+        db,
+        sqlalchemy.table(
+            "votes", sqlalchemy.column("time_cast"), sqlalchemy.column("candidate")
+        ),
+        add_to_tally,
+        interval=float(interval_ms) / 1000,
+    )
+
 
+# (engine, time fetched, context) of the last index page data
+_index_cache = None
+_index_cache_lock = threading.Lock()
 
-def get_index_context(db: sqlalchemy.engine.base.Engine) -> dict:
+
+def invalidate_index_cache() -> None:
+    """Makes the next get_index_context call read from the database."""
+    global _index_cache
+    with _index_cache_lock:
+        _index_cache = None
+
+
+def get_index_context(
+    db: sqlalchemy.engine.base.Engine, max_age: float = INDEX_CACHE_TTL
+) -> dict:
+    # Reuses data fetched less than max_age seconds ago
+    global _index_cache
+    with _index_cache_lock:
+        cached = _index_cache
+    if cached and cached[0] is db and time.monotonic() - cached[1] < max_age:
+        return dict(cached[2])
+
+    fetched = time.monotonic()
     votes = []
     with db.connect() as conn:
         # Execute the query and fetch all results
@@ -106,31 +242,53 @@ def get_index_context(db: sqlalchemy.engine.base.Engine) -> dict:
         for row in recent_votes:
             votes.append({"candidate": row[0], "time_cast": row[1]})
 
-        stmt = sqlalchemy.text(
-            "SELECT COUNT(vote_id) FROM votes WHERE candidate=:candidate"
+        # Read the running totals instead of counting the votes table
+        tallies = dict(
+            conn.execute(
+                sqlalchemy.text("SELECT candidate, vote_count FROM vote_tallies")
+            ).fetchall()
         )
-        # Count number of votes for tabs
-        tab_count = conn.execute(stmt, parameters={"candidate": "TABS"}).scalar()
-        # Count number of votes for spaces
-        space_count = conn.execute(stmt, parameters={"candidate": "SPACES"}).scalar()
-    return {
+
+    context = {
         "recent_votes": votes,
-        "space_count": space_count,
-        "tab_count": tab_count,
+        "space_count": tallies.get("SPACES", 0),
+        "tab_count": tallies.get("TABS", 0),
     }
+    with _index_cache_lock:
+        _index_cache = (db, fetched, context)
+    return dict(context)
 
 
 @app.route("/votes", methods=["POST"])
-def save_vote(db: sqlalchemy.engine.base.Engine, team: str) -> Response:
+def save_vote(
+    db: sqlalchemy.engine.base.Engine, team: str, writer: VoteWriter | None = None
+) -> Response:
     time_cast = datetime.datetime.now(tz=datetime.timezone.utc)
     # Verify that the team is one of the allowed options
-    if team != "TABS" and team != "SPACES":
+    if team not in CANDIDATES:
         logger.warning(f"Received invalid 'team' property: '{team}'")
         return Response(
             response="Invalid team specified. Should be one of 'TABS' or 'SPACES'",
             status=400,
         )
 
+    if writer is not None:
+        try:
+            # Returns once the batch holding this vote has been committed.
+            writer.write({"time_cast": time_cast, "candidate": team})
+        except Exception as e:
+            logger.exception(e)
+            return Response(
+                status=500,
+                response="Unable to successfully cast vote! Please check the "
+                "application logs for more details.",
+            )
+        invalidate_index_cache()
+        return Response(
+            status=200,
+            response=f"Vote successfully cast for '{team}' at time {time_cast}!",
+        )
+
     # [START cloud_sql_sqlserver_sqlalchemy_connection]
     # Preparing a statement before hand can help protect against injections.
     stmt = sqlalchemy.text(
@@ -141,7 +299,13 @@ def save_vote(db: sqlalchemy.engine.base.Engine, team: str) -> Response:
         # back into the pool at the end of statement (even if an error occurs)
         with db.connect() as conn:
             conn.execute(stmt, parameters={"time_cast": time_cast, "candidate": team})
+            # [START_EXCLUDE]
+            # The vote and its tally are committed in the same transaction.
+            add_to_tally(conn, team)
+            # [END_EXCLUDE]
             conn.commit()
+        # Show the new vote on the next page load served by this instance.
+        invalidate_index_cache()
     except Exception as e:
         # If something goes wrong, handle the error in this section. This might
         # involve retrying or adjusting parameters depending on the situation.
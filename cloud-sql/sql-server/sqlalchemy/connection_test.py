@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent import futures
 import logging
 import os
 
@@ -20,6 +21,7 @@ from google.auth import default
 import google.auth.transport.requests
 import pytest
 import requests
+import sqlalchemy
 
 import app
 
@@ -94,6 +96,65 @@ def test_cast_vote(client: FlaskClient) -> None:
     assert text in body
 
 
+def test_vote_tally(client: FlaskClient) -> None:
+    client.get("/")
+    before = app.get_index_context(app.db, max_age=0)
+    response = client.post("/votes", data={"team": "TABS"})
+    assert response.status_code == 200
+    after = app.get_index_context(app.db)
+    # Other test runs may share the database and vote concurrently.
+    assert after["tab_count"] >= before["tab_count"] + 1
+    assert after["recent_votes"]
+
+
+def test_add_to_tally_creates_missing_row(client: FlaskClient) -> None:
+    client.get("/")
+    with app.db.connect() as conn:
+        conn.execute(sqlalchemy.text("DELETE FROM vote_tallies WHERE candidate='TABS'"))
+        votes = conn.execute(
+            sqlalchemy.text("SELECT COUNT(vote_id) FROM votes WHERE candidate='TABS'")
+        ).scalar()
+        app.add_to_tally(conn, "TABS")
+        tally = conn.execute(
+            sqlalchemy.text(
+                "SELECT vote_count FROM vote_tallies WHERE candidate='TABS'"
+            )
+        ).scalar()
+        # Leave the shared database as it was.
+        conn.rollback()
+    assert tally == votes
+
+
+def test_vote_writer(client: FlaskClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    client.get("/")
+    monkeypatch.setenv("VOTE_BATCH_INTERVAL_MS", "20")
+    writer = app.init_vote_writer(app.db)
+    before = app.get_index_context(app.db, max_age=0)
+    with futures.ThreadPoolExecutor(10) as executor:
+        responses = list(
+            executor.map(lambda _: app.save_vote(app.db, "SPACES", writer), range(20))
+        )
+    writer.close()
+
+    assert all(response.status_code == 200 for response in responses)
+    stats = writer.stats()
+    assert stats["votes"] == 20
+    # Concurrent votes share transactions.
+    assert stats["batches"] < 20
+    after = app.get_index_context(app.db)
+    assert after["space_count"] >= before["space_count"] + 20
+
+
+def test_metrics(client: FlaskClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("ENABLE_METRICS", raising=False)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setenv("ENABLE_METRICS", "true")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "pool" in response.get_json()
+
+
 def test_connector_connection(client: FlaskClient) -> None:
     del os.environ["INSTANCE_HOST"]
     app.db = app.init_connection_pool()
@@ -0,0 +1,170 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Batches concurrent votes into multi-row INSERTs (group commit).
+
+Inserting one vote per request needs one pooled connection and one commit
+per request, so bursts of votes exhaust the connection pool. A VoteWriter
+collects the votes submitted within a few milliseconds. One background
+thread writes them in a single transaction: one INSERT with a VALUES row
+per vote, plus one tally update per candidate. Callers are acknowledged once their batch has
+committed, so a vote is never reported as cast before it is durable.
+"""
+
+from __future__ import annotations
+
+import collections
+from concurrent import futures
+import queue
+import threading
+import time
+from typing import Callable
+
+import sqlalchemy
+
+# SQL Server accepts at most 1000 rows in one VALUES list.
+MAX_ROWS_PER_INSERT = 1000
+
+
+class VoteWriter:
+    """Writes votes in batches from a background thread.
+
+    Args:
+        db: the engine votes are written to.
+        votes_table: the table votes are inserted into. Its columns are the
+            keys of each vote.
+        add_to_tally: called as `add_to_tally(conn, candidate, count)` to add
+            a batch's votes to a candidate's tally.
+        interval: seconds to wait for more votes after the first one.
+        max_batch: the maximum number of votes per transaction.
+    """
+
+    def __init__(
+        self,
+        db: sqlalchemy.engine.base.Engine,
+        votes_table: sqlalchemy.sql.expression.TableClause,
+        add_to_tally: Callable[[sqlalchemy.engine.base.Connection, str, int], None],
+        interval: float = 0.005,
+        max_batch: int = 500,
+    ) -> None:
+        self.db = db
+        self._votes_table = votes_table
+        self._add_to_tally = add_to_tally
+        self._interval = interval
+        self._max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, vote: dict) -> futures.Future:
+        """Queues a vote. The future resolves once its batch commits."""
+        future: futures.Future = futures.Future()
+        self._queue.put((vote, future))
+        return future
+
+    def write(self, vote: dict, timeout: float = 30) -> None:
+        """Queues a vote and waits until it is committed."""
+        self.submit(vote).result(timeout)
+
+    def stats(self) -> dict:
+        """Returns counts of written votes, batches and failures."""
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats.get("batches", 0)
+        stats["mean_batch_size"] = stats.get("votes", 0) / batches if batches else 0
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def close(self) -> None:
+        """Writes the votes still queued and stops the background thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _next_batch(self) -> tuple[list, bool]:
+        batch = [self._queue.get()]
+        if batch[0] is None:
+            return [], True
+        deadline = time.monotonic() + self._interval
+        while len(batch) < self._max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                # close() was called, write what was collected and stop.
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        closed = False
+        while not closed:
+            batch, closed = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch: list) -> None:
+        votes = [vote for vote, _ in batch]
+        counts = collections.Counter(vote["candidate"] for vote in votes)
+        try:
+            with self.db.begin() as conn:
+                # Render the rows into the statement itself. A list of
+                # parameters would be an executemany, which pg8000 and
+                # pytds send as one INSERT per row.
+                for start in range(0, len(votes), MAX_ROWS_PER_INSERT):
+                    conn.execute(
+                        sqlalchemy.insert(self._votes_table).values(
+                            votes[start : start + MAX_ROWS_PER_INSERT]
+                        )
+                    )
+                for candidate, count in counts.items():
+                    self._add_to_tally(conn, candidate, count)
+        except Exception as e:
+            with self._lock:
+                self._stats["failed_batches"] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["votes"] += len(votes)
+            self._stats["max_batch_size"] = max(
+                self._stats["max_batch_size"], len(votes)
+            )
+        for _, future in batch:
+            future.set_result(None)
+
+
+def pool_status(db: sqlalchemy.engine.base.Engine) -> dict:
+    """Reports how much of the engine's connection pool is in use.
+
+    Saturation is the share of the pool's persistent connections checked
+    out. Above 1, overflow connections are open as well.
+    """
+    pool = db.pool
+    if not isinstance(pool, sqlalchemy.pool.QueuePool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "saturation": pool.checkedout() / pool.size() if pool.size() else 0,
+    }
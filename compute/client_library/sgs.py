@@ -20,15 +20,19 @@ from __future__ import annotations
 import argparse
 import ast
 from collections import defaultdict
+from concurrent import futures
 from dataclasses import dataclass
 from dataclasses import field
 import glob
+import hashlib
+import json
 import os
 from pathlib import Path
 import re
-import subprocess
+import sys
 import warnings
 
+import black
 import isort
 
 INGREDIENTS_START = re.compile(r"\s*#\s*<INGREDIENT ([\w\d_-]+)>")
@@ -50,6 +54,10 @@ DEFAULT_OUTPUT_PATH = Path("snippets")
 INGREDIENTS_PATH = Path("ingredients")
 RECIPES_PATH = Path("recipes")
 
+# Stored in the output directory, with the hashes of the recipes and ingredients
+# each snippet was generated from. Hidden from glob, so it's not an output file.
+CACHE_FILE_NAME = ".sgs_cache.json"
+
 
 @dataclass
 class ImportItem:
@@ -78,6 +86,7 @@ class Ingredient:
     imports_from: list[tuple[str, ImportItem]] = field(default_factory=list)
     text: str = ""
     name: str = ""
+    digest: str = ""
 
     def __repr__(self):
         return f"<Ingredient: {self.name}>"
@@ -144,6 +153,7 @@ def load_ingredient(path: Path) -> Ingredient:
         text="".join(ingredient_lines),
         simple_imports=simple_imports,
         imports_from=imports_from,
+        digest=hashlib.sha256(file_content.encode()).hexdigest(),
     )
 
 
@@ -254,55 +264,117 @@ def render_recipe(recipe: str, ingredients: dict) -> str:
     return os.linesep.join(output_file)
 
 
+def format_code(code: str) -> str:
+    """
+    Formats a rendered recipe with black. Code that black can't parse
+    is returned unchanged.
+    """
+    try:
+        return black.format_str(code, mode=black.Mode())
+    except black.InvalidInput:
+        return code
+
+
+def _tools_digest() -> bytes:
+    """
+    Identifies everything besides the recipe and ingredients that affects
+    the generated snippets: this script and the versions of the formatters.
+    """
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    digest.update(f"black {black.__version__} isort {isort.__version__}".encode())
+    return digest.digest()
+
+
+def recipe_digest(recipe: str, ingredients: dict, tools_digest: bytes = b"") -> str:
+    """
+    Returns a hash of a recipe and of the ingredients it uses, which changes
+    whenever the snippet rendered from the recipe could change.
+    """
+    digest = hashlib.sha256(tools_digest)
+    digest.update(recipe.encode())
+    for line in recipe.splitlines():
+        match = INGREDIENT_FILL.match(line)
+        if match:
+            digest.update(match.group(1).encode())
+            digest.update(ingredients[match.group(1)].digest.encode())
+    return digest.hexdigest()
+
+
+def _file_digest(path: Path) -> str | None:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+_worker_ingredients = {}
+
+
+def _init_worker(ingredients: dict) -> None:
+    global _worker_ingredients
+    _worker_ingredients = ingredients
+
+
+def _render_and_format(recipe: str) -> str:
+    return format_code(render_recipe(recipe, _worker_ingredients))
+
+
+def render_recipes(recipes: dict, ingredients: dict, jobs: int | None = None) -> dict:
+    """
+    Renders and formats recipes in parallel, in worker processes.
+    Returns the formatted snippets by recipe path.
+    """
+    if jobs == 1 or len(recipes) < 2:
+        _init_worker(ingredients)
+        return {path: _render_and_format(recipe) for path, recipe in recipes.items()}
+    with futures.ProcessPoolExecutor(
+        jobs, initializer=_init_worker, initargs=(ingredients,)
+    ) as executor:
+        rendered = executor.map(_render_and_format, recipes.values(), chunksize=4)
+        return dict(zip(recipes.keys(), rendered))
+
+
+def output_path_for(
+    recipe_path: Path,
+    output_dir: Path = DEFAULT_OUTPUT_PATH,
+    recipes_path: Path = RECIPES_PATH,
+) -> Path:
+    return output_dir / recipe_path.relative_to(recipes_path)
+
+
 def save_rendered_recipe(
     recipe_path: Path,
     rendered_recipe: str,
     output_dir: Path = DEFAULT_OUTPUT_PATH,
     recipes_path: Path = RECIPES_PATH,
 ) -> Path:
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / recipe_path.relative_to(recipes_path)
+    output_path = output_path_for(recipe_path, output_dir, recipes_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     with output_path.open(mode="w") as out_file:
         out_file.write(rendered_recipe)
-
-    subprocess.run(
-        ["black", str(output_path)],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
     return output_path
 
 
-def generate(
-    args: argparse.Namespace,
-    ingredients_path: Path = INGREDIENTS_PATH,
-    recipes_path: Path = RECIPES_PATH,
-):
-    ingredients = load_ingredients(ingredients_path)
-    recipes = load_recipes(recipes_path)
+def load_cache(output_dir: Path) -> dict:
+    try:
+        with (output_dir / CACHE_FILE_NAME).open() as cache_file:
+            return json.load(cache_file)
+    except (FileNotFoundError, ValueError):
+        return {}
 
-    updated_paths = set()
 
-    for path, recipe in recipes.items():
-        rendered = render_recipe(recipe, ingredients)
-        out = save_rendered_recipe(
-            path.absolute(),
-            rendered,
-            recipes_path=recipes_path.absolute(),
-            output_dir=Path(args.output_dir),
-        )
-        updated_paths.add(str(out))
+def save_cache(output_dir: Path, cache: dict) -> None:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with (output_dir / CACHE_FILE_NAME).open(mode="w") as cache_file:
+        json.dump(cache, cache_file, indent=1, sort_keys=True)
 
-    print("Generated files:")
-    for file in sorted(updated_paths):
-        print(f" - {repr(file)}")
 
-    all_files = glob.glob(f"{args.output_dir}/**", recursive=True)
+def report_unknown_files(output_dir: Path, known_paths: set[str]) -> None:
+    all_files = glob.glob(f"{output_dir}/**", recursive=True)
     unknown_files = set()
     for file in all_files:
-        if file in updated_paths:
+        if file in known_paths:
             continue
         if any(pattern.match(file) for pattern in IGNORED_OUTPUT_FILES):
             continue
@@ -318,9 +390,103 @@ def generate(
             print(f" - {repr(file)}")
 
 
-def verify(args: argparse.Namespace):
-    # TODO: Needs to check if the files are up to date. Will be used to auto-check every commit.
-    pass
+def generate(
+    args: argparse.Namespace,
+    ingredients_path: Path = INGREDIENTS_PATH,
+    recipes_path: Path = RECIPES_PATH,
+) -> list[Path]:
+    """
+    Generates the snippets whose recipe or ingredients changed since they
+    were last generated, or whose file is missing or was modified. All
+    snippets are generated with `args.force`.
+
+    Returns the paths of the generated snippets.
+    """
+    output_dir = Path(args.output_dir)
+    ingredients = load_ingredients(ingredients_path)
+    recipes = load_recipes(recipes_path)
+    cache = {} if getattr(args, "force", False) else load_cache(output_dir)
+    tools_digest = _tools_digest()
+
+    new_cache = {}
+    outdated = {}
+    output_paths = {}
+    for path, recipe in recipes.items():
+        output_path = output_path_for(
+            path.absolute(), output_dir, recipes_path.absolute()
+        )
+        key = str(output_path.relative_to(output_dir))
+        entry = {"recipe": recipe_digest(recipe, ingredients, tools_digest)}
+        cached = cache.get(key, {})
+        if cached.get("recipe") == entry["recipe"] and cached.get(
+            "output"
+        ) == _file_digest(output_path):
+            new_cache[key] = cached
+        else:
+            outdated[path] = recipe
+            new_cache[key] = entry
+        output_paths[path] = output_path
+
+    updated_paths = []
+    for path, rendered in render_recipes(
+        outdated, ingredients, getattr(args, "jobs", None)
+    ).items():
+        out = save_rendered_recipe(
+            path.absolute(),
+            rendered,
+            recipes_path=recipes_path.absolute(),
+            output_dir=output_dir,
+        )
+        key = str(out.relative_to(output_dir))
+        new_cache[key]["output"] = _file_digest(out)
+        updated_paths.append(out)
+    save_cache(output_dir, new_cache)
+
+    print("Generated files:")
+    for file in sorted(map(str, updated_paths)):
+        print(f" - {repr(file)}")
+    print(f"{len(recipes) - len(updated_paths)} files were already up to date.")
+
+    report_unknown_files(output_dir, {str(out) for out in output_paths.values()})
+    return updated_paths
+
+
+def verify(
+    args: argparse.Namespace,
+    ingredients_path: Path = INGREDIENTS_PATH,
+    recipes_path: Path = RECIPES_PATH,
+) -> bool:
+    """
+    Checks that the snippets match their recipes and ingredients. The snippets
+    are rendered in memory and compared with the files, which are left as is.
+
+    Returns True if all the snippets are up to date.
+    """
+    output_dir = Path(args.output_dir)
+    ingredients = load_ingredients(ingredients_path)
+    recipes = load_recipes(recipes_path)
+
+    outdated = []
+    for path, rendered in render_recipes(
+        recipes, ingredients, getattr(args, "jobs", None)
+    ).items():
+        output_path = output_path_for(
+            path.absolute(), output_dir, recipes_path.absolute()
+        )
+        try:
+            up_to_date = output_path.read_text() == rendered
+        except FileNotFoundError:
+            up_to_date = False
+        if not up_to_date:
+            outdated.append(output_path)
+
+    if outdated:
+        print("Following files are outdated, run `python sgs.py generate`: ")
+        for file in sorted(map(str, outdated)):
+            print(f" - {repr(file)}")
+    else:
+        print(f"All {len(recipes)} files are up to date.")
+    return not outdated
 
 
 def parse_arguments():
@@ -332,18 +498,31 @@ def parse_arguments():
     gen_parser = subparsers.add_parser("generate", help="Generates the code samples.")
     gen_parser.set_defaults(func=generate)
     gen_parser.add_argument("--output_dir", default=DEFAULT_OUTPUT_PATH)
+    gen_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Generate all the samples, including the up to date ones.",
+    )
+    gen_parser.add_argument(
+        "--jobs", type=int, help="Number of worker processes, one per CPU by default."
+    )
 
     verify_parser = subparsers.add_parser(
         "verify", help="Verify if the generated samples match the sources."
     )
     verify_parser.set_defaults(func=verify)
+    verify_parser.add_argument("--output_dir", default=DEFAULT_OUTPUT_PATH)
+    verify_parser.add_argument(
+        "--jobs", type=int, help="Number of worker processes, one per CPU by default."
+    )
 
     return parser.parse_args()
 
 
 def main():
     args = parse_arguments()
-    args.func(args)
+    if args.func(args) is False:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
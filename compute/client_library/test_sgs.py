@@ -55,3 +55,52 @@ def test_snippets_freshness():
                     )
             elif test_file.is_dir():
                 assert match_file.is_dir()
+
+
+def test_sgs_generate_incremental():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        args = Namespace(output_dir=tmp_dir)
+        generated = sgs.generate(
+            args, FIXTURE_INGREDIENTS.absolute(), FIXTURE_RECIPES.absolute()
+        )
+        assert generated
+        assert not sgs.generate(
+            args, FIXTURE_INGREDIENTS.absolute(), FIXTURE_RECIPES.absolute()
+        )
+
+        # Modified or deleted snippets are generated again.
+        generated[0].write_text("# Edited by hand.\n")
+        generated[-1].unlink()
+        regenerated = sgs.generate(
+            args, FIXTURE_INGREDIENTS.absolute(), FIXTURE_RECIPES.absolute()
+        )
+        assert sorted(regenerated) == sorted({generated[0], generated[-1]})
+        for test_file in generated:
+            match_file = FIXTURE_OUTPUT / test_file.relative_to(tmp_dir)
+            assert test_file.read_bytes() == match_file.read_bytes()
+
+        args.force = True
+        assert sorted(
+            sgs.generate(
+                args, FIXTURE_INGREDIENTS.absolute(), FIXTURE_RECIPES.absolute()
+            )
+        ) == sorted(generated)
+
+
+def test_sgs_verify():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        args = Namespace(output_dir=tmp_dir)
+        assert not sgs.verify(
+            args, FIXTURE_INGREDIENTS.absolute(), FIXTURE_RECIPES.absolute()
+        )
+        generated = sgs.generate(
+            args, FIXTURE_INGREDIENTS.absolute(), FIXTURE_RECIPES.absolute()
+        )
+        assert sgs.verify(
+            args, FIXTURE_INGREDIENTS.absolute(), FIXTURE_RECIPES.absolute()
+        )
+
+        generated[0].write_text(generated[0].read_text() + "\n")
+        assert not sgs.verify(
+            args, FIXTURE_INGREDIENTS.absolute(), FIXTURE_RECIPES.absolute()
+        )
@@ -0,0 +1,230 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Chunked, concurrent multi-entity operations for Datastore.
+
+`put_multi`, `get_multi` and `delete_multi` send a single RPC, which fails
+once a call exceeds 500 mutations or 1000 lookup keys. The helpers here split
+large inputs at those limits, run the chunks concurrently and report
+throughput.
+
+Compare against a naive per-entity loop on the emulator with:
+
+    DATASTORE_EMULATOR_HOST=localhost:8081 \
+        python bulk_operations.py --entities 10000 --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent import futures
+import threading
+import time
+
+from google.api_core import exceptions
+from google.cloud import datastore
+
+# Per-RPC limits of the Datastore API.
+MAX_MUTATIONS = 500
+MAX_LOOKUP_KEYS = 1000
+
+# Errors after which a chunk is retried.
+RETRYABLE_ERRORS = (
+    exceptions.Aborted,
+    exceptions.DeadlineExceeded,
+    exceptions.InternalServerError,
+    exceptions.ServiceUnavailable,
+)
+
+
+class BulkStats:
+    """Counts the items and RPCs of a bulk operation and its duration."""
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.items = 0
+        self.rpcs = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.operation}: {self.items} items in {self.rpcs} RPCs "
+            f"({self.retries} retries), {self.seconds:.2f}s, "
+            f"{self.items_per_second:.0f} items/s"
+        )
+
+
+def _chunks(items, size):
+    items = list(items)
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+def _retry(fn, max_attempts, stats):
+    """Calls `fn`, retrying retryable errors with exponential backoff."""
+    for attempt in range(max_attempts):
+        try:
+            return fn()
+        except RETRYABLE_ERRORS:
+            if attempt == max_attempts - 1:
+                raise
+            stats.add_retry()
+            time.sleep(min(0.1 * 2**attempt, 5))
+
+
+def _run_chunks(operation, chunks, fn, workers, max_attempts):
+    stats = BulkStats(operation)
+    start = time.perf_counter()
+    results = []
+    with futures.ThreadPoolExecutor(workers) as executor:
+        jobs = [
+            executor.submit(_retry, lambda chunk=chunk: fn(chunk), max_attempts, stats)
+            for chunk in chunks
+        ]
+        for job, chunk in zip(jobs, chunks):
+            results.append(job.result())
+            stats.items += len(chunk)
+            stats.rpcs += 1
+    stats.seconds = time.perf_counter() - start
+    return results, stats
+
+
+def bulk_put(
+    client: datastore.Client,
+    entities: list[datastore.Entity],
+    workers: int = 8,
+    max_attempts: int = 5,
+) -> BulkStats:
+    """Upserts entities in concurrent chunks of at most 500 mutations."""
+    _, stats = _run_chunks(
+        "put",
+        _chunks(entities, MAX_MUTATIONS),
+        client.put_multi,
+        workers,
+        max_attempts,
+    )
+    return stats
+
+
+def bulk_delete(
+    client: datastore.Client,
+    keys: list[datastore.Key],
+    workers: int = 8,
+    max_attempts: int = 5,
+) -> BulkStats:
+    """Deletes keys in concurrent chunks of at most 500 mutations."""
+    _, stats = _run_chunks(
+        "delete",
+        _chunks(keys, MAX_MUTATIONS),
+        client.delete_multi,
+        workers,
+        max_attempts,
+    )
+    return stats
+
+
+def bulk_get(
+    client: datastore.Client,
+    keys: list[datastore.Key],
+    workers: int = 8,
+    max_attempts: int = 5,
+) -> tuple[list[datastore.Entity], list[datastore.Key], BulkStats]:
+    """Looks up keys in concurrent chunks of at most 1000 keys.
+
+    Datastore may defer part of a lookup under load. Only the deferred keys
+    are looked up again, rather than the whole chunk.
+
+    Returns:
+        The entities found, the keys that do not exist, and the stats.
+    """
+    stats = BulkStats("get")
+
+    def lookup(chunk):
+        found, missing = [], []
+        pending = chunk
+        for attempt in range(max_attempts):
+            deferred = []
+            found.extend(
+                _retry(
+                    lambda: client.get_multi(
+                        pending, missing=missing, deferred=deferred
+                    ),
+                    max_attempts,
+                    stats,
+                )
+            )
+            if not deferred:
+                return found, missing
+            stats.add_retry()
+            pending = deferred
+        raise exceptions.DeadlineExceeded(
+            f"{len(pending)} keys were still deferred after {max_attempts} lookups."
+        )
+
+    results, chunk_stats = _run_chunks(
+        "get", _chunks(keys, MAX_LOOKUP_KEYS), lookup, workers, 1
+    )
+    chunk_stats.retries = stats.retries
+    entities = [entity for found, _ in results for entity in found]
+    missing = [
+        entity.key if isinstance(entity, datastore.Entity) else entity
+        for _, not_found in results
+        for entity in not_found
+    ]
+    return entities, missing, chunk_stats
+
+
+def _naive_put(client, entities):
+    stats = BulkStats("naive put")
+    start = time.perf_counter()
+    for entity in entities:
+        client.put(entity)
+        stats.rpcs += 1
+    stats.items = len(entities)
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--project-id", help="Your cloud project ID.")
+    parser.add_argument("--entities", type=int, default=10000)
+    parser.add_argument("--naive-entities", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    client = datastore.Client(args.project_id)
+    keys = [client.key("BulkTask", i + 1) for i in range(args.entities)]
+    entities = []
+    for key in keys:
+        entity = datastore.Entity(key)
+        entity.update({"done": False, "priority": key.id % 10})
+        entities.append(entity)
+
+    print(_naive_put(client, entities[: args.naive_entities]))
+    print(bulk_put(client, entities, workers=args.workers))
+    _, _, get_stats = bulk_get(client, keys, workers=args.workers)
+    print(get_stats)
+    print(bulk_delete(client, keys, workers=args.workers))
@@ -0,0 +1,56 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import uuid
+
+from google.cloud import datastore
+import pytest
+
+import bulk_operations
+
+PROJECT = os.environ["GOOGLE_CLOUD_PROJECT"]
+
+
+@pytest.fixture
+def client():
+    # We use namespace for isolating builds.
+    yield datastore.Client(PROJECT, namespace=uuid.uuid4().hex)
+
+
+@pytest.mark.flaky
+def test_bulk_put_get_delete(client):
+    keys = [client.key("BulkTask", i + 1) for i in range(1500)]
+    entities = []
+    for key in keys:
+        entity = datastore.Entity(key)
+        entity["priority"] = key.id % 10
+        entities.append(entity)
+
+    put_stats = bulk_operations.bulk_put(client, entities, workers=4)
+    # 1500 mutations need three RPCs at 500 per commit.
+    assert put_stats.items == 1500
+    assert put_stats.rpcs == 3
+
+    absent = client.key("BulkTask", 99999)
+    found, missing, get_stats = bulk_operations.bulk_get(client, keys + [absent])
+    assert len(found) == 1500
+    assert missing == [absent]
+    assert get_stats.rpcs == 2
+
+    delete_stats = bulk_operations.bulk_delete(client, keys)
+    assert delete_stats.items == 1500
+    found, missing, _ = bulk_operations.bulk_get(client, keys)
+    assert not found
+    assert len(missing) == 1500
@@ -0,0 +1,268 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Exports every entity of a Datastore kind to NDJSON or Parquet.
+
+The key space is split into ranges using the `__scatter__` property, and
+each range is read by its own worker with cursor pagination. The next page
+is requested as soon as the current page's cursor is known, so reads overlap
+with writing rows out.
+
+NDJSON lines hold each entity in the JSON form of the Datastore API, so no
+type information is lost. Parquet part files hold plain rows.
+
+Example, against the emulator:
+
+    DATASTORE_EMULATOR_HOST=localhost:8081 \
+        python export_kind.py Task tasks.ndjson --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent import futures
+import contextlib
+import os
+import threading
+import time
+from typing import Iterator
+
+from google.cloud import datastore
+from google.cloud.datastore import helpers
+from google.cloud.datastore.query import PropertyFilter
+from google.protobuf import json_format
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Keys sampled per partition when choosing split points. Oversampling
+# evens out the ranges, as recommended for __scatter__ based splitting.
+SCATTER_OVERSAMPLING = 32
+
+
+class ExportStats:
+    """Counts the entities and pages of an export and its duration."""
+
+    def __init__(self):
+        self.items = 0
+        self.rpcs = 0
+        self.seconds = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (
+            f"export: {self.items} entities in {self.rpcs} pages, "
+            f"{self.seconds:.2f}s, {self.items_per_second:.0f} entities/s"
+        )
+
+
+def _key_order(key: datastore.Key) -> tuple:
+    """Sort key matching Datastore key ordering for keys of one namespace."""
+    # Within a path element, numeric ids sort before names.
+    return tuple(
+        (kind, 0, id_or_name) if isinstance(id_or_name, int) else (kind, 1, id_or_name)
+        for kind, id_or_name in zip(key.flat_path[::2], key.flat_path[1::2])
+    )
+
+
+def entity_json(entity: datastore.Entity) -> str:
+    """Returns an entity as one line of Datastore API JSON."""
+    return json_format.MessageToJson(
+        helpers.entity_to_protobuf(entity)._pb, indent=None
+    )
+
+
+def entity_row(entity: datastore.Entity) -> dict:
+    """Returns an entity as a row of Arrow friendly values.
+
+    Keys become their URL-safe form, which `datastore.Key.from_legacy_urlsafe`
+    reads back, under `__key__` for the entity's own key.
+    """
+
+    def convert(value):
+        if isinstance(value, (dict, datastore.Entity)):
+            return {key: convert(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [convert(item) for item in value]
+        if isinstance(value, datastore.Key):
+            return value.to_legacy_urlsafe().decode("ascii")
+        if isinstance(value, helpers.GeoPoint):
+            return {"latitude": value.latitude, "longitude": value.longitude}
+        return value
+
+    row = convert(entity)
+    row["__key__"] = entity.key.to_legacy_urlsafe().decode("ascii")
+    return row
+
+
+def split_points(
+    client: datastore.Client, kind: str, partitions: int
+) -> list[datastore.Key]:
+    """Chooses up to `partitions - 1` keys that split `kind` evenly.
+
+    Entities are sampled by ordering on the `__scatter__` property, which
+    returns a pseudo-random subset of keys spread across the key space.
+    """
+    if partitions <= 1:
+        return []
+    query = client.query(kind=kind, order=["__scatter__"])
+    query.keys_only()
+    sample = sorted(
+        (entity.key for entity in query.fetch(limit=partitions * SCATTER_OVERSAMPLING)),
+        key=_key_order,
+    )
+    if not sample:
+        return []
+    step = len(sample) / partitions
+    points = [sample[int(step * i)] for i in range(1, partitions)]
+    # Drop duplicates that appear when the sample is small.
+    return [key for i, key in enumerate(points) if i == 0 or key != points[i - 1]]
+
+
+def partition_queries(
+    client: datastore.Client, kind: str, partitions: int
+) -> list[datastore.query.Query]:
+    """Builds queries over disjoint, ordered key ranges covering `kind`."""
+    points = split_points(client, kind, partitions)
+    bounds = [None] + points + [None]
+    queries = []
+    for start, end in zip(bounds, bounds[1:]):
+        query = client.query(kind=kind, order=["__key__"])
+        if start is not None:
+            query.add_filter(filter=PropertyFilter("__key__", ">=", start))
+        if end is not None:
+            query.add_filter(filter=PropertyFilter("__key__", "<", end))
+        queries.append(query)
+    return queries
+
+
+def _fetch_page(
+    query: datastore.query.Query, cursor: bytes | None, page_size: int
+) -> tuple[list[datastore.Entity], bytes | None]:
+    query_iter = query.fetch(start_cursor=cursor, limit=page_size)
+    page = next(query_iter.pages)
+    return list(page), query_iter.next_page_token
+
+
+def paginate(
+    query: datastore.query.Query, page_size: int, prefetcher: futures.Executor
+) -> Iterator[list[datastore.Entity]]:
+    """Yields the results of `query` page by page using cursors.
+
+    The next page is requested from `prefetcher` as soon as the current
+    page's cursor is available, while the caller processes the page.
+    Datastore may end a batch early, below `page_size`, and still have more
+    results, so pages are requested for as long as a cursor is returned.
+    """
+    future = prefetcher.submit(_fetch_page, query, None, page_size)
+    while future is not None:
+        entities, cursor = future.result()
+        future = None
+        if cursor:
+            future = prefetcher.submit(_fetch_page, query, cursor, page_size)
+        if entities:
+            yield entities
+
+
+def export_kind(
+    client: datastore.Client,
+    kind: str,
+    output: str,
+    output_format: str = "ndjson",
+    workers: int = 4,
+    page_size: int = 1000,
+    partitions: int | None = None,
+) -> ExportStats:
+    """Exports every entity of `kind` with parallel readers.
+
+    Args:
+        client: a `datastore.Client`.
+        kind: the kind to export.
+        output: the NDJSON file, or the directory for Parquet part files.
+        output_format: "ndjson" or "parquet".
+        workers: the number of key ranges read concurrently.
+        page_size: the number of entities per page.
+        partitions: the number of key ranges, defaults to `workers`.
+
+    Returns:
+        The stats of the export, with one RPC per page.
+    """
+    stats = ExportStats()
+    start = time.perf_counter()
+    queries = partition_queries(client, kind, partitions or workers)
+    lock = threading.Lock()
+
+    with contextlib.ExitStack() as stack:
+        if output_format == "parquet":
+            os.makedirs(output, exist_ok=True)
+
+            def write(partition, page, entities):
+                path = os.path.join(output, f"part-{partition:05d}-{page:06d}.parquet")
+                table = pa.Table.from_pylist([entity_row(e) for e in entities])
+                pq.write_table(table, path)
+
+        else:
+            ndjson_file = stack.enter_context(open(output, "w"))
+
+            def write(partition, page, entities):
+                lines = "".join(entity_json(entity) + "\n" for entity in entities)
+                with lock:
+                    ndjson_file.write(lines)
+
+        def export_partition(partition, query, prefetcher):
+            for page, entities in enumerate(paginate(query, page_size, prefetcher)):
+                write(partition, page, entities)
+                with lock:
+                    stats.items += len(entities)
+                    stats.rpcs += 1
+
+        # Prefetches run on their own pool so that a reader waiting on its next
+        # page never blocks the thread that would fetch it.
+        readers = stack.enter_context(futures.ThreadPoolExecutor(workers))
+        prefetcher = stack.enter_context(futures.ThreadPoolExecutor(workers))
+        results = [
+            readers.submit(export_partition, partition, query, prefetcher)
+            for partition, query in enumerate(queries)
+        ]
+        for result in results:
+            result.result()
+
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("kind", help="Kind to export.")
+    parser.add_argument(
+        "output", help="NDJSON file, or a directory for Parquet part files."
+    )
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    stats = export_kind(
+        datastore.Client(),
+        args.kind,
+        args.output,
+        output_format=args.format,
+        workers=args.workers,
+        page_size=args.page_size,
+    )
+    print(stats)
@@ -0,0 +1,102 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent import futures
+import json
+import os
+from unittest import mock
+import uuid
+
+from google.cloud import datastore
+import pyarrow.dataset as ds
+import pytest
+
+import export_kind
+
+PROJECT = os.environ["GOOGLE_CLOUD_PROJECT"]
+
+
+@pytest.fixture(scope="module")
+def kind():
+    client = datastore.Client(PROJECT)
+    kind = f"ExportTask{uuid.uuid4().hex[:8]}"
+    entities = []
+    for i in range(25):
+        entity = datastore.Entity(client.key(kind, i + 1))
+        entity.update({"index": i, "description": f"task {i}"})
+        entities.append(entity)
+    client.put_multi(entities)
+
+    yield client, kind
+
+    client.delete_multi([entity.key for entity in entities])
+
+
+def test_key_order():
+    keys = [
+        datastore.Key("Task", "b", project=PROJECT),
+        datastore.Key("Task", 2, project=PROJECT),
+        datastore.Key("Task", "a", project=PROJECT),
+        datastore.Key("Task", 1, project=PROJECT),
+    ]
+    assert [key.flat_path for key in sorted(keys, key=export_kind._key_order)] == [
+        ("Task", 1),
+        ("Task", 2),
+        ("Task", "a"),
+        ("Task", "b"),
+    ]
+
+
+def test_paginate_follows_cursor_past_short_batches():
+    # Batches ended early by Datastore are shorter than the page size, but
+    # still come with a cursor to the rest of the results.
+    batches = {None: ([1, 2], b"a"), b"a": ([3], b"b"), b"b": ([], None)}
+
+    class Query:
+        def fetch(self, start_cursor, limit):
+            entities, cursor = batches[start_cursor]
+            query_iter = mock.Mock(next_page_token=cursor)
+            query_iter.pages = iter([entities])
+            return query_iter
+
+    with futures.ThreadPoolExecutor(1) as prefetcher:
+        pages = list(export_kind.paginate(Query(), 4, prefetcher))
+
+    assert pages == [[1, 2], [3]]
+
+
+def test_export_ndjson(kind, tmp_path):
+    client, kind = kind
+    path = str(tmp_path / "export.ndjson")
+    stats = export_kind.export_kind(client, kind, path, workers=3, page_size=4)
+
+    assert stats.items == 25
+    with open(path) as f:
+        entities = [json.loads(line) for line in f]
+    assert sorted(
+        int(entity["properties"]["index"]["integerValue"]) for entity in entities
+    ) == list(range(25))
+    assert all(entity["key"]["path"][0]["kind"] == kind for entity in entities)
+
+
+def test_export_parquet(kind, tmp_path):
+    client, kind = kind
+    stats = export_kind.export_kind(
+        client, kind, str(tmp_path), output_format="parquet", workers=1, page_size=10
+    )
+
+    assert stats.items == 25
+    assert stats.rpcs == 3
+    table = ds.dataset(str(tmp_path), format="parquet").to_table()
+    assert sorted(table.column("index").to_pylist()) == list(range(25))
@@ -29,6 +29,8 @@ from google.cloud import datastore
 # [END datastore_retrieve_entities]
 # [END datastore_delete_entity]
 
+import bulk_operations
+
 
 # [START datastore_build_service]
 def create_client(project_id):
@@ -110,6 +112,27 @@ def delete_task(client: datastore.Client, task_id: str | int):
 # [END datastore_delete_entity]
 
 
+def add_tasks(client: datastore.Client, descriptions: list[str], workers: int = 8):
+    """Adds many tasks with concurrent, chunked writes."""
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    # Allocate all the ids up front so the keys can be returned.
+    keys = client.allocate_ids(client.key("Task"), len(descriptions))
+    entities = []
+    for key, description in zip(keys, descriptions):
+        task = datastore.Entity(key, exclude_from_indexes=("description",))
+        task.update({"created": now, "description": description, "done": False})
+        entities.append(task)
+
+    bulk_operations.bulk_put(client, entities, workers=workers)
+    return keys
+
+
+def delete_tasks(client: datastore.Client, task_ids: list[str | int], workers: int = 8):
+    """Deletes many tasks with concurrent, chunked writes."""
+    keys = [client.key("Task", task_id) for task_id in task_ids]
+    bulk_operations.bulk_delete(client, keys, workers=workers)
+
+
 def format_tasks(tasks):
     lines = []
     for task in tasks:
@@ -141,9 +164,21 @@ def list_command(client, args):
 
 
 def delete_command(client, args):
-    """Deletes a task."""
-    delete_task(client, args.task_id)
-    print(f"Task {args.task_id} deleted.")
+    """Deletes one or more tasks."""
+    if len(args.task_id) == 1:
+        delete_task(client, args.task_id[0])
+    else:
+        delete_tasks(client, args.task_id)
+    for task_id in args.task_id:
+        print(f"Task {task_id} deleted.")
+
+
+def import_command(client, args):
+    """Adds a task for every line of <file>."""
+    with open(args.file) as f:
+        descriptions = [line.strip() for line in f if line.strip()]
+    keys = add_tasks(client, descriptions)
+    print(f"{len(keys)} tasks added.")
 
 
 if __name__ == "__main__":
@@ -165,7 +200,11 @@ if __name__ == "__main__":
 
     delete_parser = subparsers.add_parser("delete", help=delete_command.__doc__)
     delete_parser.set_defaults(func=delete_command)
-    delete_parser.add_argument("task_id", help="Task ID.", type=int)
+    delete_parser.add_argument("task_id", help="Task ID.", type=int, nargs="+")
+
+    import_parser = subparsers.add_parser("import", help=import_command.__doc__)
+    import_parser.set_defaults(func=import_command)
+    import_parser.add_argument("file", help="File with one task description per line.")
 
     args = parser.parse_args()
 
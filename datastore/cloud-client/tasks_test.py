@@ -96,3 +96,15 @@ def test_format_tasks(client):
         assert "created" in output
 
     run_sample()
+
+
+@pytest.mark.flaky
+def test_add_and_delete_tasks(client):
+    descriptions = [f"Bulk task {i}" for i in range(1200)]
+    keys = tasks.add_tasks(client, descriptions)
+    assert len(keys) == 1200
+    assert client.get(keys[-1])["description"] == "Bulk task 1199"
+
+    tasks.delete_tasks(client, [key.id for key in keys])
+    assert client.get(keys[0]) is None
+    assert client.get(keys[-1]) is None
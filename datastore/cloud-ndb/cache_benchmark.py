@@ -0,0 +1,100 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares book lookups with and without the Redis global cache.
+
+Every request gets a fresh NDB context, as under the middleware, so without
+a global cache each lookup is a Datastore read. Run against the emulator and
+a local Redis:
+
+    DATASTORE_EMULATOR_HOST=localhost:8081 \
+        python cache_benchmark.py --redis-url redis://localhost:6379 --requests 2000
+"""
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from google.cloud import ndb
+import redis
+
+import flask_app
+import global_cache
+
+
+def run(book_ids, namespace, requests, cache=None):
+    """Looks up random books, one context per request.
+
+    Returns the request latencies in milliseconds.
+    """
+    options = global_cache.context_options(cache) if cache is not None else {}
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        with flask_app.client.context(**options):
+            flask_app.Book.get_by_id(random.choice(book_ids), namespace=namespace)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name, latencies, datastore_reads):
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(
+        f"{name}: {len(latencies)} requests, {datastore_reads} Datastore reads, "
+        f"p50 {statistics.median(latencies):.2f} ms, p95 {p95:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--books", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    # The books, and so their global cache keys, are in a namespace of their
+    # own, so that only the benchmark's entries are removed from Redis.
+    namespace = f"cache-benchmark-{uuid.uuid4().hex}"
+    with flask_app.client.context():
+        keys = ndb.put_multi(
+            [
+                flask_app.Book(title=f"Book {i}", namespace=namespace)
+                for i in range(args.books)
+            ]
+        )
+    book_ids = [key.id() for key in keys]
+
+    redis_client = redis.Redis.from_url(args.redis_url)
+    try:
+        report(
+            "no global cache", run(book_ids, namespace, args.requests), args.requests
+        )
+
+        before = redis_client.info("stats")["keyspace_misses"]
+        latencies = run(
+            book_ids, namespace, args.requests, ndb.RedisCache(redis_client)
+        )
+        # Each global cache miss falls through to a Datastore lookup.
+        misses = redis_client.info("stats")["keyspace_misses"] - before
+        report("redis global cache", latencies, misses)
+    finally:
+        with flask_app.client.context():
+            ndb.delete_multi(keys)
+        # NDB's cache keys start with "NDB30" and embed the entity's namespace.
+        for cache_key in redis_client.scan_iter(match=f"NDB30*{namespace}*"):
+            redis_client.delete(cache_key)
@@ -15,14 +15,18 @@
 # [START ndb_django_middleware]
 from google.cloud import ndb
 
+import global_cache
+
 
 # Once this middleware is activated in Django settings, NDB calls inside Django
 # views will be executed in context, with a separate context for each request.
 def ndb_django_middleware(get_response):
     client = ndb.Client()
+    # Uses the global cache configured in the environment, see global_cache.py.
+    context_options = global_cache.context_options()
 
     def middleware(request):
-        with client.context():
+        with client.context(**context_options):
             return get_response(request)
 
     return middleware
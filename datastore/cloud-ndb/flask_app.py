@@ -13,17 +13,22 @@
 # limitations under the License.
 
 # [START ndb_flask]
-from flask import Flask
+from flask import abort, Flask, jsonify, request
 
 from google.cloud import ndb
 
+import global_cache
+
 
 client = ndb.Client()
+# Entity lookups are served from Redis or memcached when one is configured,
+# see global_cache.py.
+context_options = global_cache.context_options()
 
 
 def ndb_wsgi_middleware(wsgi_app):
     def middleware(environ, start_response):
-        with client.context():
+        with client.context(**context_options):
             return wsgi_app(environ, start_response)
 
     return middleware
@@ -34,13 +39,40 @@ app.wsgi_app = ndb_wsgi_middleware(app.wsgi_app)  # Wrap the app in middleware.
 
 
 class Book(ndb.Model):
+    # Books rarely change, so they stay in the global cache for an hour.
+    _global_cache_timeout = 3600
+
     title = ndb.StringProperty()
 
 
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
 @app.route("/")
 def list_books():
-    books = Book.query()
-    return str([book.to_dict() for book in books])
+    # Serve one page at a time, reading only the title from the built-in
+    # single property index instead of loading every Book entity.
+    page_size = min(request.args.get("page_size", PAGE_SIZE, type=int), MAX_PAGE_SIZE)
+    cursor = request.args.get("cursor")
+    books, next_cursor, more = Book.query().fetch_page(
+        page_size,
+        start_cursor=ndb.Cursor(urlsafe=cursor) if cursor else None,
+        projection=[Book.title],
+    )
+    return jsonify(
+        books=[{"id": book.key.id(), "title": book.title} for book in books],
+        next_cursor=next_cursor.urlsafe().decode("ascii") if more else None,
+    )
+
+
+@app.route("/books/<int:book_id>")
+def get_book(book_id):
+    # Lookups by key are served from the global cache when it is enabled.
+    book = Book.get_by_id(book_id)
+    if book is None:
+        abort(404)
+    return jsonify(id=book_id, **book.to_dict())
 
 
 # [END ndb_flask]
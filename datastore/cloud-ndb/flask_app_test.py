@@ -42,14 +42,34 @@ def test_index(test_book):
 
     @backoff.on_exception(backoff.expo, AssertionError, max_time=60)
     def eventually_consistent_test():
-        r = client.get("/")
-        with flask_app.client.context():
+        titles = []
+        cursor = None
+        while True:
+            r = client.get("/", query_string={"page_size": 50, "cursor": cursor})
             assert r.status_code == 200
-            assert test_book.title in r.data.decode("utf-8")
+            page = r.get_json()
+            assert len(page["books"]) <= 50
+            titles.extend(book["title"] for book in page["books"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert test_book.title in titles
 
     eventually_consistent_test()
 
 
+def test_get_book(test_book):
+    flask_app.app.testing = True
+    client = flask_app.app.test_client()
+
+    r = client.get(f"/books/{test_book.key.id()}")
+    assert r.status_code == 200
+    assert r.get_json()["title"] == test_book.title
+
+    r = client.get("/books/1")
+    assert r.status_code == 404
+
+
 def test_ndb_wsgi_middleware():
     def fake_wsgi_app(environ, start_response):
         # Validate that a context is live. This will throw
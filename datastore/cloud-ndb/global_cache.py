@@ -0,0 +1,94 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Global cache configuration shared by the NDB middleware samples.
+
+Without a global cache every request starts with an empty context cache,
+so each entity lookup goes to Datastore. The cache is configured from the
+environment:
+
+- `REDIS_HOST` and optionally `REDIS_PORT`: a Memorystore for Redis
+  instance, as reached from App Engine, Cloud Run or GKE.
+- `REDIS_CACHE_URL`: any Redis URL, for example `redis://localhost:6379`.
+- `MEMCACHED_HOSTS`: space separated memcached `host:port` pairs.
+
+When none is set, NDB runs without a global cache as before.
+"""
+
+import os
+
+from google.cloud import ndb
+import redis
+
+# Seconds that entities of a kind stay in the global cache. `None` keeps
+# them until evicted and `0` disables global caching for the kind. Kinds
+# not listed fall back to the `_use_global_cache` and
+# `_global_cache_timeout` attributes of their model class.
+CACHE_TIMEOUTS = {}
+
+
+def global_cache_from_environment():
+    """Returns the configured `ndb.GlobalCache`, or None."""
+    host = os.environ.get("REDIS_HOST")
+    if host:
+        port = int(os.environ.get("REDIS_PORT", 6379))
+        return ndb.RedisCache(redis.Redis(host=host, port=port))
+    return ndb.RedisCache.from_environment() or ndb.MemcacheCache.from_environment()
+
+
+def _kind(key):
+    # Policies get an `ndb.Key` or, on the lookup path, a
+    # `google.cloud.datastore.Key`, whose `kind` is an attribute.
+    kind = key.kind
+    return kind() if callable(kind) else kind
+
+
+def _model_attribute(key, name):
+    modelclass = ndb.Model._kind_map.get(_kind(key))
+    value = getattr(modelclass, name, None)
+    return value(key) if callable(value) else value
+
+
+def global_cache_policy(key):
+    """Whether the entity for `key` is stored in the global cache."""
+    kind = _kind(key)
+    if kind in CACHE_TIMEOUTS:
+        return CACHE_TIMEOUTS[kind] != 0
+    flag = _model_attribute(key, "_use_global_cache")
+    return True if flag is None else flag
+
+
+def global_cache_timeout_policy(key):
+    """Seconds the entity for `key` stays in the global cache."""
+    kind = _kind(key)
+    if kind in CACHE_TIMEOUTS:
+        return CACHE_TIMEOUTS[kind]
+    return _model_attribute(key, "_global_cache_timeout")
+
+
+def context_options(cache=None):
+    """Keyword arguments for `ndb.Client.context` enabling the global cache.
+
+    Args:
+        cache: the `ndb.GlobalCache` to use, defaults to the one configured
+            in the environment.
+    """
+    cache = cache or global_cache_from_environment()
+    if cache is None:
+        return {}
+    return {
+        "global_cache": cache,
+        "global_cache_policy": global_cache_policy,
+        "global_cache_timeout_policy": global_cache_timeout_policy,
+    }
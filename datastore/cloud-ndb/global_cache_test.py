@@ -0,0 +1,79 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from google.cloud import datastore
+from google.cloud import ndb
+import pytest
+
+import global_cache
+
+
+class CachedModel(ndb.Model):
+    _global_cache_timeout = 60
+
+
+class UncachedModel(ndb.Model):
+    _use_global_cache = False
+
+
+@pytest.fixture(autouse=True)
+def clear_environment(monkeypatch):
+    for name in ("REDIS_HOST", "REDIS_PORT", "REDIS_CACHE_URL", "MEMCACHED_HOSTS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_no_global_cache():
+    assert global_cache.global_cache_from_environment() is None
+    assert global_cache.context_options() == {}
+
+
+def test_memorystore_host(monkeypatch):
+    monkeypatch.setenv("REDIS_HOST", "10.0.0.3")
+    monkeypatch.setenv("REDIS_PORT", "6380")
+
+    cache = global_cache.global_cache_from_environment()
+    assert isinstance(cache, ndb.RedisCache)
+    assert cache.redis.connection_pool.connection_kwargs["host"] == "10.0.0.3"
+    assert cache.redis.connection_pool.connection_kwargs["port"] == 6380
+
+    options = global_cache.context_options()
+    assert options["global_cache_policy"] is global_cache.global_cache_policy
+
+
+def test_per_model_policies(monkeypatch):
+    with ndb.Client().context():
+        cached = ndb.Key("CachedModel", 1)
+        uncached = ndb.Key("UncachedModel", 1)
+    assert global_cache.global_cache_policy(cached)
+    assert global_cache.global_cache_timeout_policy(cached) == 60
+    assert not global_cache.global_cache_policy(uncached)
+
+    monkeypatch.setitem(global_cache.CACHE_TIMEOUTS, "CachedModel", 0)
+    monkeypatch.setitem(global_cache.CACHE_TIMEOUTS, "UncachedModel", 5)
+    assert not global_cache.global_cache_policy(cached)
+    assert global_cache.global_cache_policy(uncached)
+    assert global_cache.global_cache_timeout_policy(uncached) == 5
+
+
+def test_policies_with_datastore_keys(monkeypatch):
+    # NDB passes the lookup path keys as `google.cloud.datastore.Key`.
+    cached = datastore.Key("CachedModel", 1, project="test-project")
+    uncached = datastore.Key("UncachedModel", 1, project="test-project")
+    assert global_cache.global_cache_policy(cached)
+    assert global_cache.global_cache_timeout_policy(cached) == 60
+    assert not global_cache.global_cache_policy(uncached)
+
+    monkeypatch.setitem(global_cache.CACHE_TIMEOUTS, "UncachedModel", 5)
+    assert global_cache.global_cache_policy(uncached)
+    assert global_cache.global_cache_timeout_policy(uncached) == 5
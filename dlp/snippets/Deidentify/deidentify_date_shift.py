@@ -183,6 +183,107 @@ def deidentify_with_date_shift(
 # [END dlp_deidentify_date_shift]
 
 
+def deidentify_csv_with_date_shift(
+    project: str,
+    input_csv_file: str,
+    output_csv_file: str,
+    date_fields: List[str],
+    lower_bound_days: int,
+    upper_bound_days: int,
+    context_field_id: str = None,
+    wrapped_key: str = None,
+    key_name: str = None,
+) -> None:
+    """Uses the Data Loss Prevention API to deidentify dates in a CSV file of
+        any size by pseudorandomly shifting them.
+
+    The file is sent in chunks of rows that fit in a request, several at a
+    time. Shift amounts based on a context field are consistent across
+    chunks, random ones differ from row to row anyway.
+
+    Args:
+        project: The Google Cloud project id to use as a parent resource.
+        input_csv_file: The path to the CSV file to deidentify. The first row
+            of the file must specify column names, and all other rows must
+            contain valid values.
+        output_csv_file: The path to save the date-shifted CSV file.
+        date_fields: The list of (date) fields in the CSV file to date shift.
+        lower_bound_days: The maximum number of days to shift a date backward
+        upper_bound_days: The maximum number of days to shift a date forward
+        context_field_id: (Optional) The column to determine date shift amount
+            based on. If this is specified, then 'wrapped_key' and 'key_name'
+            must also be set.
+        key_name: (Optional) The name of the Cloud KMS key used to encrypt
+            ('wrap') the AES-256 key.
+        wrapped_key: (Optional) The encrypted ('wrapped') AES-256 key to use,
+            base64-encoded.
+    """
+    # Imported here, so the snippet above runs without it.
+    import deidentify_table_streaming
+
+    dlp = google.cloud.dlp_v2.DlpServiceClient()
+
+    date_shift_config = {
+        "lower_bound_days": lower_bound_days,
+        "upper_bound_days": upper_bound_days,
+    }
+    if context_field_id and key_name and wrapped_key:
+        date_shift_config["context"] = {"name": context_field_id}
+        date_shift_config["crypto_key"] = {
+            "kms_wrapped": {
+                "wrapped_key": base64.b64decode(wrapped_key),
+                "crypto_key_name": key_name,
+            }
+        }
+    elif context_field_id or key_name or wrapped_key:
+        raise ValueError(
+            """You must set either ALL or NONE of
+        [context_field_id, key_name, wrapped_key]!"""
+        )
+
+    deidentify_config = {
+        "record_transformations": {
+            "field_transformations": [
+                {
+                    "fields": [{"name": field} for field in date_fields],
+                    "primitive_transformation": {
+                        "date_shift_config": date_shift_config
+                    },
+                }
+            ]
+        }
+    }
+
+    def map_data(value: str) -> dict:
+        try:
+            date = datetime.strptime(value, "%m/%d/%Y")
+            return {
+                "date_value": {"year": date.year, "month": date.month, "day": date.day}
+            }
+        except ValueError:
+            return {"string_value": value}
+
+    def write_data(data: types.Value) -> str:
+        return data.string_value or "{}/{}/{}".format(
+            data.date_value.month,
+            data.date_value.day,
+            data.date_value.year,
+        )
+
+    stats = deidentify_table_streaming.deidentify_csv(
+        dlp,
+        {
+            "parent": f"projects/{project}/locations/global",
+            "deidentify_config": deidentify_config,
+        },
+        input_csv_file,
+        output_csv_file,
+        to_value=map_data,
+        from_value=write_data,
+    )
+    print(f"De-identified {stats.rows} rows in {stats.requests} requests.")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
 
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import csv
 import os
 import shutil
 import tempfile
@@ -84,3 +85,30 @@ def test_deidentify_with_date_shift_using_context_field(
     out, _ = capsys.readouterr()
 
     assert "Successful" in out
+
+
+def test_deidentify_csv_with_date_shift(
+    tempdir: TextIO, capsys: pytest.CaptureFixture
+) -> None:
+    input_filepath = os.path.join(tempdir, "many-dates.csv")
+    output_filepath = os.path.join(tempdir, "many-dates-shifted.csv")
+    rows = [[f"user{i}", f"{i % 12 + 1}/1/1990"] for i in range(2000)]
+    with open(input_filepath, "w", newline="") as csvfile:
+        csv.writer(csvfile).writerows([["name", "birth_date"]] + rows)
+
+    deid.deidentify_csv_with_date_shift(
+        GCLOUD_PROJECT,
+        input_csv_file=input_filepath,
+        output_csv_file=output_filepath,
+        date_fields=["birth_date"],
+        lower_bound_days=DATE_SHIFTED_AMOUNT,
+        upper_bound_days=DATE_SHIFTED_AMOUNT,
+    )
+
+    out, _ = capsys.readouterr()
+    assert "De-identified 2000 rows" in out
+    with open(output_filepath, newline="") as csvfile:
+        output = list(csv.reader(csvfile))
+    assert output[0] == ["name", "birth_date"]
+    assert [row[0] for row in output[1:]] == [row[0] for row in rows]
+    assert all(deid_row[1] != row[1] for row, deid_row in zip(rows, output[1:]))
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import base64
+import csv
 import os
+import pathlib
 
 import deidentify_table_fpe as deid
 
@@ -86,3 +88,34 @@ def test_deidentify_and_reidentify_table_with_fpe(
     out, _ = capsys.readouterr()
     assert "11111" in out
     assert "22222" in out
+
+
+def test_deidentify_csv_with_fpe(
+    tmp_path: pathlib.Path, capsys: pytest.CaptureFixture
+) -> None:
+    input_csv_file = os.path.join(tmp_path, "employees.csv")
+    output_csv_file = os.path.join(tmp_path, "employees-deid.csv")
+    rows = [[f"{i:05d}", "2016", f"${i % 100}"] for i in range(10000, 12000)]
+    with open(input_csv_file, "w", newline="") as csvfile:
+        csv.writer(csvfile).writerows([["employee_id", "date", "compensation"]] + rows)
+
+    deid.deidentify_csv_with_fpe(
+        GCLOUD_PROJECT,
+        input_csv_file,
+        output_csv_file,
+        ["employee_id"],
+        alphabet="NUMERIC",
+        wrapped_key=base64.b64decode(WRAPPED_KEY),
+        key_name=KEY_NAME,
+    )
+
+    out, _ = capsys.readouterr()
+    assert "De-identified 2000 rows" in out
+    with open(output_csv_file, newline="") as csvfile:
+        output = list(csv.reader(csvfile))
+    assert output[0] == ["employee_id", "date", "compensation"]
+    assert len(output) == len(rows) + 1
+    for row, deid_row in zip(rows, output[1:]):
+        assert deid_row[0] != row[0]
+        assert len(deid_row[0]) == len(row[0])
+        assert deid_row[1:] == row[1:]
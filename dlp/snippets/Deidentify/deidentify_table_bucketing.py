@@ -121,6 +121,61 @@ def deidentify_table_bucketing(
 # [END dlp_deidentify_table_bucketing]
 
 
+def deidentify_csv_bucketing(
+    project: str,
+    input_csv_file: str,
+    output_csv_file: str,
+    deid_content_list: List[str],
+    bucket_size: int,
+    bucketing_lower_bound: int,
+    bucketing_upper_bound: int,
+) -> None:
+    """Uses the Data Loss Prevention API to replace columns of a CSV file of
+    any size with fixed size bucket ranges.
+
+    Args:
+        project: The Google Cloud project id to use as a parent resource.
+        input_csv_file: The path to the CSV file to de-identify. The first row
+            of the file must specify column names.
+        output_csv_file: The path to save the de-identified CSV file.
+        deid_content_list: A list of fields in table to de-identify.
+        bucket_size: Size of each bucket for fixed sized bucketing.
+        bucketing_lower_bound: Lower bound value of buckets.
+        bucketing_upper_bound:  Upper bound value of buckets.
+    """
+    import deidentify_table_streaming
+
+    dlp = google.cloud.dlp_v2.DlpServiceClient()
+
+    deidentify_config = {
+        "record_transformations": {
+            "field_transformations": [
+                {
+                    "fields": [{"name": _i} for _i in deid_content_list],
+                    "primitive_transformation": {
+                        "fixed_size_bucketing_config": {
+                            "bucket_size": bucket_size,
+                            "lower_bound": {"integer_value": bucketing_lower_bound},
+                            "upper_bound": {"integer_value": bucketing_upper_bound},
+                        }
+                    },
+                }
+            ]
+        }
+    }
+
+    stats = deidentify_table_streaming.deidentify_csv(
+        dlp,
+        {
+            "parent": f"projects/{project}/locations/global",
+            "deidentify_config": deidentify_config,
+        },
+        input_csv_file,
+        output_csv_file,
+    )
+    print(f"De-identified {stats.rows} rows in {stats.requests} requests.")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description=__doc__)
 
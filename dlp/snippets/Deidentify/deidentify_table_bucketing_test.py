@@ -11,7 +11,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import csv
 import os
+import pathlib
 
 import deidentify_table_bucketing as deid
 
@@ -47,3 +49,24 @@ def test_deidentify_table_bucketing(capsys: pytest.CaptureFixture) -> None:
     assert 'string_value: "90:100"' in out
     assert 'string_value: "20:30"' in out
     assert 'string_value: "70:80"' in out
+
+
+def test_deidentify_csv_bucketing(tmp_path: pathlib.Path) -> None:
+    input_csv_file = os.path.join(tmp_path, "patients.csv")
+    output_csv_file = os.path.join(tmp_path, "patients-deid.csv")
+    with open(input_csv_file, "w", newline="") as csvfile:
+        csv.writer(csvfile).writerows([TABLE_DATA["header"]] + TABLE_DATA["rows"])
+
+    deid.deidentify_csv_bucketing(
+        GCLOUD_PROJECT,
+        input_csv_file,
+        output_csv_file,
+        ["happiness_score"],
+        10,
+        0,
+        100,
+    )
+
+    with open(output_csv_file, newline="") as csvfile:
+        output = list(csv.reader(csvfile))
+    assert [row[2] for row in output] == ["happiness_score", "90:100", "20:30", "70:80"]
@@ -110,6 +110,66 @@ def deidentify_table_with_fpe(
 # [END dlp_deidentify_table_fpe]
 
 
+def deidentify_csv_with_fpe(
+    project: str,
+    input_csv_file: str,
+    output_csv_file: str,
+    deid_field_names: List[str],
+    key_name: str = None,
+    wrapped_key: bytes = None,
+    alphabet: str = None,
+) -> None:
+    """Uses the Data Loss Prevention API to de-identify columns of a CSV file
+      of any size while maintaining format.
+
+    Args:
+        project: The Google Cloud project id to use as a parent resource.
+        input_csv_file: The path to the CSV file to de-identify. The first row
+            of the file must specify column names.
+        output_csv_file: The path to save the de-identified CSV file.
+        deid_field_names: A list of fields in table to de-identify.
+        key_name: The name of the Cloud KMS key used to encrypt ('wrap') the
+            AES-256 key.
+        wrapped_key: The decrypted ('wrapped', in bytes) AES-256 key to use.
+        alphabet: The set of characters to replace sensitive ones with.
+    """
+    import deidentify_table_streaming
+
+    dlp = google.cloud.dlp_v2.DlpServiceClient()
+
+    deidentify_config = {
+        "record_transformations": {
+            "field_transformations": [
+                {
+                    "primitive_transformation": {
+                        "crypto_replace_ffx_fpe_config": {
+                            "crypto_key": {
+                                "kms_wrapped": {
+                                    "wrapped_key": wrapped_key,
+                                    "crypto_key_name": key_name,
+                                },
+                            },
+                            "common_alphabet": alphabet,
+                        }
+                    },
+                    "fields": [{"name": _i} for _i in deid_field_names],
+                }
+            ]
+        }
+    }
+
+    stats = deidentify_table_streaming.deidentify_csv(
+        dlp,
+        {
+            "parent": f"projects/{project}/locations/global",
+            "deidentify_config": deidentify_config,
+        },
+        input_csv_file,
+        output_csv_file,
+    )
+    print(f"De-identified {stats.rows} rows in {stats.requests} requests.")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description=__doc__)
 
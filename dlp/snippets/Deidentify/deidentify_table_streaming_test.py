@@ -0,0 +1,84 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import csv
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterator
+
+from google.cloud.dlp_v2 import types
+
+import deidentify_table_streaming as streaming
+
+import pytest
+
+
+class ReversingDlpClient(streaming.StubDlpClient):
+    """Reverses every value, answering requests in a random order."""
+
+    def deidentify_content(self, request: Dict) -> types.DeidentifyContentResponse:
+        response = super().deidentify_content(request)
+        time.sleep(random.random() * self.latency)
+        for row in response.item.table.rows:
+            for value in row.values:
+                value.string_value = value.string_value[::-1]
+        return response
+
+
+@pytest.fixture(scope="module")
+def tempdir() -> Iterator[str]:
+    tempdir = tempfile.mkdtemp()
+    yield tempdir
+    shutil.rmtree(tempdir)
+
+
+def test_csv_chunks() -> None:
+    rows = [["a" * 10, "b" * 10] for _ in range(100)]
+
+    chunks = list(streaming.csv_chunks(iter(rows), max_bytes=1000, max_cells=30))
+    assert sum(chunks, []) == rows
+    assert all(len(chunk) * 2 <= 30 for chunk in chunks)
+
+    chunks = list(streaming.csv_chunks(iter(rows), max_bytes=100, max_cells=1000))
+    assert sum(chunks, []) == rows
+    assert all(len(chunk) == 3 for chunk in chunks[:-1])
+
+
+def test_deidentify_csv(tempdir: str) -> None:
+    input_csv_file = os.path.join(tempdir, "input.csv")
+    output_csv_file = os.path.join(tempdir, "output.csv")
+    rows = [[f"name {i}", f"{i:05d}"] for i in range(1000)]
+    with open(input_csv_file, "w", newline="") as csvfile:
+        csv.writer(csvfile).writerows([["name", "id"]] + rows)
+
+    client = ReversingDlpClient(latency=0.01)
+    stats = streaming.deidentify_csv(
+        client,
+        {"parent": "projects/test/locations/global"},
+        input_csv_file,
+        output_csv_file,
+        window=4,
+        max_cells=100,
+    )
+
+    assert stats.rows == 1000
+    assert stats.requests == 20
+    assert client.max_cells <= 100
+    with open(output_csv_file, newline="") as csvfile:
+        output = list(csv.reader(csvfile))
+    assert output[0] == ["name", "id"]
+    assert output[1:] == [[cell[::-1] for cell in row] for row in rows]
@@ -106,6 +106,66 @@ def deidentify_table_with_crypto_hash(
 # [END dlp_deidentify_table_with_crypto_hash]
 
 
+def deidentify_csv_with_crypto_hash(
+    project: str,
+    input_csv_file: str,
+    output_csv_file: str,
+    info_types: List[str],
+    key_name: str,
+    wrapped_key: bytes,
+) -> None:
+    """Uses the Data Loss Prevention API to de-identify sensitive data in a
+    CSV file of any size using a cryptographic hash transformation.
+
+    The file is sent in several requests. A transient key is generated for
+    each request, so a KMS wrapped key is used to hash values consistently.
+
+    Args:
+        project: The Google Cloud project id to use as a parent resource.
+        input_csv_file: The path to the CSV file to de-identify. The first row
+            of the file must specify column names.
+        output_csv_file: The path to save the de-identified CSV file.
+        info_types: A list of strings representing info types to look for.
+        key_name: The name of the Cloud KMS key used to encrypt ('wrap') the
+            AES-256 key.
+        wrapped_key: The encrypted ('wrapped', in bytes) AES-256 key to use.
+    """
+    import deidentify_table_streaming
+
+    dlp = google.cloud.dlp_v2.DlpServiceClient()
+
+    info_types = [{"name": info_type} for info_type in info_types]
+    crypto_hash_config = {
+        "crypto_key": {
+            "kms_wrapped": {"wrapped_key": wrapped_key, "crypto_key_name": key_name}
+        }
+    }
+    deidentify_config = {
+        "info_type_transformations": {
+            "transformations": [
+                {
+                    "info_types": info_types,
+                    "primitive_transformation": {
+                        "crypto_hash_config": crypto_hash_config
+                    },
+                }
+            ]
+        }
+    }
+
+    stats = deidentify_table_streaming.deidentify_csv(
+        dlp,
+        {
+            "parent": f"projects/{project}/locations/global",
+            "deidentify_config": deidentify_config,
+            "inspect_config": {"info_types": info_types},
+        },
+        input_csv_file,
+        output_csv_file,
+    )
+    print(f"De-identified {stats.rows} rows in {stats.requests} requests.")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description=__doc__)
 
@@ -11,13 +11,25 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import base64
+import csv
 import os
+import pathlib
 
 import deidentify_table_with_crypto_hash as deid
 
 import pytest
 
 GCLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
+WRAPPED_KEY = (
+    "CiQAz0hX4+go8fJwn80Fr8pVImwx+tmZdqU7JL+7TN/S5JxBU9gSSQDhFHpFVy"
+    "uzJps0YH9ls480mU+JLG7jI/0lL04i6XJRWqmI6gUSZRUtECYcLH5gXK4SXHlL"
+    "rotx7Chxz/4z7SIpXFOBY61z0/U="
+)
+KEY_NAME = (
+    f"projects/{GCLOUD_PROJECT}/locations/global/keyRings/"
+    "dlp-test/cryptoKeys/dlp-test"
+)
 
 
 def test_deidentify_table_with_crypto_hash(capsys: pytest.CaptureFixture) -> None:
@@ -50,3 +62,34 @@ def test_deidentify_table_with_crypto_hash(capsys: pytest.CaptureFixture) -> Non
 
     assert "abby_abernathy@example.org" not in out
     assert "858-555-0222" not in out
+
+
+def test_deidentify_csv_with_crypto_hash(
+    tmp_path: pathlib.Path, capsys: pytest.CaptureFixture
+) -> None:
+    input_csv_file = os.path.join(tmp_path, "users.csv")
+    output_csv_file = os.path.join(tmp_path, "users-deid.csv")
+    with open(input_csv_file, "w", newline="") as csvfile:
+        csv.writer(csvfile).writerows(
+            [
+                ["user_id", "comments"],
+                ["abby_abernathy@example.org", "my phone is 858-555-0222"],
+                ["bert_beauregard@example.org", "my phone is 858-555-0223"],
+            ]
+        )
+
+    deid.deidentify_csv_with_crypto_hash(
+        GCLOUD_PROJECT,
+        input_csv_file,
+        output_csv_file,
+        ["EMAIL_ADDRESS", "PHONE_NUMBER"],
+        KEY_NAME,
+        base64.b64decode(WRAPPED_KEY),
+    )
+
+    out, _ = capsys.readouterr()
+    assert "De-identified 2 rows" in out
+    with open(output_csv_file) as csvfile:
+        output = csvfile.read()
+    assert "abby_abernathy@example.org" not in output
+    assert "858-555-0222" not in output
@@ -0,0 +1,274 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Estimates k-anonymity and l-diversity locally, before running DLP jobs.
+
+A DLP risk job (see k_anonymity.py and l_diversity.py) takes minutes, which
+is slow for trying out sets of quasi-identifiers. This analyzer computes the
+same metrics over a local CSV, Parquet or Arrow file with Arrow group-bys,
+optionally on a random sample of the rows. Its histograms are shaped like
+the buckets of DLP results, so the two can be compared once the chosen
+configuration is submitted as a DLP job.
+
+Example:
+
+    python local_risk_analysis.py patients.parquet \\
+        --quasi-ids age zip_code --sensitive-attribute diagnosis --sample 0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv
+import pyarrow.feather
+import pyarrow.parquet
+
+# Upper bounds of the histogram buckets. Every size up to 10 has its own
+# bucket, larger ones are grouped, and the last bucket is open ended.
+BUCKET_UPPER_BOUNDS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 20, 50, 100, 1000, 10000]
+# Example classes listed per bucket, as in DLP results.
+MAX_BUCKET_VALUES = 20
+MAX_TOP_SENSITIVE_VALUES = 5
+
+
+def load_table(path: str, columns: Optional[List[str]] = None) -> pa.Table:
+    """Reads the columns of a CSV, Parquet or Arrow IPC (Feather) file."""
+    if path.endswith(".csv"):
+        return pyarrow.csv.read_csv(
+            path, convert_options=pyarrow.csv.ConvertOptions(include_columns=columns)
+        )
+    if path.endswith(".parquet"):
+        return pyarrow.parquet.read_table(path, columns=columns)
+    if path.endswith((".arrow", ".feather", ".ipc")):
+        return pyarrow.feather.read_table(path, columns=columns)
+    raise ValueError(f"Unsupported file type: {path}")
+
+
+def sample_table(table: pa.Table, fraction: float, seed: int = 0) -> pa.Table:
+    """Keeps each row with probability `fraction`."""
+    if fraction >= 1:
+        return table
+    mask = np.random.default_rng(seed).random(table.num_rows) < fraction
+    return table.filter(pa.array(mask))
+
+
+def _bucket_bounds(sizes: pa.Array) -> pa.Array:
+    """Returns the index of the histogram bucket of each size."""
+    bounds = np.array(BUCKET_UPPER_BOUNDS)
+    return pa.array(np.searchsorted(bounds, sizes.to_numpy(), side="left"))
+
+
+def _histogram(
+    classes: pa.Table,
+    quasi_ids: List[str],
+    size_column: str,
+    lower_bound_key: str,
+    upper_bound_key: str,
+    make_value: Callable[[List, Dict], Dict],
+) -> List[Dict]:
+    """Groups equivalence classes into buckets by the values of `size_column`."""
+    classes = classes.append_column("bucket", _bucket_bounds(classes[size_column]))
+    buckets = (
+        classes.group_by("bucket")
+        .aggregate(
+            [
+                (size_column, "min"),
+                (size_column, "max"),
+                ([], "count_all"),
+            ]
+        )
+        .sort_by("bucket")
+    )
+    histogram = []
+    for bucket in buckets.to_pylist():
+        examples = classes.filter(pc.equal(classes["bucket"], bucket["bucket"]))
+        examples = examples.sort_by([(size_column, "ascending")]).slice(
+            0, MAX_BUCKET_VALUES
+        )
+        histogram.append(
+            {
+                lower_bound_key: bucket[f"{size_column}_min"],
+                upper_bound_key: bucket[f"{size_column}_max"],
+                # The number of equivalence classes in the bucket.
+                "bucket_size": bucket["count_all"],
+                "bucket_value_count": bucket["count_all"],
+                "bucket_values": [
+                    make_value([row[quasi_id] for quasi_id in quasi_ids], row)
+                    for row in examples.to_pylist()
+                ],
+            }
+        )
+    return histogram
+
+
+def equivalence_classes(table: pa.Table, quasi_ids: List[str]) -> pa.Table:
+    """Counts the rows sharing each combination of quasi-identifier values."""
+    classes = table.group_by(quasi_ids).aggregate([([], "count_all")])
+    return classes.rename_columns(quasi_ids + ["count"])
+
+
+def k_anonymity(table: pa.Table, quasi_ids: List[str]) -> Dict:
+    """Computes the k-anonymity of `quasi_ids` and its histogram.
+
+    Returns:
+        A dictionary with `k`, the size of the smallest equivalence class,
+        and `equivalence_class_histogram_buckets` shaped like the
+        `KAnonymityResult` of a DLP job.
+    """
+    classes = equivalence_classes(table, quasi_ids)
+    classes = classes.append_column("size", classes["count"])
+    return {
+        "k": pc.min(classes["size"]).as_py() or 0,
+        "equivalence_class_histogram_buckets": _histogram(
+            classes,
+            quasi_ids,
+            "size",
+            "equivalence_class_size_lower_bound",
+            "equivalence_class_size_upper_bound",
+            lambda values, row: {
+                "quasi_ids_values": values,
+                "equivalence_class_size": row["size"],
+            },
+        ),
+    }
+
+
+def l_diversity(
+    table: pa.Table, quasi_ids: List[str], sensitive_attribute: str
+) -> Dict:
+    """Computes the l-diversity of `sensitive_attribute` and its histogram.
+
+    Returns:
+        A dictionary with `l`, the fewest distinct sensitive values of any
+        equivalence class, and `sensitive_value_frequency_histogram_buckets`
+        shaped like the `LDiversityResult` of a DLP job.
+    """
+    pairs = (
+        table.group_by(quasi_ids + [sensitive_attribute])
+        .aggregate([([], "count_all")])
+        .rename_columns(quasi_ids + [sensitive_attribute, "count"])
+    )
+    classes = (
+        pairs.group_by(quasi_ids)
+        .aggregate([("count", "sum"), ([], "count_all")])
+        .rename_columns(quasi_ids + ["count", "distinct"])
+    )
+
+    histogram = _histogram(
+        classes,
+        quasi_ids,
+        "distinct",
+        "sensitive_value_frequency_lower_bound",
+        "sensitive_value_frequency_upper_bound",
+        lambda values, row: {
+            "quasi_ids_values": values,
+            "equivalence_class_size": row["count"],
+            "top_sensitive_values": [],
+        },
+    )
+
+    # Look up the most frequent sensitive values of the example classes only.
+    examples = {
+        tuple(value["quasi_ids_values"]): value
+        for bucket in histogram
+        for value in bucket["bucket_values"]
+    }
+    if examples:
+        keys = pa.Table.from_pylist(
+            [dict(zip(quasi_ids, key)) for key in examples],
+            schema=pa.schema([table.schema.field(q) for q in quasi_ids]),
+        )
+        top = pairs.join(keys, quasi_ids, join_type="left semi").sort_by(
+            [("count", "descending")]
+        )
+        for row in top.to_pylist():
+            value = examples[tuple(row[quasi_id] for quasi_id in quasi_ids)]
+            if len(value["top_sensitive_values"]) < MAX_TOP_SENSITIVE_VALUES:
+                value["top_sensitive_values"].append(
+                    {"value": row[sensitive_attribute], "count": row["count"]}
+                )
+
+    return {
+        "l": pc.min(classes["distinct"]).as_py() or 0,
+        "sensitive_value_frequency_histogram_buckets": histogram,
+    }
+
+
+def _print_histogram(buckets: List[Dict], lower_key: str, upper_key: str) -> None:
+    for i, bucket in enumerate(buckets):
+        print(f"Bucket {i}:")
+        print(f"   Bucket size range: [{bucket[lower_key]}, {bucket[upper_key]}]")
+        print(f"   Equivalence classes: {bucket['bucket_size']}")
+        for value in bucket["bucket_values"][:3]:
+            print(f"   Quasi-ID values: {value['quasi_ids_values']}")
+            print(f"   Class size: {value['equivalence_class_size']}")
+            for sensitive in value.get("top_sensitive_values", []):
+                print(
+                    f"   Sensitive value {sensitive['value']} occurs "
+                    f"{sensitive['count']} time(s)"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", help="CSV, Parquet or Arrow file to analyze.")
+    parser.add_argument(
+        "--quasi-ids",
+        nargs="+",
+        required=True,
+        help="A set of columns that form a composite key.",
+    )
+    parser.add_argument(
+        "--sensitive-attribute",
+        help="The column to measure l-diversity for. Omit for k-anonymity only.",
+    )
+    parser.add_argument(
+        "--sample",
+        type=float,
+        default=1.0,
+        help="Fraction of the rows to analyze. Class sizes count sampled rows.",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    columns = args.quasi_ids + (
+        [args.sensitive_attribute] if args.sensitive_attribute else []
+    )
+    table = sample_table(load_table(args.path, columns), args.sample)
+    print(f"Analyzing {table.num_rows} rows")
+
+    result = k_anonymity(table, args.quasi_ids)
+    print(f"k-anonymity: k = {result['k']}")
+    _print_histogram(
+        result["equivalence_class_histogram_buckets"],
+        "equivalence_class_size_lower_bound",
+        "equivalence_class_size_upper_bound",
+    )
+    if args.sensitive_attribute:
+        result = l_diversity(table, args.quasi_ids, args.sensitive_attribute)
+        print(f"l-diversity: l = {result['l']}")
+        _print_histogram(
+            result["sensitive_value_frequency_histogram_buckets"],
+            "sensitive_value_frequency_lower_bound",
+            "sensitive_value_frequency_upper_bound",
+        )
+    print(f"Done in {time.perf_counter() - start:.2f}s")
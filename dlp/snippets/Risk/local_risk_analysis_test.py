@@ -0,0 +1,97 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pathlib
+
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.feather
+import pyarrow.parquet
+
+import local_risk_analysis as risk
+
+import pytest
+
+TABLE = pa.table(
+    {
+        "age": [30, 30, 30, 40, 40, 50] + [60] * 15,
+        "zip_code": ["94043"] * 6 + ["10001"] * 15,
+        "diagnosis": ["flu", "cold", "flu", "flu", "flu", "cold"]
+        + ["flu", "cold", "asthma"] * 5,
+    }
+)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet", ".arrow"])
+def test_load_table(tmp_path: pathlib.Path, suffix: str) -> None:
+    path = os.path.join(tmp_path, f"patients{suffix}")
+    if suffix == ".csv":
+        pyarrow.csv.write_csv(TABLE, path)
+    elif suffix == ".parquet":
+        pyarrow.parquet.write_table(TABLE, path)
+    else:
+        pyarrow.feather.write_feather(TABLE, path)
+
+    table = risk.load_table(path, ["age", "diagnosis"])
+    assert table.column_names == ["age", "diagnosis"]
+    assert table.num_rows == TABLE.num_rows
+
+
+def test_k_anonymity() -> None:
+    result = risk.k_anonymity(TABLE, ["age", "zip_code"])
+
+    assert result["k"] == 1
+    buckets = result["equivalence_class_histogram_buckets"]
+    assert [
+        (
+            bucket["equivalence_class_size_lower_bound"],
+            bucket["equivalence_class_size_upper_bound"],
+            bucket["bucket_size"],
+        )
+        for bucket in buckets
+    ] == [(1, 1, 1), (2, 2, 1), (3, 3, 1), (15, 15, 1)]
+    assert buckets[0]["bucket_values"] == [
+        {"quasi_ids_values": [50, "94043"], "equivalence_class_size": 1}
+    ]
+
+
+def test_l_diversity() -> None:
+    result = risk.l_diversity(TABLE, ["age", "zip_code"], "diagnosis")
+
+    assert result["l"] == 1
+    buckets = result["sensitive_value_frequency_histogram_buckets"]
+    assert [bucket["sensitive_value_frequency_lower_bound"] for bucket in buckets] == [
+        1,
+        2,
+        3,
+    ]
+    # Ages 40 and 50 have a single diagnosis each.
+    assert buckets[0]["bucket_size"] == 2
+    (value,) = buckets[1]["bucket_values"]
+    assert value["quasi_ids_values"] == [30, "94043"]
+    assert value["equivalence_class_size"] == 3
+    assert value["top_sensitive_values"] == [
+        {"value": "flu", "count": 2},
+        {"value": "cold", "count": 1},
+    ]
+
+
+def test_sample_table() -> None:
+    table = pa.table({"id": range(10000)})
+
+    sample = risk.sample_table(table, 0.1)
+    assert 800 < sample.num_rows < 1200
+    assert risk.sample_table(table, 0.1).equals(sample)
+    assert risk.sample_table(table, 1.0) is table
@@ -0,0 +1,295 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Concurrent collector for Document AI batch processing output.
+
+`batch_process_documents_sample.py` lists and downloads the JSON shards of
+each input file one at a time and parses them on the main thread. This
+module downloads shards with a bounded thread pool, parses them in a process
+pool and yields one merged `Document` per input file as soon as all of its
+shards are ready.
+
+Run it against a finished batch output prefix to measure throughput. Set
+`STORAGE_EMULATOR_HOST` to point the storage client at a local emulator:
+
+    STORAGE_EMULATOR_HOST=http://localhost:4443 \
+        python batch_output_collector.py gs://bucket/prefix/ --skip-field pages.image
+"""
+
+import argparse
+import collections
+from concurrent import futures
+import json
+import re
+import time
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from google.cloud import documentai  # type: ignore
+from google.cloud import storage
+from google.protobuf import json_format
+
+_TEXT_ANCHOR = documentai.Document.TextAnchor.pb().DESCRIPTOR.full_name
+
+
+class MissingOutputError(Exception):
+    """Raised when output folders of a batch process contain no JSON shards."""
+
+    def __init__(self, destinations: Sequence[str]) -> None:
+        super().__init__(f"No batch output found in: {', '.join(destinations)}")
+        self.destinations = destinations
+
+
+def _split_gcs_uri(uri: str) -> Tuple[str, str]:
+    matches = re.match(r"gs://(.*?)/(.*)", uri)
+    if not matches:
+        raise ValueError(f"Could not parse GCS URI: {uri}")
+    return matches.group(1), matches.group(2)
+
+
+def _drop_field(value: object, path: Sequence[str]) -> None:
+    """Removes a dotted JSON field path, descending into lists."""
+    if isinstance(value, list):
+        for item in value:
+            _drop_field(item, path)
+    elif isinstance(value, dict) and path:
+        if len(path) == 1:
+            value.pop(path[0], None)
+        elif path[0] in value:
+            _drop_field(value[path[0]], path[1:])
+
+
+def _shift_text_anchors(message, offset: int) -> None:
+    """Adds `offset` to every text segment nested anywhere in `message`."""
+    for field, value in message.ListFields():
+        if field.message_type is None:
+            continue
+        repeated = field.label == field.LABEL_REPEATED
+        if field.message_type.full_name == _TEXT_ANCHOR:
+            for anchor in value if repeated else [value]:
+                for segment in anchor.text_segments:
+                    segment.start_index += offset
+                    segment.end_index += offset
+        elif repeated:
+            if not field.message_type.GetOptions().map_entry:
+                for item in value:
+                    _shift_text_anchors(item, offset)
+        else:
+            _shift_text_anchors(value, offset)
+
+
+def parse_shard(data: bytes, skip_fields: Sequence[str] = ()) -> Tuple[int, bytes]:
+    """Parses one JSON output shard into a serialized `Document`.
+
+    Runs in a worker process, so it takes and returns plain bytes. Text
+    anchors are shifted by the shard's text offset so that shards of the
+    same input file can be merged by concatenation.
+
+    Args:
+        data: the JSON shard as downloaded from Cloud Storage.
+        skip_fields: dotted JSON field paths to drop before parsing, for
+            example `pages.image`.
+
+    Returns:
+        The shard index and the serialized `Document` protobuf.
+    """
+    document_json = json.loads(data)
+    for path in skip_fields:
+        _drop_field(document_json, path.split("."))
+
+    document = json_format.ParseDict(
+        document_json, documentai.Document.pb()(), ignore_unknown_fields=True
+    )
+    if document.shard_info.text_offset:
+        _shift_text_anchors(document, document.shard_info.text_offset)
+    return document.shard_info.shard_index, document.SerializeToString()
+
+
+def merge_shards(shards: Iterable[bytes]) -> documentai.Document:
+    """Merges serialized document shards, already in shard order."""
+    merged = None
+    texts: List[str] = []
+    for data in shards:
+        shard = documentai.Document.pb().FromString(data)
+        texts.append(shard.text)
+        if merged is None:
+            merged = shard
+            continue
+        for field, value in shard.ListFields():
+            if field.label == field.LABEL_REPEATED:
+                getattr(merged, field.name).extend(value)
+
+    if merged is None:
+        return documentai.Document()
+    merged.text = "".join(texts)
+    merged.ClearField("shard_info")
+    return documentai.Document.wrap(merged)
+
+
+def list_output_destinations(
+    gcs_output_uri: str, storage_client: Optional[storage.Client] = None
+) -> List[str]:
+    """Lists the per-input-file output folders under a batch output prefix.
+
+    Document AI writes the shards of each input file to
+    `gs://BUCKET/PREFIX/OPERATION_NUMBER/INPUT_FILE_NUMBER/`.
+    """
+    storage_client = storage_client or storage.Client()
+    bucket, prefix = _split_gcs_uri(gcs_output_uri)
+    destinations = {
+        f"gs://{bucket}/{blob.name.rsplit('/', 1)[0]}/"
+        for blob in storage_client.list_blobs(bucket, prefix=prefix)
+        if blob.name.endswith(".json")
+    }
+    return sorted(destinations)
+
+
+def collect_documents(
+    destinations: Iterable[str],
+    storage_client: Optional[storage.Client] = None,
+    max_downloads: int = 16,
+    max_parsers: Optional[int] = None,
+    skip_fields: Sequence[str] = (),
+) -> Iterator[Tuple[str, documentai.Document]]:
+    """Downloads and parses batch output concurrently.
+
+    Args:
+        destinations: output folders, one per input file, as `gs://` URIs.
+        storage_client: optional client; one is created when omitted.
+        max_downloads: the maximum number of shards downloaded at once.
+        max_parsers: the number of parser processes, defaults to the CPU count.
+        skip_fields: dotted JSON field paths dropped from every shard.
+
+    Yields:
+        `(destination, document)` tuples in completion order, with all the
+        shards of each input file merged into one `Document`.
+
+    Raises:
+        MissingOutputError: after yielding the other documents, if some
+            destinations contain no JSON shards.
+    """
+    storage_client = storage_client or storage.Client()
+    skip_fields = tuple(skip_fields)
+    # Downloaded shards wait in memory until a parser takes them, so the
+    # number of shards between download and merge is bounded.
+    max_in_flight = 2 * max_downloads
+
+    def list_shards(destination: str) -> List[storage.Blob]:
+        bucket, prefix = _split_gcs_uri(destination)
+        # Document AI should only output JSON files to GCS
+        return [
+            blob
+            for blob in storage_client.list_blobs(bucket, prefix=prefix)
+            if blob.name.endswith(".json")
+        ]
+
+    with futures.ThreadPoolExecutor(
+        max_workers=max_downloads
+    ) as downloader, futures.ProcessPoolExecutor(max_workers=max_parsers) as parser:
+        listings = {
+            downloader.submit(list_shards, destination): destination
+            for destination in destinations
+        }
+        downloads: Dict[futures.Future, str] = {}
+        parses: Dict[futures.Future, str] = {}
+        queue: Deque[Tuple[str, storage.Blob]] = collections.deque()
+        remaining: Dict[str, int] = {}
+        parsed: Dict[str, Dict[int, bytes]] = {}
+        missing: List[str] = []
+
+        while listings or downloads or parses:
+            while queue and len(downloads) + len(parses) < max_in_flight:
+                destination, blob = queue.popleft()
+                downloads[downloader.submit(blob.download_as_bytes)] = destination
+
+            done, _ = futures.wait(
+                [*listings, *downloads, *parses], return_when=futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future in listings:
+                    destination = listings.pop(future)
+                    blobs = future.result()
+                    if blobs:
+                        remaining[destination] = len(blobs)
+                        parsed[destination] = {}
+                        queue.extend((destination, blob) for blob in blobs)
+                    else:
+                        missing.append(destination)
+                elif future in downloads:
+                    destination = downloads.pop(future)
+                    parse = parser.submit(parse_shard, future.result(), skip_fields)
+                    parses[parse] = destination
+                else:
+                    destination = parses.pop(future)
+                    shard_index, data = future.result()
+                    parsed[destination][shard_index] = data
+                    remaining[destination] -= 1
+                    if not remaining[destination]:
+                        shards = parsed.pop(destination)
+                        yield destination, merge_shards(
+                            shards[index] for index in sorted(shards)
+                        )
+
+    if missing:
+        raise MissingOutputError(sorted(missing))
+
+
+def collect_batch_documents(
+    metadata: documentai.BatchProcessMetadata, **kwargs
+) -> Iterator[Tuple[str, documentai.Document]]:
+    """Collects the output of a finished batch process operation.
+
+    Args:
+        metadata: the operation metadata, as read in
+            `batch_process_documents_sample.py`.
+        **kwargs: passed through to `collect_documents`.
+
+    Yields:
+        `(input_gcs_source, document)` tuples in completion order.
+    """
+    sources = {
+        process.output_gcs_destination.rstrip("/") + "/": process.input_gcs_source
+        for process in metadata.individual_process_statuses
+    }
+    for destination, document in collect_documents(sources, **kwargs):
+        yield sources[destination], document
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("gcs_output_uri", help="Batch output prefix, gs://...")
+    parser.add_argument("--max-downloads", type=int, default=16)
+    parser.add_argument("--max-parsers", type=int, default=None)
+    parser.add_argument(
+        "--skip-field",
+        dest="skip_fields",
+        action="append",
+        default=[],
+        help="Dotted JSON field path to drop, e.g. pages.image. Repeatable.",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    destinations = list_output_destinations(args.gcs_output_uri)
+    count = 0
+    for _, document in collect_documents(
+        destinations,
+        max_downloads=args.max_downloads,
+        max_parsers=args.max_parsers,
+        skip_fields=args.skip_fields,
+    ):
+        count += 1
+    elapsed = time.perf_counter() - start
+    print(f"Collected {count} documents in {elapsed:.2f}s ({count / elapsed:.1f}/s)")
@@ -0,0 +1,116 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# flake8: noqa
+
+from unittest import mock
+
+from google.cloud import documentai
+import pytest
+
+from documentai.snippets import batch_output_collector
+
+
+def _shard(text, index, count, offset):
+    segment = documentai.Document.TextAnchor.TextSegment(
+        start_index=0, end_index=len(text)
+    )
+    document = documentai.Document(
+        text=text,
+        pages=[
+            documentai.Document.Page(
+                page_number=index + 1,
+                image=documentai.Document.Page.Image(content=b"x" * 64),
+                layout=documentai.Document.Page.Layout(
+                    text_anchor=documentai.Document.TextAnchor(text_segments=[segment])
+                ),
+            )
+        ],
+        shard_info=documentai.Document.ShardInfo(
+            shard_index=index, shard_count=count, text_offset=offset
+        ),
+    )
+    return documentai.Document.to_json(document).encode("utf-8")
+
+
+def _blob(name, data):
+    blob = mock.Mock()
+    blob.name = name
+    blob.download_as_bytes.return_value = data
+    return blob
+
+
+def test_parse_and_merge_shards():
+    shards = [
+        batch_output_collector.parse_shard(
+            _shard("Hello ", 0, 2, 0), skip_fields=["pages.image"]
+        ),
+        batch_output_collector.parse_shard(
+            _shard("world", 1, 2, 6), skip_fields=["pages.image"]
+        ),
+    ]
+    document = batch_output_collector.merge_shards(data for _, data in sorted(shards))
+
+    assert document.text == "Hello world"
+    assert [page.page_number for page in document.pages] == [1, 2]
+    assert not document.pages[0].image.content
+    segment = document.pages[1].layout.text_anchor.text_segments[0]
+    assert document.text[segment.start_index : segment.end_index] == "world"
+
+
+def test_collect_documents():
+    blobs = {
+        "out/1/0/": [
+            _blob("out/1/0/doc-1.json", _shard("world", 1, 2, 6)),
+            _blob("out/1/0/doc-0.json", _shard("Hello ", 0, 2, 0)),
+        ],
+        "out/1/1/": [_blob("out/1/1/doc-0.json", _shard("Solo", 0, 1, 0))],
+    }
+    storage_client = mock.Mock()
+    storage_client.list_blobs.side_effect = lambda bucket, prefix: blobs[prefix]
+
+    documents = dict(
+        batch_output_collector.collect_documents(
+            ["gs://bucket/out/1/0/", "gs://bucket/out/1/1/"],
+            storage_client=storage_client,
+            max_downloads=1,
+            max_parsers=2,
+        )
+    )
+
+    assert documents["gs://bucket/out/1/0/"].text == "Hello world"
+    assert documents["gs://bucket/out/1/1/"].text == "Solo"
+
+
+def test_collect_documents_reports_missing_output():
+    blobs = {
+        "out/1/0/": [_blob("out/1/0/doc-0.json", _shard("Solo", 0, 1, 0))],
+        "out/1/1/": [],
+    }
+    storage_client = mock.Mock()
+    storage_client.list_blobs.side_effect = lambda bucket, prefix: blobs[prefix]
+
+    documents = batch_output_collector.collect_documents(
+        ["gs://bucket/out/1/0/", "gs://bucket/out/1/1/"],
+        storage_client=storage_client,
+        max_parsers=1,
+    )
+
+    destination, document = next(documents)
+    assert destination == "gs://bucket/out/1/0/"
+    assert document.text == "Solo"
+    with pytest.raises(batch_output_collector.MissingOutputError) as error:
+        next(documents)
+    assert error.value.destinations == ["gs://bucket/out/1/1/"]
@@ -0,0 +1,384 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Precomputed text-anchor index for processed Document AI documents.
+
+`layout_to_text()` in `handle_response_sample.py` walks the text segments of
+a layout through the proto-plus wrappers on every call. For large documents,
+where tables, form fields and entities are resolved one by one, that walk
+dominates post-processing. `DocumentIndex` reads every text anchor once from
+the raw protobuf message into NumPy offset arrays, derives the
+page -> block -> paragraph -> line -> token hierarchy from those offsets and
+exports tables, form fields and entities as Arrow tables or Parquet files.
+
+Example:
+    index = DocumentIndex(document)
+    index.export_parquet("output/")
+"""
+
+import os
+from typing import Dict, List, Optional, Sequence
+
+from google.cloud import documentai
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Layout element kinds, outermost first. Each kind's parent is the kind
+# before it.
+LAYOUT_KINDS = ("block", "paragraph", "line", "token")
+
+_CELL_KIND = "table_cell"
+_FIELD_NAME_KIND = "field_name"
+_FIELD_VALUE_KIND = "field_value"
+_ENTITY_KIND = "entity"
+_KINDS = LAYOUT_KINDS + (_CELL_KIND, _FIELD_NAME_KIND, _FIELD_VALUE_KIND, _ENTITY_KIND)
+
+
+class _Builder:
+    """Accumulates text anchors and element metadata into flat lists."""
+
+    def __init__(self) -> None:
+        self.seg_start: List[int] = []
+        self.seg_end: List[int] = []
+        self.offsets: List[int] = [0]
+        self.kind: List[int] = []
+        self.page: List[int] = []
+        self.ordinal: List[int] = []
+
+    def add(self, text_anchor, kind: str, page: int, ordinal: int) -> int:
+        for segment in text_anchor.text_segments:
+            self.seg_start.append(segment.start_index)
+            self.seg_end.append(segment.end_index)
+        self.offsets.append(len(self.seg_start))
+        self.kind.append(_KINDS.index(kind))
+        self.page.append(page)
+        self.ordinal.append(ordinal)
+        return len(self.kind) - 1
+
+
+class DocumentIndex:
+    """Indexes the text anchors of a `documentai.Document` for fast lookup.
+
+    Every element with a text anchor gets an integer id. Segment offsets are
+    stored in CSR form: the segments of element `i` are
+    `seg_start[offsets[i]:offsets[i + 1]]` and the matching `seg_end` slice.
+
+    Args:
+        document: a processed Document AI document.
+    """
+
+    def __init__(self, document: documentai.Document) -> None:
+        # The raw protobuf message avoids the proto-plus wrapper overhead on
+        # every field access while the index is built.
+        pb = documentai.Document.pb(document)
+        self.text: str = pb.text
+        builder = _Builder()
+
+        cells: Dict[str, List] = {
+            "id": [],
+            "page": [],
+            "table": [],
+            "row": [],
+            "column": [],
+            "is_header": [],
+        }
+        fields: Dict[str, List] = {
+            "name_id": [],
+            "value_id": [],
+            "page": [],
+            "field": [],
+            "name_confidence": [],
+            "value_confidence": [],
+        }
+        entities: Dict[str, List] = {
+            "id": [],
+            "parent": [],
+            "type": [],
+            "mention_text": [],
+            "normalized_value": [],
+            "confidence": [],
+        }
+
+        for page_index, page in enumerate(pb.pages):
+            for kind in LAYOUT_KINDS:
+                for ordinal, element in enumerate(getattr(page, kind + "s")):
+                    builder.add(element.layout.text_anchor, kind, page_index, ordinal)
+
+            for table_index, table in enumerate(page.tables):
+                rows = [(row, True) for row in table.header_rows] + [
+                    (row, False) for row in table.body_rows
+                ]
+                for row_index, (row, is_header) in enumerate(rows):
+                    for column_index, cell in enumerate(row.cells):
+                        cells["id"].append(
+                            builder.add(
+                                cell.layout.text_anchor,
+                                _CELL_KIND,
+                                page_index,
+                                len(cells["id"]),
+                            )
+                        )
+                        cells["page"].append(page_index)
+                        cells["table"].append(table_index)
+                        cells["row"].append(row_index)
+                        cells["column"].append(column_index)
+                        cells["is_header"].append(is_header)
+
+            for field_index, field in enumerate(page.form_fields):
+                fields["name_id"].append(
+                    builder.add(
+                        field.field_name.text_anchor,
+                        _FIELD_NAME_KIND,
+                        page_index,
+                        field_index,
+                    )
+                )
+                fields["value_id"].append(
+                    builder.add(
+                        field.field_value.text_anchor,
+                        _FIELD_VALUE_KIND,
+                        page_index,
+                        field_index,
+                    )
+                )
+                fields["page"].append(page_index)
+                fields["field"].append(field_index)
+                fields["name_confidence"].append(field.field_name.confidence)
+                fields["value_confidence"].append(field.field_value.confidence)
+
+        def add_entity(entity, parent: int) -> int:
+            entity_id = builder.add(
+                entity.text_anchor, _ENTITY_KIND, -1, len(entities["id"])
+            )
+            entities["id"].append(entity_id)
+            entities["parent"].append(parent)
+            entities["type"].append(entity.type_)
+            entities["mention_text"].append(
+                entity.mention_text or entity.text_anchor.content
+            )
+            entities["normalized_value"].append(entity.normalized_value.text)
+            entities["confidence"].append(entity.confidence)
+            return entity_id
+
+        for entity in pb.entities:
+            parent = add_entity(entity, -1)
+            for prop in entity.properties:
+                add_entity(prop, parent)
+
+        self.seg_start = np.asarray(builder.seg_start, dtype=np.int64)
+        self.seg_end = np.asarray(builder.seg_end, dtype=np.int64)
+        self.offsets = np.asarray(builder.offsets, dtype=np.int64)
+        self.kind = np.asarray(builder.kind, dtype=np.int8)
+        self.page = np.asarray(builder.page, dtype=np.int32)
+        self.ordinal = np.asarray(builder.ordinal, dtype=np.int32)
+        self._cells = cells
+        self._fields = fields
+        self._entities = entities
+
+        self.span_start, self.span_end = self._spans()
+        self.parent = self._link_parents()
+
+    def _spans(self):
+        """Computes the [start, end) text span covered by each element."""
+        n = len(self.kind)
+        span_start = np.full(n, -1, dtype=np.int64)
+        span_end = np.full(n, -1, dtype=np.int64)
+        counts = np.diff(self.offsets)
+        non_empty = counts > 0
+        if self.seg_start.size:
+            starts = self.offsets[:-1][non_empty]
+            span_start[non_empty] = np.minimum.reduceat(self.seg_start, starts)
+            span_end[non_empty] = np.maximum.reduceat(self.seg_end, starts)
+        return span_start, span_end
+
+    def _link_parents(self) -> np.ndarray:
+        """Links each layout element to the enclosing element one level up.
+
+        Document AI returns blocks, paragraphs, lines and tokens as flat
+        per-page lists, so containment is derived from the text spans: a
+        child belongs to the parent whose span contains the child's start.
+        """
+        parent = np.full(len(self.kind), -1, dtype=np.int64)
+        for parent_kind, child_kind in zip(LAYOUT_KINDS, LAYOUT_KINDS[1:]):
+            parent_ids = np.flatnonzero(
+                (self.kind == _KINDS.index(parent_kind)) & (self.span_start >= 0)
+            )
+            child_ids = np.flatnonzero(
+                (self.kind == _KINDS.index(child_kind)) & (self.span_start >= 0)
+            )
+            if not parent_ids.size or not child_ids.size:
+                continue
+
+            # Sort parents by (page, start) so a single searchsorted over a
+            # combined key resolves every child at once.
+            stride = int(self.span_end.max()) + 1
+            parent_key = self.page[parent_ids].astype(np.int64) * stride + (
+                self.span_start[parent_ids]
+            )
+            order = np.argsort(parent_key, kind="stable")
+            parent_ids = parent_ids[order]
+            parent_key = parent_key[order]
+
+            child_key = (
+                self.page[child_ids].astype(np.int64) * stride
+                + self.span_start[child_ids]
+            )
+            position = np.searchsorted(parent_key, child_key, side="right") - 1
+            candidates = parent_ids[np.maximum(position, 0)]
+            contained = (
+                (position >= 0)
+                & (self.page[candidates] == self.page[child_ids])
+                & (self.span_start[child_ids] < self.span_end[candidates])
+            )
+            parent[child_ids[contained]] = candidates[contained]
+        return parent
+
+    def element_ids(self, kind: str, page: Optional[int] = None) -> np.ndarray:
+        """Returns the ids of all elements of `kind`, optionally on one page."""
+        mask = self.kind == _KINDS.index(kind)
+        if page is not None:
+            mask &= self.page == page
+        return np.flatnonzero(mask)
+
+    def children(self, element_id: int) -> np.ndarray:
+        """Returns the ids of the layout elements directly inside `element_id`."""
+        return np.flatnonzero(self.parent == element_id)
+
+    def texts(self, element_ids: Optional[Sequence[int]] = None) -> List[str]:
+        """Resolves the text of many elements at once.
+
+        Args:
+            element_ids: ids to resolve. Defaults to every element.
+
+        Returns:
+            The text of each element, in the order of `element_ids`.
+        """
+        ids = (
+            np.arange(len(self.kind))
+            if element_ids is None
+            else np.asarray(element_ids, dtype=np.int64)
+        )
+        first = self.offsets[ids]
+        last = self.offsets[ids + 1]
+        text = self.text
+        result = [""] * len(ids)
+
+        # Almost every element is anchored by a single segment, which maps
+        # to one slice of the document text.
+        single = np.flatnonzero(last - first == 1)
+        for i, start, end in zip(
+            single.tolist(),
+            self.seg_start[first[single]].tolist(),
+            self.seg_end[first[single]].tolist(),
+        ):
+            result[i] = text[start:end]
+
+        for i in np.flatnonzero(last - first > 1).tolist():
+            segments = slice(first[i], last[i])
+            result[i] = "".join(
+                text[start:end]
+                for start, end in zip(
+                    self.seg_start[segments].tolist(), self.seg_end[segments].tolist()
+                )
+            )
+        return result
+
+    def tables_to_arrow(self) -> pa.Table:
+        """Returns every table cell as one row of an Arrow table."""
+        cells = self._cells
+        return pa.table(
+            {
+                "page": pa.array(cells["page"], pa.int32()),
+                "table": pa.array(cells["table"], pa.int32()),
+                "row": pa.array(cells["row"], pa.int32()),
+                "column": pa.array(cells["column"], pa.int32()),
+                "is_header": pa.array(cells["is_header"], pa.bool_()),
+                "text": pa.array(
+                    [text.strip() for text in self.texts(cells["id"])], pa.string()
+                ),
+            }
+        )
+
+    def form_fields_to_arrow(self) -> pa.Table:
+        """Returns every form field as one row of an Arrow table."""
+        fields = self._fields
+        return pa.table(
+            {
+                "page": pa.array(fields["page"], pa.int32()),
+                "field": pa.array(fields["field"], pa.int32()),
+                "name": pa.array(
+                    [text.strip() for text in self.texts(fields["name_id"])],
+                    pa.string(),
+                ),
+                "value": pa.array(
+                    [text.strip() for text in self.texts(fields["value_id"])],
+                    pa.string(),
+                ),
+                "name_confidence": pa.array(fields["name_confidence"], pa.float32()),
+                "value_confidence": pa.array(fields["value_confidence"], pa.float32()),
+            }
+        )
+
+    def entities_to_arrow(self) -> pa.Table:
+        """Returns every entity and nested property as one row of an Arrow table.
+
+        `parent` is the row of the enclosing entity, or -1 for top-level ones.
+        """
+        entities = self._entities
+        row_of = {entity_id: row for row, entity_id in enumerate(entities["id"])}
+        texts = self.texts(entities["id"])
+        return pa.table(
+            {
+                "parent": pa.array(
+                    [row_of.get(parent, -1) for parent in entities["parent"]],
+                    pa.int32(),
+                ),
+                "type": pa.array(entities["type"], pa.string()),
+                # Prefer the anchored text; fall back to the mention text for
+                # entities that are not anchored to the document text.
+                "text": pa.array(
+                    [
+                        text or mention
+                        for text, mention in zip(texts, entities["mention_text"])
+                    ],
+                    pa.string(),
+                ),
+                "normalized_value": pa.array(entities["normalized_value"], pa.string()),
+                "confidence": pa.array(entities["confidence"], pa.float32()),
+            }
+        )
+
+    def export_parquet(self, output_dir: str) -> List[str]:
+        """Writes tables, form fields and entities as Parquet files.
+
+        Args:
+            output_dir: directory the `tables.parquet`, `form_fields.parquet`
+                and `entities.parquet` files are written to.
+
+        Returns:
+            The paths of the files written.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for name, table in (
+            ("tables", self.tables_to_arrow()),
+            ("form_fields", self.form_fields_to_arrow()),
+            ("entities", self.entities_to_arrow()),
+        ):
+            path = os.path.join(output_dir, f"{name}.parquet")
+            pq.write_table(table, path)
+            paths.append(path)
+        return paths
@@ -0,0 +1,163 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# flake8: noqa
+
+import pyarrow.parquet as pq
+
+from google.cloud import documentai
+
+from documentai.snippets import document_index
+from documentai.snippets import handle_response_sample
+
+TEXT = "Name: Jane\nDate: 2024\n"
+
+
+def _layout(*spans):
+    return documentai.Document.Page.Layout(
+        text_anchor=documentai.Document.TextAnchor(
+            text_segments=[
+                documentai.Document.TextAnchor.TextSegment(
+                    start_index=start, end_index=end
+                )
+                for start, end in spans
+            ]
+        ),
+        confidence=0.9,
+    )
+
+
+def _document() -> documentai.Document:
+    Page = documentai.Document.Page
+    return documentai.Document(
+        text=TEXT,
+        pages=[
+            Page(
+                blocks=[Page.Block(layout=_layout((0, 23)))],
+                paragraphs=[
+                    Page.Paragraph(layout=_layout((0, 11))),
+                    Page.Paragraph(layout=_layout((11, 23))),
+                ],
+                lines=[
+                    Page.Line(layout=_layout((0, 11))),
+                    Page.Line(layout=_layout((11, 23))),
+                ],
+                tokens=[
+                    Page.Token(layout=_layout((0, 5))),
+                    Page.Token(layout=_layout((6, 11))),
+                    Page.Token(layout=_layout((11, 16))),
+                    Page.Token(layout=_layout((17, 23))),
+                ],
+                tables=[
+                    Page.Table(
+                        header_rows=[
+                            Page.Table.TableRow(
+                                cells=[
+                                    Page.Table.TableCell(layout=_layout((0, 4))),
+                                    Page.Table.TableCell(layout=_layout((11, 15))),
+                                ]
+                            )
+                        ],
+                        body_rows=[
+                            Page.Table.TableRow(
+                                cells=[
+                                    Page.Table.TableCell(layout=_layout((6, 10))),
+                                    Page.Table.TableCell(
+                                        layout=_layout((17, 19), (19, 21))
+                                    ),
+                                ]
+                            )
+                        ],
+                    )
+                ],
+                form_fields=[
+                    Page.FormField(
+                        field_name=_layout((0, 5)), field_value=_layout((6, 11))
+                    ),
+                    Page.FormField(
+                        field_name=_layout((11, 16)), field_value=_layout((17, 22))
+                    ),
+                ],
+            )
+        ],
+        entities=[
+            documentai.Document.Entity(
+                type_="name",
+                text_anchor=documentai.Document.TextAnchor(
+                    text_segments=[
+                        documentai.Document.TextAnchor.TextSegment(
+                            start_index=6, end_index=10
+                        )
+                    ]
+                ),
+                properties=[
+                    documentai.Document.Entity(type_="first_name", mention_text="J")
+                ],
+            )
+        ],
+    )
+
+
+def test_texts_match_layout_to_text() -> None:
+    document = _document()
+    index = document_index.DocumentIndex(document)
+
+    page = document.pages[0]
+    layouts = [
+        element.layout
+        for kind in document_index.LAYOUT_KINDS
+        for element in getattr(page, kind + "s")
+    ]
+    expected = [handle_response_sample.layout_to_text(l, TEXT) for l in layouts]
+    ids = [i for kind in document_index.LAYOUT_KINDS for i in index.element_ids(kind)]
+    assert index.texts(ids) == expected
+
+
+def test_hierarchy() -> None:
+    index = document_index.DocumentIndex(_document())
+    block = index.element_ids("block")[0]
+    paragraphs = index.children(block)
+    assert index.texts(paragraphs) == ["Name: Jane\n", "Date: 2024\n"]
+
+    line = index.element_ids("line")[1]
+    assert index.texts(index.children(line)) == ["Date:", "2024\n"]
+    assert index.parent[line] == paragraphs[1]
+
+
+def test_export_parquet(tmp_path) -> None:
+    index = document_index.DocumentIndex(_document())
+    paths = index.export_parquet(str(tmp_path))
+    assert len(paths) == 3
+
+    tables = pq.read_table(tmp_path / "tables.parquet").to_pylist()
+    assert [(c["row"], c["column"], c["text"]) for c in tables] == [
+        (0, 0, "Name"),
+        (0, 1, "Date"),
+        (1, 0, "Jane"),
+        (1, 1, "2024"),
+    ]
+    assert [c["is_header"] for c in tables] == [True, True, False, False]
+
+    fields = pq.read_table(tmp_path / "form_fields.parquet").to_pylist()
+    assert [(f["name"], f["value"]) for f in fields] == [
+        ("Name:", "Jane"),
+        ("Date:", "2024"),
+    ]
+
+    entities = pq.read_table(tmp_path / "entities.parquet").to_pylist()
+    assert [(e["type"], e["text"], e["parent"]) for e in entities] == [
+        ("name", "Jane", -1),
+        ("first_name", "J", 0),
+    ]
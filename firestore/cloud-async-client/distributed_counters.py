@@ -14,6 +14,7 @@
 
 # [START firestore_solution_sharded_counter_custom_type_async]
 import random
+import time
 
 from google.cloud import firestore
 
@@ -41,21 +42,27 @@ class Counter:
 
     def __init__(self, num_shards):
         self._num_shards = num_shards
+        self._cached_counts = {}
 
     # [END firestore_solution_sharded_counter_custom_type_async]
 
     # [START firestore_solution_sharded_counter_create_async]
-    async def init_counter(self, doc_ref):
+    async def init_counter(self, doc_ref, client):
         """
         Create a given number of shards as
-        subcollection of specified document.
+        subcollection of specified document,
+        in batched writes of the given AsyncClient.
         """
         col_ref = doc_ref.collection("shards")
 
-        # Initialize each shard with count=0
-        for num in range(self._num_shards):
-            shard = Shard()
-            await col_ref.document(str(num)).set(shard.to_dict())
+        # Initialize each shard with count=0, writing up to 500 shards
+        # (the batch write limit) per commit.
+        for start in range(0, self._num_shards, 500):
+            batch = client.batch()
+            for num in range(start, min(start + 500, self._num_shards)):
+                shard = Shard()
+                batch.set(col_ref.document(str(num)), shard.to_dict())
+            await batch.commit()
 
     # [END firestore_solution_sharded_counter_create_async]
 
@@ -72,10 +79,26 @@ class Counter:
     # [START firestore_solution_sharded_counter_get_async]
     async def get_count(self, doc_ref):
         """Return a total count across all shards."""
+        # A single query streams every shard, instead of listing the shard
+        # documents and then reading each of them separately.
         total = 0
-        shards = doc_ref.collection("shards").list_documents()
+        shards = doc_ref.collection("shards").select(["count"]).stream()
         async for shard in shards:
-            total += (await shard.get()).to_dict().get("count", 0)
+            total += shard.to_dict().get("count", 0)
         return total
 
     # [END firestore_solution_sharded_counter_get_async]
+
+    async def get_count_cached(self, doc_ref, max_staleness=1.0):
+        """
+        Return a total count that is at most `max_staleness` seconds old,
+        reading the shards only when the cached total has expired.
+        """
+        cached = self._cached_counts.get(doc_ref.path)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < max_staleness:
+            return cached[0]
+
+        total = await self.get_count(doc_ref)
+        self._cached_counts[doc_ref.path] = (total, now)
+        return total
@@ -39,7 +39,7 @@ async def test_distributed_counters(fs_client):
     col = fs_client.collection("dc_samples")
     doc_ref = col.document("distributed_counter")
     counter = distributed_counters.Counter(2)
-    await counter.init_counter(doc_ref)
+    await counter.init_counter(doc_ref, fs_client)
 
     shards = doc_ref.collection("shards").list_documents()
     shards_list = [shard async for shard in shards]
@@ -50,6 +50,24 @@ async def test_distributed_counters(fs_client):
     assert await counter.get_count(doc_ref) == 2
 
 
+async def test_distributed_counters_cached(fs_client):
+    col = fs_client.collection("dc_samples")
+    doc_ref = col.document("distributed_counter_cached")
+    counter = distributed_counters.Counter(2)
+    await counter.init_counter(doc_ref, fs_client)
+
+    assert await counter.get_count_cached(doc_ref, max_staleness=60) == 0
+    await counter.increment_counter(doc_ref)
+    # The cached total is still within its staleness bound.
+    assert await counter.get_count_cached(doc_ref, max_staleness=60) == 0
+    assert await counter.get_count_cached(doc_ref, max_staleness=0) == 1
+
+    for shard in [
+        shard async for shard in doc_ref.collection("shards").list_documents()
+    ]:
+        await shard.delete()
+
+
 async def test_distributed_counters_cleanup(fs_client):
     col = fs_client.collection("dc_samples")
     doc_ref = col.document("distributed_counter")
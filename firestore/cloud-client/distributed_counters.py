@@ -13,7 +13,11 @@
 # limitations under the License.
 
 # [START firestore_solution_sharded_counter_custom_type]
+import atexit
+import logging
 import random
+import threading
+import time
 
 from google.cloud import firestore
 
@@ -41,30 +45,39 @@ class Counter:
 
     def __init__(self, num_shards):
         self._num_shards = num_shards
+        self._cached_counts = {}
 
     # [END firestore_solution_sharded_counter_custom_type]
 
     # [START firestore_solution_sharded_counter_create]
-    def init_counter(self, doc_ref):
+    def init_counter(self, doc_ref, client):
         """
         Create a given number of shards as
-        subcollection of specified document.
+        subcollection of specified document,
+        in batched writes of the given client.
         """
         col_ref = doc_ref.collection("shards")
 
-        # Initialize each shard with count=0
-        for num in range(self._num_shards):
-            shard = Shard()
-            col_ref.document(str(num)).set(shard.to_dict())
+        # Initialize each shard with count=0, writing up to 500 shards
+        # (the batch write limit) per commit.
+        for start in range(0, self._num_shards, 500):
+            batch = client.batch()
+            for num in range(start, min(start + 500, self._num_shards)):
+                shard = Shard()
+                batch.set(col_ref.document(str(num)), shard.to_dict())
+            batch.commit()
 
     # [END firestore_solution_sharded_counter_create]
 
     # [START firestore_solution_sharded_counter_increment]
-    def increment_counter(self, doc_ref):
-        """Increment a randomly picked shard."""
+    def random_shard(self, doc_ref):
+        """Return a reference to a randomly picked shard."""
         doc_id = random.randint(0, self._num_shards - 1)
+        return doc_ref.collection("shards").document(str(doc_id))
 
-        shard_ref = doc_ref.collection("shards").document(str(doc_id))
+    def increment_counter(self, doc_ref):
+        """Increment a randomly picked shard."""
+        shard_ref = self.random_shard(doc_ref)
         return shard_ref.update({"count": firestore.Increment(1)})
 
     # [END firestore_solution_sharded_counter_increment]
@@ -72,10 +85,134 @@ class Counter:
     # [START firestore_solution_sharded_counter_get]
     def get_count(self, doc_ref):
         """Return a total count across all shards."""
+        # A single query streams every shard, instead of listing the shard
+        # documents and then reading each of them separately.
         total = 0
-        shards = doc_ref.collection("shards").list_documents()
+        shards = doc_ref.collection("shards").select(["count"]).stream()
         for shard in shards:
-            total += shard.get().to_dict().get("count", 0)
+            total += shard.to_dict().get("count", 0)
         return total
 
     # [END firestore_solution_sharded_counter_get]
+
+    def get_count_cached(self, doc_ref, max_staleness=1.0):
+        """
+        Return a total count that is at most `max_staleness` seconds old,
+        reading the shards only when the cached total has expired.
+        """
+        cached = self._cached_counts.get(doc_ref.path)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < max_staleness:
+            return cached[0]
+
+        total = self.get_count(doc_ref)
+        self._cached_counts[doc_ref.path] = (total, now)
+        return total
+
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedCounter:
+    """
+    Coalesces increments in memory and writes them periodically.
+
+    Instead of one `Increment(1)` update per call, pending increments are
+    summed per counter and flushed as a single `Increment(n)` on a random
+    shard, with up to 500 updates per batched write. A flush happens every
+    `flush_interval` seconds, once `flush_count` increments are pending,
+    and on `close()` or interpreter exit.
+
+    Delivery is at-least-once: increments from a failed commit are put back
+    into the buffer and retried on the next flush, so a commit that
+    succeeded but reported an error may be counted twice. Failed background
+    flushes are logged, and `close()` raises if the final flush fails.
+    """
+
+    def __init__(self, counter, client, flush_interval=1.0, flush_count=1000):
+        self._counter = counter
+        self._client = client
+        self._flush_interval = flush_interval
+        self._flush_count = flush_count
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._pending_count = 0
+        self.increments = 0
+        self.writes = 0
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def increment(self, doc_ref, amount=1):
+        """Adds `amount` to the counter at `doc_ref` on the next flush."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BufferedCounter is closed.")
+            _, pending = self._pending.get(doc_ref.path, (doc_ref, 0))
+            self._pending[doc_ref.path] = (doc_ref, pending + amount)
+            self._pending_count += amount
+            self.increments += amount
+            if self._pending_count >= self._flush_count:
+                self._wakeup.set()
+
+    def flush(self):
+        """Writes all pending increments and returns the number of updates."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_count = 0
+
+            items = [item for item in pending.values() if item[1]]
+            written = 0
+            for start in range(0, len(items), 500):
+                chunk = items[start : start + 500]
+                batch = self._client.batch()
+                for doc_ref, amount in chunk:
+                    shard_ref = self._counter.random_shard(doc_ref)
+                    batch.update(shard_ref, {"count": firestore.Increment(amount)})
+                try:
+                    batch.commit()
+                except Exception:
+                    # Put the unwritten increments back for the next flush.
+                    self._requeue(items[start:])
+                    raise
+                written += len(chunk)
+                with self._lock:
+                    self.writes += len(chunk)
+            return written
+
+    def _requeue(self, items):
+        with self._lock:
+            for doc_ref, amount in items:
+                _, pending = self._pending.get(doc_ref.path, (doc_ref, 0))
+                self._pending[doc_ref.path] = (doc_ref, pending + amount)
+                self._pending_count += amount
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing counter increments failed, will retry.")
+
+    def close(self):
+        """Stops the background flusher and writes any pending increments."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        atexit.unregister(self.close)
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,120 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks distributed counters against the Firestore emulator.
+
+Compares read latency of the per-shard and single-query read paths, and
+write operations and sustained increments/sec of `increment_counter` versus
+`BufferedCounter`.
+
+Start the emulator and point the client at it before running:
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python distributed_counters_benchmark.py
+"""
+
+import argparse
+import statistics
+import time
+
+from google.cloud import firestore
+
+import distributed_counters
+
+
+def get_count_per_shard(doc_ref):
+    """The previous read path: list the shards, then read each one."""
+    total = 0
+    for shard in doc_ref.collection("shards").list_documents():
+        total += shard.get().to_dict().get("count", 0)
+    return total
+
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run_benchmark(client, shard_counts, repeat):
+    print(f"{'shards':>8} {'init ms':>10} {'per-shard ms':>14} {'query ms':>10}")
+    for num_shards in shard_counts:
+        doc_ref = client.collection("dc_benchmark").document(f"counter_{num_shards}")
+        counter = distributed_counters.Counter(num_shards)
+
+        start = time.perf_counter()
+        counter.init_counter(doc_ref, client)
+        init_ms = (time.perf_counter() - start) * 1000
+
+        per_shard_ms = _median_ms(lambda: get_count_per_shard(doc_ref), repeat)
+        query_ms = _median_ms(lambda: counter.get_count(doc_ref), repeat)
+        print(
+            f"{num_shards:>8} {init_ms:>10.1f} {per_shard_ms:>14.1f} {query_ms:>10.1f}"
+        )
+
+        for shard in doc_ref.collection("shards").list_documents():
+            shard.delete()
+
+
+def run_write_benchmark(client, num_shards, increments, flush_interval):
+    doc_ref = client.collection("dc_benchmark").document("counter_writes")
+    counter = distributed_counters.Counter(num_shards)
+    counter.init_counter(doc_ref, client)
+
+    start = time.perf_counter()
+    for _ in range(increments):
+        counter.increment_counter(doc_ref)
+    direct_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with distributed_counters.BufferedCounter(
+        counter, client, flush_interval=flush_interval
+    ) as buffered:
+        for _ in range(increments):
+            buffered.increment(doc_ref)
+    buffered_seconds = time.perf_counter() - start
+
+    assert counter.get_count(doc_ref) == 2 * increments
+    print(f"{'mode':>10} {'writes':>8} {'increments/s':>14}")
+    print(f"{'direct':>10} {increments:>8} {increments / direct_seconds:>14.0f}")
+    print(
+        f"{'buffered':>10} {buffered.writes:>8} "
+        f"{increments / buffered_seconds:>14.0f}"
+    )
+
+    for shard in doc_ref.collection("shards").list_documents():
+        shard.delete()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--shards", type=int, nargs="+", default=[10, 100, 1000], help="Shard counts."
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Reads per variant.")
+    parser.add_argument(
+        "--increments", type=int, default=0, help="Also benchmark this many writes."
+    )
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    args = parser.parse_args()
+
+    client = firestore.Client()
+    run_benchmark(client, args.shards, args.repeat)
+    if args.increments:
+        run_write_benchmark(client, 10, args.increments, args.flush_interval)
@@ -38,7 +38,7 @@ def test_distributed_counters(fs_client):
     col = fs_client.collection("dc_samples")
     doc_ref = col.document("distributed_counter")
     counter = distributed_counters.Counter(2)
-    counter.init_counter(doc_ref)
+    counter.init_counter(doc_ref, fs_client)
 
     shards = doc_ref.collection("shards").list_documents()
     shards_list = [shard for shard in shards]
@@ -49,6 +49,43 @@ def test_distributed_counters(fs_client):
     assert counter.get_count(doc_ref) == 2
 
 
+def test_distributed_counters_cached(fs_client):
+    col = fs_client.collection("dc_samples")
+    doc_ref = col.document("distributed_counter_cached")
+    counter = distributed_counters.Counter(2)
+    counter.init_counter(doc_ref, fs_client)
+
+    assert counter.get_count_cached(doc_ref, max_staleness=60) == 0
+    counter.increment_counter(doc_ref)
+    # The cached total is still within its staleness bound.
+    assert counter.get_count_cached(doc_ref, max_staleness=60) == 0
+    assert counter.get_count_cached(doc_ref, max_staleness=0) == 1
+
+    for shard in [shard for shard in doc_ref.collection("shards").list_documents()]:
+        shard.delete()
+
+
+def test_buffered_counter(fs_client):
+    col = fs_client.collection("dc_samples")
+    doc_ref = col.document("distributed_counter_buffered")
+    counter = distributed_counters.Counter(2)
+    counter.init_counter(doc_ref, fs_client)
+
+    with distributed_counters.BufferedCounter(
+        counter, fs_client, flush_interval=60
+    ) as buffered:
+        for _ in range(10):
+            buffered.increment(doc_ref)
+        assert counter.get_count(doc_ref) == 0
+
+    # All ten increments were coalesced into a single update on close.
+    assert buffered.writes == 1
+    assert counter.get_count(doc_ref) == 10
+
+    for shard in doc_ref.collection("shards").list_documents():
+        shard.delete()
+
+
 def test_distributed_counters_cleanup(fs_client):
     col = fs_client.collection("dc_samples")
     doc_ref = col.document("distributed_counter")
@@ -0,0 +1,233 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Exports a Firestore collection group to NDJSON or Parquet.
+
+The collection group is split into partitions with a partition query, and
+each partition is read by its own thread using keyset pagination ordered by
+document name. The next page is requested as soon as the current page has
+arrived. Pages reach the caller through a bounded queue, in the order they
+arrive, and are written out on the calling thread.
+
+Example, against the emulator:
+
+    FIRESTORE_EMULATOR_HOST=localhost:8080 \
+        python export_collection.py cities cities.ndjson --workers 8
+"""
+
+import argparse
+import base64
+from concurrent import futures
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Put on the page queue by each partition reader when it is done.
+_DONE = object()
+
+
+def document_row(snapshot):
+    """Returns the fields of a document, plus its path as `__name__`.
+
+    References become paths and geo points become dicts, so that rows only
+    hold values that JSON and Arrow understand, besides timestamps and bytes.
+    """
+
+    def convert(value):
+        if isinstance(value, dict):
+            return {key: convert(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [convert(item) for item in value]
+        if isinstance(value, firestore.DocumentReference):
+            return value.path
+        if isinstance(value, firestore.GeoPoint):
+            return {"latitude": value.latitude, "longitude": value.longitude}
+        return value
+
+    row = convert(snapshot.to_dict() or {})
+    row["__name__"] = snapshot.reference.path
+    return row
+
+
+def _fetch(query):
+    return list(query.stream())
+
+
+def paginate(query, page_size, prefetcher):
+    """Yields the results of `query` page by page using keyset pagination.
+
+    The query must be ordered by document name. Each page starts after the
+    last document of the previous one, and is requested from `prefetcher`
+    while the caller is still processing the previous page.
+    """
+    query = query.limit(page_size)
+    future = prefetcher.submit(_fetch, query)
+    while future is not None:
+        docs = future.result()
+        future = None
+        if len(docs) == page_size:
+            future = prefetcher.submit(_fetch, query.start_after(docs[-1]))
+        if docs:
+            yield docs
+
+
+def partition_queries(db, collection_id, partitions):
+    """Splits a collection group into queries over disjoint key ranges."""
+    collection_group = db.collection_group(collection_id)
+    if partitions <= 1:
+        return [collection_group.order_by(FieldPath.document_id())]
+    return [
+        partition.query() for partition in collection_group.get_partitions(partitions)
+    ]
+
+
+def stream_collection_group(
+    db, collection_id, workers=4, page_size=1000, partitions=None
+):
+    """Yields the documents of a collection group, read by parallel readers.
+
+    Args:
+        db: a `firestore.Client`.
+        collection_id: the collection group to export.
+        workers: the number of partitions read concurrently.
+        page_size: the number of documents per page.
+        partitions: the number of partitions to request, defaults to
+            `workers`. The backend may return fewer.
+
+    Yields:
+        Lists of `DocumentSnapshot`, one per page, in the order they are read.
+    """
+    queries = partition_queries(db, collection_id, partitions or workers)
+    # At most two pages per reader wait for the caller.
+    pages = queue.Queue(maxsize=2 * workers)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read_partition(query, prefetcher):
+        try:
+            for docs in paginate(query, page_size, prefetcher):
+                if stop.is_set():
+                    break
+                put(docs)
+        finally:
+            put(_DONE)
+
+    # Prefetches run on their own pool so that a reader waiting on its next
+    # page never blocks the thread that would fetch it.
+    with futures.ThreadPoolExecutor(workers) as readers, futures.ThreadPoolExecutor(
+        workers
+    ) as prefetcher:
+        results = [
+            readers.submit(read_partition, query, prefetcher) for query in queries
+        ]
+        try:
+            running = len(results)
+            while running:
+                docs = pages.get()
+                if docs is _DONE:
+                    running -= 1
+                else:
+                    yield docs
+            for result in results:
+                result.result()
+        finally:
+            # Unblocks the readers when the caller stops early or fails.
+            stop.set()
+
+
+def _json_value(value):
+    # Timestamp fields are read as datetimes and Bytes fields as bytes.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Cannot serialize {type(value).__name__} to JSON.")
+
+
+def write_ndjson(pages, path):
+    """Writes pages of documents to one NDJSON file.
+
+    Returns:
+        The number of documents written.
+    """
+    count = 0
+    with open(path, "w") as ndjson_file:
+        for docs in pages:
+            for doc in docs:
+                ndjson_file.write(json.dumps(document_row(doc), default=_json_value))
+                ndjson_file.write("\n")
+            count += len(docs)
+    return count
+
+
+def write_parquet(pages, directory):
+    """Writes each page of documents as a Parquet part file in `directory`.
+
+    Documents in one collection need not share a schema, so every part file
+    carries the schema inferred from its own rows. Readers such as
+    `pyarrow.dataset` unify them when the directory is loaded.
+
+    Returns:
+        The number of documents written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for part, docs in enumerate(pages):
+        table = pa.Table.from_pylist([document_row(doc) for doc in docs])
+        pq.write_table(table, os.path.join(directory, f"part-{part:06d}.parquet"))
+        count += len(docs)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("collection_id", help="Collection group to export.")
+    parser.add_argument(
+        "output", help="NDJSON file, or a directory for Parquet part files."
+    )
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pages = stream_collection_group(
+        firestore.Client(),
+        args.collection_id,
+        workers=args.workers,
+        page_size=args.page_size,
+    )
+    if args.format == "parquet":
+        count = write_parquet(pages, args.output)
+    else:
+        count = write_ndjson(pages, args.output)
+    elapsed = time.perf_counter() - start
+    print(f"Exported {count} documents in {elapsed:.2f}s ({count / elapsed:.0f}/s)")
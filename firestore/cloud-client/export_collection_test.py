@@ -0,0 +1,77 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import uuid
+
+from google.cloud import firestore
+import pyarrow.dataset as ds
+import pytest
+
+import export_collection
+
+os.environ["GOOGLE_CLOUD_PROJECT"] = os.environ["FIRESTORE_PROJECT"]
+PROJECT_ID = os.environ["FIRESTORE_PROJECT"]
+
+
+@pytest.fixture(scope="module")
+def collection():
+    client = firestore.Client(project=PROJECT_ID)
+    collection = client.collection(f"export-{uuid.uuid4().hex[:8]}")
+    batch = client.batch()
+    for i in range(25):
+        batch.set(collection.document(f"doc{i:02d}"), {"index": i, "name": f"n{i}"})
+    batch.commit()
+
+    yield client, collection
+
+    client.recursive_delete(collection)
+
+
+def test_export_ndjson(collection, tmp_path):
+    client, coll_ref = collection
+    path = str(tmp_path / "export.ndjson")
+    pages = export_collection.stream_collection_group(
+        client, coll_ref.id, workers=2, page_size=4
+    )
+    count = export_collection.write_ndjson(pages, path)
+
+    assert count == 25
+    with open(path) as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted(row["index"] for row in rows) == list(range(25))
+    assert all(row["__name__"].startswith(coll_ref.id) for row in rows)
+
+
+def test_export_parquet(collection, tmp_path):
+    client, coll_ref = collection
+    pages = export_collection.stream_collection_group(
+        client, coll_ref.id, workers=1, page_size=10
+    )
+    count = export_collection.write_parquet(pages, str(tmp_path))
+
+    assert count == 25
+    table = ds.dataset(str(tmp_path), format="parquet").to_table()
+    assert sorted(table.column("index").to_pylist()) == list(range(25))
+
+
+def test_stop_reading_early(collection):
+    client, coll_ref = collection
+    pages = export_collection.stream_collection_group(
+        client, coll_ref.id, workers=2, page_size=1
+    )
+    assert len(next(pages)) == 1
+    # Closing the generator stops the readers instead of leaving them blocked.
+    pages.close()
@@ -19,6 +19,7 @@ from time import sleep
 from google.api_core.client_options import ClientOptions
 from google.cloud import firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
 
 
 def quickstart_new_instance():
@@ -850,6 +851,44 @@ def delete_full_collection():
     delete_collection(db.collection("users"), 0)
 
 
+def bulk_delete_collection(db, coll_ref, recursive=True, chunk_size=5000):
+    """Deletes every document in a collection with a BulkWriter.
+
+    Document references are streamed by key-only queries, so no document
+    bodies are read. The BulkWriter issues deletes concurrently and ramps
+    its rate up following the 500/50/5 rule. With `recursive`, documents
+    in subcollections at any depth are deleted as well.
+
+    Returns:
+        The number of documents deleted.
+    """
+    bulk_writer = db.bulk_writer()
+    if recursive:
+        return db.recursive_delete(
+            coll_ref, bulk_writer=bulk_writer, chunk_size=chunk_size
+        )
+
+    query = (
+        coll_ref.select([FieldPath.document_id()])
+        .order_by(FieldPath.document_id())
+        .limit(chunk_size)
+    )
+    deleted = 0
+    last_doc = None
+    while True:
+        page = query.start_after(last_doc) if last_doc else query
+        docs = list(page.stream())
+        for doc in docs:
+            bulk_writer.delete(doc.reference)
+        deleted += len(docs)
+        if len(docs) < chunk_size:
+            break
+        last_doc = docs[-1]
+
+    bulk_writer.close()
+    return deleted
+
+
 def collection_group_query(db):
     # [START firestore_query_collection_group_dataset]
     cities = db.collection("cities")
@@ -309,6 +309,28 @@ def test_delete_full_collection():
     snippets.delete_full_collection()
 
 
+def test_bulk_delete_collection(db):
+    coll_ref = db.collection("bulk_delete")
+    for i in range(12):
+        doc_ref = coll_ref.document(f"doc{i}")
+        doc_ref.set({"index": i})
+        doc_ref.collection("children").document("child").set({"index": i})
+
+    assert (
+        snippets.bulk_delete_collection(db, coll_ref, recursive=False, chunk_size=5)
+        == 12
+    )
+    assert not list(coll_ref.stream())
+    # The subcollections were left in place.
+    assert len(list(db.collection_group("children").stream())) >= 12
+
+    for i in range(12):
+        coll_ref.document(f"doc{i}").set({"index": i})
+    assert snippets.bulk_delete_collection(db, coll_ref) == 24
+    assert not list(coll_ref.stream())
+    assert not list(coll_ref.document("doc0").collection("children").stream())
+
+
 @pytest.mark.skip(
     reason="Dependant on a composite index being created,"
     "however creation of the index is dependent on"
@@ -0,0 +1,485 @@
+#!/usr/bin/env python
+
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""This application verifies many HSM attestations at once, for example to
+audit every Cloud HSM key of a project.
+
+It reads a JSONL manifest with one {"certificates": ..., "attestation": ...}
+object per line, with an optional "id", and writes one JSONL report line per
+attestation. The chains are checked as in verify_attestation_chains.py, with
+the manufacturer root certificate cached on disk, and the chains shared by
+attestations of the same HSM partition verified only once per worker.
+
+Compare with verify_attestation_chains.py on synthetic chains with:
+
+    python verify_attestations_batch.py --benchmark 200
+
+For more information, visit https://cloud.google.com/kms/docs/attest-key.
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+from concurrent import futures
+import contextlib
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import rsa
+import pem
+
+import verify_attestation_chains
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "kms-attestations")
+MANUFACTURER_ROOT_CACHE_FILE = "liquid_security_certificate.pem"
+# Attestations sent to a worker process at a time. Attestations listed next
+# to each other in the manifest often share their chains.
+DEFAULT_CHUNK_SIZE = 16
+
+
+class ChainError(Exception):
+    """The certificate chains of an attestation are invalid."""
+
+
+def is_trusted_manufacturer_root(
+    cert: x509.Certificate, now: Optional[datetime.datetime] = None
+) -> bool:
+    """Checks the subject, signature and validity period of a root certificate."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return (
+        cert.subject.public_bytes()
+        == verify_attestation_chains.MANUFACTURER_CERT_SUBJECT_BYTES
+        and verify_attestation_chains.verify_certificate(cert, cert)
+        and cert.not_valid_before_utc <= now <= cert.not_valid_after_utc
+    )
+
+
+def get_cached_manufacturer_root_certificate(
+    cache_dir: str = DEFAULT_CACHE_DIR, now: Optional[datetime.datetime] = None
+) -> x509.Certificate:
+    """Gets the manufacturer root certificate, downloading it only if needed.
+
+    The certificate is downloaded again when the cached copy is missing,
+    unreadable, or no longer a valid root certificate.
+
+    Args:
+        cache_dir: The directory to cache the certificate in.
+        now: The time to check the validity period against.
+
+    Returns:
+        The manufacturer root certificate.
+
+    Raises:
+        ValueError: The downloaded certificate is not a valid root certificate.
+    """
+    path = os.path.join(cache_dir, MANUFACTURER_ROOT_CACHE_FILE)
+    try:
+        with open(path, "rb") as f:
+            cert = x509.load_pem_x509_certificate(f.read())
+        if is_trusted_manufacturer_root(cert, now):
+            return cert
+    except (OSError, ValueError):
+        pass
+
+    cert = verify_attestation_chains.get_manufacturer_root_certificate()
+    if not is_trusted_manufacturer_root(cert, now):
+        raise ValueError("Invalid HSM manufacturer root certificate.")
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file first so that concurrent runs never read a
+    # partially written certificate.
+    with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    os.replace(f.name, path)
+    return cert
+
+
+class CertificateIndex:
+    """Untrusted certificates indexed by the distinguished name of their issuer.
+
+    Only the certificates whose issuer is the subject of a signing
+    certificate are candidates, so at most those signatures are verified.
+    """
+
+    def __init__(self, certs: Iterable[x509.Certificate]) -> None:
+        self._by_issuer: Dict[bytes, List[x509.Certificate]] = collections.defaultdict(
+            list
+        )
+        for cert in certs:
+            self._by_issuer[cert.issuer.public_bytes()].append(cert)
+
+    def __len__(self) -> int:
+        return sum(len(certs) for certs in self._by_issuer.values())
+
+    def pop_issued(
+        self, issuer_cert: x509.Certificate, predicate=lambda _: True
+    ) -> Optional[x509.Certificate]:
+        """Removes and returns a certificate issued by `issuer_cert`.
+
+        Same as `verify_attestation_chains.get_issued_certificate`.
+        """
+        candidates = self._by_issuer.get(issuer_cert.subject.public_bytes(), [])
+        for cert in candidates:
+            if predicate(cert) and _is_issued_by(issuer_cert, cert):
+                candidates.remove(cert)
+                return cert
+        return None
+
+
+# Signatures of issued certificates, and the chains of sets of untrusted
+# certificates, already verified by this process.
+_verified_certificates: Dict[Tuple[bytes, bytes], bool] = {}
+_verified_chains: Dict[FrozenSet[bytes], Tuple] = {}
+
+
+def _is_issued_by(issuer_cert: x509.Certificate, cert: x509.Certificate) -> bool:
+    key = (issuer_cert.fingerprint(hashes.SHA256()), cert.fingerprint(hashes.SHA256()))
+    if key not in _verified_certificates:
+        _verified_certificates[key] = verify_attestation_chains.verify_certificate(
+            issuer_cert, cert
+        )
+    return _verified_certificates[key]
+
+
+def _public_key_bytes(cert: x509.Certificate) -> bytes:
+    return cert.public_key().public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+def build_chains(
+    untrusted_certs: List[x509.Certificate],
+    mfr_root_cert: x509.Certificate,
+    owner_root_cert: x509.Certificate,
+) -> Tuple[x509.Certificate, x509.Certificate]:
+    """Builds the manufacturer and owner chains of an HSM partition.
+
+    Args:
+        untrusted_certs: The certificates of the certificate chains file.
+        mfr_root_cert: The trusted manufacturer root certificate.
+        owner_root_cert: The trusted owner root certificate.
+
+    Returns:
+        The manufacturer and owner partition certificates.
+
+    Raises:
+        ChainError: The certificates do not form valid chains.
+    """
+    key = frozenset(cert.fingerprint(hashes.SHA256()) for cert in untrusted_certs)
+    if key not in _verified_chains:
+        try:
+            _verified_chains[key] = (
+                _build_chains(untrusted_certs, mfr_root_cert, owner_root_cert),
+                None,
+            )
+        except ChainError as e:
+            _verified_chains[key] = (None, e)
+    chains, error = _verified_chains[key]
+    if error:
+        raise error
+    return chains
+
+
+def _build_chains(
+    untrusted_certs: List[x509.Certificate],
+    mfr_root_cert: x509.Certificate,
+    owner_root_cert: x509.Certificate,
+) -> Tuple[x509.Certificate, x509.Certificate]:
+    index = CertificateIndex(untrusted_certs)
+
+    mfr_card_cert = index.pop_issued(mfr_root_cert)
+    mfr_partition_cert = mfr_card_cert and index.pop_issued(mfr_card_cert)
+    if not mfr_card_cert or not mfr_partition_cert:
+        raise ChainError("Invalid HSM manufacturer certificate chain.")
+
+    card_key = _public_key_bytes(mfr_card_cert)
+    owner_card_cert = index.pop_issued(
+        owner_root_cert, lambda cert: _public_key_bytes(cert) == card_key
+    )
+    partition_key = _public_key_bytes(mfr_partition_cert)
+    owner_partition_cert = index.pop_issued(
+        owner_root_cert, lambda cert: _public_key_bytes(cert) == partition_key
+    )
+    if not owner_card_cert or not owner_partition_cert or len(index):
+        raise ChainError("Invalid HSM owner certificate chain.")
+    return mfr_partition_cert, owner_partition_cert
+
+
+# The trusted root certificates of a worker process.
+_roots: Optional[Tuple[x509.Certificate, x509.Certificate]] = None
+
+
+def _init_worker(mfr_root_der: bytes, owner_root_der: bytes) -> None:
+    global _roots
+    _roots = (
+        x509.load_der_x509_certificate(mfr_root_der),
+        x509.load_der_x509_certificate(owner_root_der),
+    )
+
+
+def verify_entry(entry: Dict) -> Dict:
+    """Verifies the attestation of a manifest entry and returns its report."""
+    report = dict(entry, verified=False, error=None)
+    try:
+        untrusted_certs = [
+            x509.load_pem_x509_certificate(cert_pem.as_bytes())
+            for cert_pem in pem.parse_file(entry["certificates"])
+        ]
+        mfr_partition_cert, owner_partition_cert = build_chains(
+            untrusted_certs, *_roots
+        )
+        with gzip.open(entry["attestation"], "rb") as f:
+            attestation = f.read()
+        report["verified"] = verify_attestation_chains.verify_attestation(
+            mfr_partition_cert, attestation
+        ) and verify_attestation_chains.verify_attestation(
+            owner_partition_cert, attestation
+        )
+        if not report["verified"]:
+            report["error"] = "Invalid attestation signature."
+    except (ChainError, OSError, ValueError) as e:
+        report["error"] = str(e)
+    return report
+
+
+def verify_batch(
+    entries: List[Dict],
+    report_file: str,
+    mfr_root_cert: x509.Certificate,
+    owner_root_cert: x509.Certificate,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> collections.Counter:
+    """Verifies attestations and writes a JSONL report in manifest order.
+
+    Args:
+        entries: Dictionaries with the "certificates" and "attestation"
+            filenames of each attestation.
+        report_file: The filename of the JSONL report.
+        mfr_root_cert: The trusted manufacturer root certificate.
+        owner_root_cert: The trusted owner root certificate.
+        workers: The number of worker processes, 1 to verify in this process,
+            or None for one per CPU.
+        chunk_size: The number of attestations sent to a worker at a time.
+
+    Returns:
+        The number of verified and failed attestations.
+    """
+    roots = [
+        cert.public_bytes(serialization.Encoding.DER)
+        for cert in (mfr_root_cert, owner_root_cert)
+    ]
+    counts: collections.Counter = collections.Counter(verified=0, failed=0)
+    with contextlib.ExitStack() as stack:
+        if workers == 1:
+            _init_worker(*roots)
+            reports = map(verify_entry, entries)
+        else:
+            executor = stack.enter_context(
+                futures.ProcessPoolExecutor(
+                    workers, initializer=_init_worker, initargs=roots
+                )
+            )
+            reports = executor.map(verify_entry, entries, chunksize=chunk_size)
+        with open(report_file, "w") as f:
+            for report in reports:
+                counts["verified" if report["verified"] else "failed"] += 1
+                f.write(json.dumps(report) + "\n")
+    return counts
+
+
+def _make_certificate(
+    subject: x509.Name,
+    public_key: rsa.RSAPublicKey,
+    issuer: x509.Name,
+    issuer_key: rsa.RSAPrivateKey,
+) -> x509.Certificate:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(issuer)
+        .public_key(public_key)
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=365))
+        .sign(issuer_key, hashes.SHA256())
+    )
+
+
+def make_synthetic_fleet(
+    directory: str, cards: int, partitions_per_card: int, keys_per_partition: int
+) -> Tuple[x509.Certificate, x509.Certificate, List[Dict]]:
+    """Writes certificate chains and attestations signed by generated keys.
+
+    The manufacturer root has the subject of the real one, so the chains can
+    also be checked by verify_attestation_chains.py.
+
+    Returns:
+        The manufacturer and owner root certificates, and the manifest entries.
+    """
+
+    def new_key() -> rsa.RSAPrivateKey:
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def name(common_name: str) -> x509.Name:
+        return x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, common_name)])
+
+    mfr_name = x509.Name.from_rfc4514_string(
+        "CN=localca.liquidsecurity.cavium.com,OU=LiquidSecurity,"
+        "O=Cavium\\, Inc.,L=San Jose,ST=California,C=US"
+    )
+    owner_name = name("Test owner root")
+    mfr_key, owner_key = new_key(), new_key()
+    mfr_root = _make_certificate(mfr_name, mfr_key.public_key(), mfr_name, mfr_key)
+    owner_root = _make_certificate(
+        owner_name, owner_key.public_key(), owner_name, owner_key
+    )
+
+    entries = []
+    for card in range(cards):
+        card_key = new_key()
+        card_name = name(f"card {card}")
+        card_certs = [
+            _make_certificate(card_name, card_key.public_key(), mfr_name, mfr_key),
+            _make_certificate(
+                name(f"owner card {card}"), card_key.public_key(), owner_name, owner_key
+            ),
+        ]
+        for partition in range(partitions_per_card):
+            partition_key = new_key()
+            certs = card_certs + [
+                _make_certificate(
+                    name(f"partition {card}-{partition}"),
+                    partition_key.public_key(),
+                    card_name,
+                    card_key,
+                ),
+                _make_certificate(
+                    name(f"owner partition {card}-{partition}"),
+                    partition_key.public_key(),
+                    owner_name,
+                    owner_key,
+                ),
+            ]
+            prefix = os.path.join(directory, f"partition-{card}-{partition}")
+            with open(f"{prefix}-certs.pem", "wb") as f:
+                for cert in certs:
+                    f.write(cert.public_bytes(serialization.Encoding.PEM))
+            for key in range(keys_per_partition):
+                data = os.urandom(512)
+                signature = partition_key.sign(
+                    data, padding.PKCS1v15(), hashes.SHA256()
+                )
+                with gzip.open(f"{prefix}-key-{key}.dat.gz", "wb") as f:
+                    f.write(data + signature)
+                entries.append(
+                    {
+                        "id": f"key {card}-{partition}-{key}",
+                        "certificates": f"{prefix}-certs.pem",
+                        "attestation": f"{prefix}-key-{key}.dat.gz",
+                    }
+                )
+    return mfr_root, owner_root, entries
+
+
+def benchmark(attestations: int, workers: Optional[int]) -> None:
+    """Compares this verifier with verify_attestation_chains.py."""
+    with tempfile.TemporaryDirectory() as tempdir:
+        cards = max(1, attestations // 50)
+        mfr_root, owner_root, entries = make_synthetic_fleet(
+            tempdir, cards, 5, max(1, attestations // (cards * 5))
+        )
+        # The roots are not downloaded in either case.
+        verify_attestation_chains.get_manufacturer_root_certificate = lambda: mfr_root
+        verify_attestation_chains.get_owner_root_certificate = lambda: owner_root
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            verified = sum(
+                verify_attestation_chains.verify(
+                    entry["certificates"], entry["attestation"]
+                )
+                for entry in entries
+            )
+        elapsed = time.perf_counter() - start
+        print(
+            f"verify_attestation_chains.py: {verified}/{len(entries)} verified "
+            f"in {elapsed:.2f}s, {len(entries) / elapsed:.0f} attestations/s"
+        )
+
+        for batch_workers in (1, workers):
+            start = time.perf_counter()
+            counts = verify_batch(
+                entries,
+                os.path.join(tempdir, "report.jsonl"),
+                mfr_root,
+                owner_root,
+                batch_workers,
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"batch, {batch_workers or os.cpu_count()} worker(s): "
+                f"{counts['verified']}/{len(entries)} verified in {elapsed:.2f}s, "
+                f"{len(entries) / elapsed:.0f} attestations/s"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--manifest", help="The JSONL manifest filename.")
+    parser.add_argument("--report", help="The JSONL report filename.")
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help="The directory to cache the manufacturer root certificate in.",
+    )
+    parser.add_argument("--workers", type=int, help="The number of worker processes.")
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="ATTESTATIONS",
+        help="Verify this many synthetic attestations instead of a manifest.",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.workers)
+    else:
+        with open(args.manifest) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        counts = verify_batch(
+            entries,
+            args.report,
+            get_cached_manufacturer_root_certificate(args.cache_dir),
+            verify_attestation_chains.get_owner_root_certificate(),
+            args.workers,
+        )
+        print(
+            f"{counts['verified']} attestation(s) verified, "
+            f"{counts['failed']} could not be verified."
+        )
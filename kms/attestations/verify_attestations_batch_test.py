@@ -0,0 +1,129 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import gzip
+import json
+import os
+
+import pytest
+
+import verify_attestation_chains
+import verify_attestations_batch
+
+
+@pytest.fixture(scope="module")
+def fleet(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("fleet")
+    return verify_attestations_batch.make_synthetic_fleet(str(directory), 1, 2, 2)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(monkeypatch):
+    monkeypatch.setattr(verify_attestations_batch, "_verified_certificates", {})
+    monkeypatch.setattr(verify_attestations_batch, "_verified_chains", {})
+
+
+def read_report(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_verify_batch(fleet, tmp_path, workers):
+    mfr_root, owner_root, entries = fleet
+    report_file = str(tmp_path / "report.jsonl")
+
+    counts = verify_attestations_batch.verify_batch(
+        entries, report_file, mfr_root, owner_root, workers
+    )
+
+    assert counts == {"verified": 4, "failed": 0}
+    report = read_report(report_file)
+    assert [line["id"] for line in report] == [entry["id"] for entry in entries]
+    assert all(line["verified"] and line["error"] is None for line in report)
+
+
+def test_verify_batch_reports_failures(fleet, tmp_path):
+    mfr_root, owner_root, entries = fleet
+    tampered = str(tmp_path / "tampered.dat.gz")
+    with gzip.open(entries[0]["attestation"], "rb") as f:
+        attestation = f.read()
+    with gzip.open(tampered, "wb") as f:
+        f.write(b"x" + attestation[1:])
+    missing_cert = str(tmp_path / "missing-cert.pem")
+    with open(entries[0]["certificates"]) as f:
+        certs = f.read().split("-----END CERTIFICATE-----\n")
+    with open(missing_cert, "w") as f:
+        f.write("-----END CERTIFICATE-----\n".join(certs[1:]))
+    entries = [
+        dict(entries[0], attestation=tampered),
+        dict(entries[0], certificates=missing_cert),
+        dict(entries[0], attestation=str(tmp_path / "missing.dat.gz")),
+    ]
+    report_file = str(tmp_path / "report.jsonl")
+
+    counts = verify_attestations_batch.verify_batch(
+        entries, report_file, mfr_root, owner_root, 1
+    )
+
+    assert counts == {"verified": 0, "failed": 3}
+    errors = [line["error"] for line in read_report(report_file)]
+    assert errors[0] == "Invalid attestation signature."
+    assert errors[1] == "Invalid HSM manufacturer certificate chain."
+    assert "No such file" in errors[2]
+
+
+def test_chains_are_verified_once(fleet, tmp_path):
+    mfr_root, owner_root, entries = fleet
+
+    verify_attestations_batch.verify_batch(
+        entries, str(tmp_path / "report.jsonl"), mfr_root, owner_root, 1
+    )
+
+    # One chain per partition, with the card certificates verified once.
+    assert len(verify_attestations_batch._verified_chains) == 2
+    assert len(verify_attestations_batch._verified_certificates) == 6
+
+
+def test_manufacturer_root_is_cached(fleet, monkeypatch, tmp_path):
+    mfr_root = fleet[0]
+    downloads = []
+
+    def download():
+        downloads.append(1)
+        return mfr_root
+
+    monkeypatch.setattr(
+        verify_attestation_chains, "get_manufacturer_root_certificate", download
+    )
+    cache_dir = str(tmp_path)
+
+    for _ in range(2):
+        assert (
+            verify_attestations_batch.get_cached_manufacturer_root_certificate(
+                cache_dir
+            )
+            == mfr_root
+        )
+    assert len(downloads) == 1
+    assert os.listdir(cache_dir) == ["liquid_security_certificate.pem"]
+
+    # An expired certificate is downloaded again, and then rejected.
+    expired = mfr_root.not_valid_after_utc + datetime.timedelta(days=1)
+    with pytest.raises(ValueError):
+        verify_attestations_batch.get_cached_manufacturer_root_certificate(
+            cache_dir, expired
+        )
+    assert len(downloads) == 2
@@ -0,0 +1,161 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+"""Encrypts or decrypts many payloads with a symmetric Cloud KMS key.
+
+Requests are sent concurrently, with at most `window` of them in flight, and
+results are returned in the order of the payloads. Every request and response
+is checked as in encrypt_symmetric.py and decrypt_symmetric.py, and a payload
+corrupted in-transit is sent again up to `retries` times.
+"""
+
+from __future__ import annotations
+
+import collections
+from concurrent import futures
+from typing import Callable, Iterable, Iterator, Optional
+
+from google.cloud import kms
+
+from checksum import crc32c
+
+DEFAULT_WINDOW = 16
+DEFAULT_RETRIES = 2
+
+
+class IntegrityError(Exception):
+    """A request or response was corrupted in-transit."""
+
+
+def _encrypt(
+    client: kms.KeyManagementServiceClient, key_name: str, plaintext: bytes
+) -> bytes:
+    plaintext_crc32c = crc32c(plaintext)
+    encrypt_response = client.encrypt(
+        request={
+            "name": key_name,
+            "plaintext": plaintext,
+            "plaintext_crc32c": plaintext_crc32c,
+        }
+    )
+    if not encrypt_response.verified_plaintext_crc32c:
+        raise IntegrityError("The request sent to the server was corrupted in-transit.")
+    if not encrypt_response.ciphertext_crc32c == crc32c(encrypt_response.ciphertext):
+        raise IntegrityError(
+            "The response received from the server was corrupted in-transit."
+        )
+    return encrypt_response.ciphertext
+
+
+def _decrypt(
+    client: kms.KeyManagementServiceClient, key_name: str, ciphertext: bytes
+) -> bytes:
+    ciphertext_crc32c = crc32c(ciphertext)
+    decrypt_response = client.decrypt(
+        request={
+            "name": key_name,
+            "ciphertext": ciphertext,
+            "ciphertext_crc32c": ciphertext_crc32c,
+        }
+    )
+    if not decrypt_response.plaintext_crc32c == crc32c(decrypt_response.plaintext):
+        raise IntegrityError(
+            "The response received from the server was corrupted in-transit."
+        )
+    return decrypt_response.plaintext
+
+
+def _run(
+    call: Callable[[kms.KeyManagementServiceClient, str, bytes], bytes],
+    client: kms.KeyManagementServiceClient,
+    key_name: str,
+    payloads: Iterable[bytes],
+    window: int,
+    retries: int,
+) -> Iterator[bytes]:
+    def call_with_retries(payload: bytes) -> bytes:
+        for attempt in range(retries + 1):
+            try:
+                return call(client, key_name, payload)
+            except IntegrityError:
+                if attempt == retries:
+                    raise
+
+    # Once `window` requests are in flight, reading the payloads waits for
+    # the oldest result to be consumed.
+    with futures.ThreadPoolExecutor(window) as executor:
+        pending: collections.deque = collections.deque()
+        for payload in payloads:
+            if len(pending) == window:
+                yield pending.popleft().result()
+            pending.append(executor.submit(call_with_retries, payload))
+        while pending:
+            yield pending.popleft().result()
+
+
+def encrypt_many(
+    key_name: str,
+    plaintexts: Iterable[bytes],
+    client: Optional[kms.KeyManagementServiceClient] = None,
+    window: int = DEFAULT_WINDOW,
+    retries: int = DEFAULT_RETRIES,
+) -> Iterator[bytes]:
+    """
+    Encrypts payloads using a symmetric key.
+
+    Args:
+        key_name (string): The name of the key, e.g. the result of
+            `client.crypto_key_path(...)`.
+        plaintexts (iterable of bytes): The payloads to encrypt, of up to
+            64 KiB each. They are read as the results are consumed.
+        client: The client to use, or None to create one.
+        window (int): The maximum number of requests in flight.
+        retries (int): The number of times to resend a corrupted payload.
+
+    Returns:
+        An iterator over the ciphertexts, in the order of the plaintexts.
+
+    Raises:
+        IntegrityError: A payload was still corrupted after all retries.
+    """
+    client = client or kms.KeyManagementServiceClient()
+    return _run(_encrypt, client, key_name, plaintexts, window, retries)
+
+
+def decrypt_many(
+    key_name: str,
+    ciphertexts: Iterable[bytes],
+    client: Optional[kms.KeyManagementServiceClient] = None,
+    window: int = DEFAULT_WINDOW,
+    retries: int = DEFAULT_RETRIES,
+) -> Iterator[bytes]:
+    """
+    Decrypts payloads encrypted with a symmetric key.
+
+    Args:
+        key_name (string): The name of the key, e.g. the result of
+            `client.crypto_key_path(...)`.
+        ciphertexts (iterable of bytes): The payloads to decrypt. They are
+            read as the results are consumed.
+        client: The client to use, or None to create one.
+        window (int): The maximum number of requests in flight.
+        retries (int): The number of times to resend a corrupted payload.
+
+    Returns:
+        An iterator over the plaintexts, in the order of the ciphertexts.
+
+    Raises:
+        IntegrityError: A payload was still corrupted after all retries.
+    """
+    client = client or kms.KeyManagementServiceClient()
+    return _run(_decrypt, client, key_name, ciphertexts, window, retries)
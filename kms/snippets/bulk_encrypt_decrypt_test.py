@@ -0,0 +1,87 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+import io
+import threading
+from typing import Dict
+
+from google.cloud import kms
+import pytest
+
+from bulk_encrypt_decrypt import decrypt_many, encrypt_many, IntegrityError
+from checksum import Crc32c, crc32c, crc32c_chunks, crc32c_file
+
+KEY_NAME = "projects/p/locations/l/keyRings/r/cryptoKeys/k"
+
+
+class FakeKmsClient:
+    """Encrypts by reversing the payload, corrupting the first responses."""
+
+    def __init__(self, corrupt: int = 0) -> None:
+        self.corrupt = corrupt
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _corrupt(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            self.corrupt -= 1
+            return self.corrupt >= 0
+
+    def encrypt(self, request: Dict) -> kms.EncryptResponse:
+        assert request["plaintext_crc32c"] == crc32c(request["plaintext"])
+        ciphertext = request["plaintext"][::-1]
+        return kms.EncryptResponse(
+            name=request["name"],
+            ciphertext=b"x" + ciphertext[1:] if self._corrupt() else ciphertext,
+            ciphertext_crc32c=crc32c(ciphertext),
+            verified_plaintext_crc32c=True,
+        )
+
+    def decrypt(self, request: Dict) -> kms.DecryptResponse:
+        assert request["ciphertext_crc32c"] == crc32c(request["ciphertext"])
+        plaintext = request["ciphertext"][::-1]
+        return kms.DecryptResponse(
+            plaintext=b"x" + plaintext[1:] if self._corrupt() else plaintext,
+            plaintext_crc32c=crc32c(plaintext),
+        )
+
+
+def test_crc32c() -> None:
+    data = b"123456789"
+    assert crc32c(data) == 0xE3069283
+    assert crc32c_chunks([data[:4], b"", data[4:]]) == crc32c(data)
+    assert crc32c_file(io.BytesIO(data), chunk_size=2) == crc32c(data)
+    checksum = Crc32c(data[:1])
+    checksum.update(data[1:])
+    assert checksum.value == crc32c(data)
+
+
+def test_encrypt_decrypt_many() -> None:
+    client = FakeKmsClient()
+    plaintexts = [f"payload {i}".encode("utf-8") for i in range(100)]
+
+    ciphertexts = list(encrypt_many(KEY_NAME, plaintexts, client, window=4))
+    assert ciphertexts == [plaintext[::-1] for plaintext in plaintexts]
+    assert list(decrypt_many(KEY_NAME, ciphertexts, client, window=4)) == plaintexts
+    assert client.requests == 200
+
+
+def test_corrupted_payloads_are_retried() -> None:
+    client = FakeKmsClient(corrupt=2)
+    assert list(encrypt_many(KEY_NAME, [b"payload"], client)) == [b"daolyap"]
+    assert client.requests == 3
+
+    client = FakeKmsClient(corrupt=3)
+    with pytest.raises(IntegrityError):
+        list(decrypt_many(KEY_NAME, [b"daolyap"], client, retries=2))
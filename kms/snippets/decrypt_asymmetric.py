@@ -83,10 +83,9 @@ def crc32c(data: bytes) -> int:
     Returns:
         An int representing the CRC32C checksum of the provided bytes.
     """
-    import crcmod  # type: ignore
+    import google_crc32c
 
-    crc32c_fun = crcmod.predefined.mkPredefinedCrcFun("crc-32c")
-    return crc32c_fun(data)
+    return google_crc32c.value(data)
 
 
 # [END kms_decrypt_asymmetric]
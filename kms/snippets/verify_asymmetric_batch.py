@@ -0,0 +1,270 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+"""Verifies many signatures with locally cached Cloud KMS public keys.
+
+verify_asymmetric_ec.py and verify_asymmetric_rsa.py fetch and parse the
+public key for every signature. `PublicKeyVerifier` fetches each key version
+once per TTL and verifies batches of signatures locally.
+
+Measure verifications per second against local keys with:
+
+    python verify_asymmetric_batch.py --signatures 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent import futures
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import utils
+from google.api_core import exceptions
+from google.cloud import kms
+from jwcrypto import jwk
+
+from checksum import crc32c
+
+DEFAULT_TTL = 300
+# Signatures verified by a worker thread at a time.
+CHUNK_SIZE = 64
+
+_HASHES = {"SHA256": hashes.SHA256, "SHA384": hashes.SHA384, "SHA512": hashes.SHA512}
+
+
+class _CachedKey(NamedTuple):
+    # None if the key version is disabled, destroyed or deleted.
+    key: Optional[Union[ec.EllipticCurvePublicKey, rsa.RSAPublicKey]]
+    public_key: Optional[kms.PublicKey]
+    expires: float
+
+
+class PublicKeyVerifier:
+    """Verifies signatures made by Cloud KMS asymmetric signing keys.
+
+    Public keys are cached per key version for `ttl` seconds. A key version
+    that is no longer enabled fails to verify anything until a refresh finds
+    it enabled again. Call `refresh` when notified of a key version state
+    change to apply it without waiting for the TTL.
+    """
+
+    def __init__(
+        self,
+        client: Optional[kms.KeyManagementServiceClient] = None,
+        ttl: float = DEFAULT_TTL,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        self._client = client or kms.KeyManagementServiceClient()
+        self._ttl = ttl
+        self._max_workers = max_workers
+        self._keys: Dict[str, _CachedKey] = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, key_version_name: str) -> _CachedKey:
+        expires = time.monotonic() + self._ttl
+        try:
+            public_key = self._client.get_public_key(request={"name": key_version_name})
+        except (exceptions.FailedPrecondition, exceptions.NotFound):
+            return _CachedKey(None, None, expires)
+
+        # Perform integrity verification on public_key, as in get_public_key.py.
+        if not public_key.name == key_version_name:
+            raise Exception("The request sent to the server was corrupted in-transit.")
+        if not public_key.pem_crc32c == crc32c(public_key.pem.encode("utf-8")):
+            raise Exception(
+                "The response received from the server was corrupted in-transit."
+            )
+        key = serialization.load_pem_public_key(public_key.pem.encode("utf-8"))
+        return _CachedKey(key, public_key, expires)
+
+    def _get(self, key_version_name: str) -> _CachedKey:
+        cached = self._keys.get(key_version_name)
+        if cached is None or cached.expires <= time.monotonic():
+            with self._lock:
+                cached = self._keys.get(key_version_name)
+                if cached is None or cached.expires <= time.monotonic():
+                    cached = self._fetch(key_version_name)
+                    self._keys[key_version_name] = cached
+        return cached
+
+    def refresh(self, key_version_name: Optional[str] = None) -> None:
+        """Drops the cached public key of a key version, or of all of them."""
+        with self._lock:
+            if key_version_name is None:
+                self._keys.clear()
+            else:
+                self._keys.pop(key_version_name, None)
+
+    def get_public_key_jwk(self, key_version_name: str) -> str:
+        """Returns the public key in JWK format, as in get_public_key_jwk.py."""
+        cached = self._get(key_version_name)
+        if cached.public_key is None:
+            raise ValueError(f"{key_version_name} is not enabled.")
+        jwk_key = jwk.JWK.from_pem(cached.public_key.pem.encode())
+        return jwk_key.export(private_key=False)
+
+    def verify(self, key_version_name: str, message: bytes, signature: bytes) -> bool:
+        """Verifies the signature of a message."""
+        return self.verify_batch(key_version_name, [(message, signature)])[0]
+
+    def verify_batch(
+        self, key_version_name: str, pairs: Iterable[Tuple[bytes, bytes]]
+    ) -> List[bool]:
+        """Verifies (message, signature) pairs signed by a key version.
+
+        Args:
+            key_version_name: The name of the key version, e.g. the result of
+                `client.crypto_key_version_path(...)`.
+            pairs: The messages and their signatures.
+
+        Returns:
+            Whether each signature is valid, in the order of the pairs.
+        """
+        pairs = list(pairs)
+        cached = self._get(key_version_name)
+        if cached.key is None:
+            return [False] * len(pairs)
+        check = _signature_checker(cached.key, cached.public_key.algorithm.name)
+
+        def verify_chunk(chunk: List[Tuple[bytes, bytes]]) -> List[bool]:
+            return [check(message, signature) for message, signature in chunk]
+
+        chunks = [pairs[i : i + CHUNK_SIZE] for i in range(0, len(pairs), CHUNK_SIZE)]
+        if len(chunks) <= 1:
+            return [result for chunk in chunks for result in verify_chunk(chunk)]
+        with futures.ThreadPoolExecutor(self._max_workers) as executor:
+            return [
+                result
+                for results in executor.map(verify_chunk, chunks)
+                for result in results
+            ]
+
+
+def _signature_checker(key, algorithm: str):
+    """Returns a function checking signatures made with a KMS algorithm."""
+    hash_name = algorithm.rsplit("_", 1)[-1]
+    if hash_name not in _HASHES:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+    hash_algorithm = _HASHES[hash_name]()
+    if algorithm.startswith("EC_SIGN_"):
+        signature_algorithm = ec.ECDSA(utils.Prehashed(hash_algorithm))
+
+        def verify(signature: bytes, digest: bytes) -> None:
+            key.verify(signature, digest, signature_algorithm)
+
+    elif algorithm.startswith(("RSA_SIGN_PKCS1_", "RSA_SIGN_PSS_")):
+        if algorithm.startswith("RSA_SIGN_PSS_"):
+            pad = padding.PSS(
+                mgf=padding.MGF1(hash_algorithm),
+                salt_length=padding.PSS.DIGEST_LENGTH,
+            )
+        else:
+            pad = padding.PKCS1v15()
+
+        def verify(signature: bytes, digest: bytes) -> None:
+            key.verify(signature, digest, pad, utils.Prehashed(hash_algorithm))
+
+    else:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+
+    def check(message: bytes, signature: bytes) -> bool:
+        digest = hashlib.new(hash_algorithm.name, message).digest()
+        try:
+            verify(signature, digest)
+            return True
+        except InvalidSignature:
+            return False
+
+    return check
+
+
+class StubKmsClient:
+    """Serves the public keys of local private keys, counting requests."""
+
+    def __init__(self) -> None:
+        self.keys: Dict[str, kms.PublicKey] = {}
+        self.requests = 0
+
+    def add_key(self, name: str, private_key, algorithm: str) -> None:
+        pem = (
+            private_key.public_key()
+            .public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+            .decode("utf-8")
+        )
+        self.keys[name] = kms.PublicKey(
+            name=name,
+            pem=pem,
+            pem_crc32c=crc32c(pem.encode("utf-8")),
+            algorithm=algorithm,
+        )
+
+    def get_public_key(self, request: Dict) -> kms.PublicKey:
+        self.requests += 1
+        if request["name"] not in self.keys:
+            raise exceptions.FailedPrecondition(f"{request['name']} is not enabled.")
+        return self.keys[request["name"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--signatures", type=int, default=2000)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    client = StubKmsClient()
+    signers = {
+        "EC_SIGN_P256_SHA256": (
+            ec.generate_private_key(ec.SECP256R1()),
+            lambda key, digest: key.sign(
+                digest, ec.ECDSA(utils.Prehashed(hashes.SHA256()))
+            ),
+        ),
+        "RSA_SIGN_PKCS1_2048_SHA256": (
+            rsa.generate_private_key(public_exponent=65537, key_size=2048),
+            lambda key, digest: key.sign(
+                digest, padding.PKCS1v15(), utils.Prehashed(hashes.SHA256())
+            ),
+        ),
+    }
+    for algorithm, (private_key, sign) in signers.items():
+        client.add_key(algorithm, private_key, algorithm)
+        messages = [f"message {i}".encode("utf-8") for i in range(args.signatures)]
+        pairs = [
+            (message, sign(private_key, hashlib.sha256(message).digest()))
+            for message in messages
+        ]
+
+        for workers in (1, args.workers):
+            verifier = PublicKeyVerifier(client, max_workers=workers)
+            start = time.perf_counter()
+            results = verifier.verify_batch(algorithm, pairs)
+            elapsed = time.perf_counter() - start
+            assert all(results)
+            print(
+                f"{algorithm}, {workers or 'default'} worker(s): "
+                f"{len(pairs) / elapsed:.0f} verifications/s"
+            )
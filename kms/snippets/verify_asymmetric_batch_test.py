@@ -0,0 +1,121 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+
+import hashlib
+import json
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import utils
+import pytest
+
+from verify_asymmetric_batch import PublicKeyVerifier, StubKmsClient
+
+EC_KEY = "projects/p/locations/l/keyRings/r/cryptoKeys/ec/cryptoKeyVersions/1"
+RSA_KEY = "projects/p/locations/l/keyRings/r/cryptoKeys/rsa/cryptoKeyVersions/1"
+PSS_KEY = "projects/p/locations/l/keyRings/r/cryptoKeys/pss/cryptoKeyVersions/1"
+
+
+@pytest.fixture(scope="module")
+def ec_key() -> ec.EllipticCurvePrivateKey:
+    return ec.generate_private_key(ec.SECP256R1())
+
+
+@pytest.fixture(scope="module")
+def rsa_key() -> rsa.RSAPrivateKey:
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def client(
+    ec_key: ec.EllipticCurvePrivateKey, rsa_key: rsa.RSAPrivateKey
+) -> StubKmsClient:
+    client = StubKmsClient()
+    client.add_key(EC_KEY, ec_key, "EC_SIGN_P256_SHA256")
+    client.add_key(RSA_KEY, rsa_key, "RSA_SIGN_PKCS1_2048_SHA256")
+    client.add_key(PSS_KEY, rsa_key, "RSA_SIGN_PSS_2048_SHA256")
+    return client
+
+
+def sign_ec(key: ec.EllipticCurvePrivateKey, message: bytes) -> bytes:
+    digest = hashlib.sha256(message).digest()
+    return key.sign(digest, ec.ECDSA(utils.Prehashed(hashes.SHA256())))
+
+
+def test_verify_batch(
+    client: StubKmsClient, ec_key: ec.EllipticCurvePrivateKey
+) -> None:
+    messages = [f"message {i}".encode("utf-8") for i in range(200)]
+    pairs = [(message, sign_ec(ec_key, message)) for message in messages]
+    pairs[3] = (b"tampered", pairs[3][1])
+    verifier = PublicKeyVerifier(client, max_workers=4)
+
+    results = verifier.verify_batch(EC_KEY, pairs)
+    assert results == [i != 3 for i in range(200)]
+    assert verifier.verify(EC_KEY, messages[0], pairs[0][1])
+    # The public key is fetched once for all signatures.
+    assert client.requests == 1
+
+
+def test_verify_rsa(client: StubKmsClient, rsa_key: rsa.RSAPrivateKey) -> None:
+    message = b"my message"
+    pkcs1 = rsa_key.sign(message, padding.PKCS1v15(), hashes.SHA256())
+    pss = rsa_key.sign(
+        message,
+        padding.PSS(
+            mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.DIGEST_LENGTH
+        ),
+        hashes.SHA256(),
+    )
+    verifier = PublicKeyVerifier(client)
+
+    assert verifier.verify_batch(RSA_KEY, [(message, pkcs1), (message, pss)]) == [
+        True,
+        False,
+    ]
+    assert verifier.verify_batch(PSS_KEY, [(message, pss), (message, pkcs1)]) == [
+        True,
+        False,
+    ]
+
+
+def test_cache_expiry_and_revocation(
+    client: StubKmsClient, ec_key: ec.EllipticCurvePrivateKey
+) -> None:
+    message = b"my message"
+    signature = sign_ec(ec_key, message)
+    verifier = PublicKeyVerifier(client, ttl=0)
+
+    assert verifier.verify(EC_KEY, message, signature)
+    assert verifier.verify(EC_KEY, message, signature)
+    assert client.requests == 2
+
+    # Once disabled, the key version verifies nothing.
+    verifier = PublicKeyVerifier(client)
+    assert verifier.verify(EC_KEY, message, signature)
+    del client.keys[EC_KEY]
+    verifier.refresh(EC_KEY)
+    assert not verifier.verify(EC_KEY, message, signature)
+    with pytest.raises(ValueError):
+        verifier.get_public_key_jwk(EC_KEY)
+
+
+def test_get_public_key_jwk(client: StubKmsClient) -> None:
+    verifier = PublicKeyVerifier(client)
+
+    public_key = json.loads(verifier.get_public_key_jwk(EC_KEY))
+    assert public_key["kty"] == "EC"
+    assert public_key["crv"] == "P-256"
+    assert "d" not in public_key
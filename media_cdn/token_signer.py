@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+#
+# Copyright 2024 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Reusable Media CDN dual-token signer for minting tokens in bulk.
+
+`dualtoken.sign_token` decodes the key and builds the signing objects for every
+token. `TokenSigner` does it once, signs batches of paths that share the other
+token fields, and produces the same tokens as `sign_token`. `verify_token`
+validates tokens locally, for example in tests or at an origin.
+
+Measure tokens per second for each algorithm with:
+
+    python token_signer.py --tokens 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+from concurrent import futures
+import datetime
+import hashlib
+import hmac
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import cryptography.exceptions
+import cryptography.hazmat.primitives.asymmetric.ed25519 as ed25519
+
+from dualtoken import base64_encoder
+
+_EPOCH = datetime.datetime.fromtimestamp(0, tz=datetime.timezone.utc)
+_DIGESTS = {"sha1": hashlib.sha1, "sha256": hashlib.sha256}
+# Ed25519 batches at least this large are signed in worker processes, when
+# the signer has any.
+PROCESS_POOL_MIN_BATCH = 1024
+
+
+def _epoch_seconds(value: datetime.datetime) -> int:
+    return int((value.astimezone(tz=datetime.timezone.utc) - _EPOCH).total_seconds())
+
+
+def _path_field(
+    url_prefix: str = None, full_path: str = None, path_globs: str = None
+) -> Tuple[str, str]:
+    """Returns the token and signed values of the path field, as in sign_token."""
+    if full_path:
+        return "FullPath", f"FullPath={full_path}"
+    if path_globs:
+        field = f"PathGlobs={path_globs.strip()}"
+        return field, field
+    if url_prefix:
+        field = "URLPrefix=" + base64_encoder(url_prefix.encode("utf-8"))
+        return field, field
+    raise ValueError(
+        "User Input Missing: One of `url_prefix`, `full_path` or `path_globs` must be specified"
+    )
+
+
+# The private key of a worker process.
+_worker_key: Optional[ed25519.Ed25519PrivateKey] = None
+
+
+def _init_worker(private_bytes: bytes) -> None:
+    global _worker_key
+    _worker_key = ed25519.Ed25519PrivateKey.from_private_bytes(private_bytes)
+
+
+def _sign_in_worker(messages: List[bytes]) -> List[bytes]:
+    return [_worker_key.sign(message) for message in messages]
+
+
+class TokenSigner:
+    """Signs Media CDN dual tokens with a key decoded once.
+
+    Args:
+        base64_key: Secret key as a base64 encoded string.
+        signature_algorithm: Algorithm can be either `SHA1` or `SHA256` or `Ed25519`.
+        processes: The number of worker processes signing large Ed25519
+            batches, or None to sign every batch in this process.
+    """
+
+    def __init__(
+        self,
+        base64_key: bytes,
+        signature_algorithm: str,
+        processes: Optional[int] = None,
+    ) -> None:
+        self._key = base64.urlsafe_b64decode(base64_key)
+        self.algorithm = signature_algorithm.lower()
+        self._processes = processes
+        self._executor: Optional[futures.ProcessPoolExecutor] = None
+        if self.algorithm == "ed25519":
+            self._private_key = ed25519.Ed25519PrivateKey.from_private_bytes(self._key)
+            self.public_key = self._private_key.public_key()
+        elif self.algorithm in _DIGESTS:
+            # Copies of this object skip hashing the key for every token.
+            self._hmac = hmac.new(self._key, digestmod=_DIGESTS[self.algorithm])
+        else:
+            raise ValueError(
+                "Input Missing Error: `signature_algorithm` can only be one of `sha1`, `sha256` or `ed25519`"
+            )
+
+    def __enter__(self) -> TokenSigner:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shuts the worker processes down."""
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _signature_field(self, to_sign: bytes) -> str:
+        if self.algorithm == "ed25519":
+            return "Signature=" + base64_encoder(self._private_key.sign(to_sign))
+        mac = self._hmac.copy()
+        mac.update(to_sign)
+        return "hmac=" + mac.hexdigest()
+
+    def _signature_fields(self, messages: List[bytes]) -> List[str]:
+        if (
+            self.algorithm != "ed25519"
+            or not self._processes
+            or len(messages) < PROCESS_POOL_MIN_BATCH
+        ):
+            return [self._signature_field(message) for message in messages]
+
+        if self._executor is None:
+            self._executor = futures.ProcessPoolExecutor(
+                self._processes, initializer=_init_worker, initargs=(self._key,)
+            )
+        size = -(-len(messages) // (self._processes * 4))
+        chunks = [messages[i : i + size] for i in range(0, len(messages), size)]
+        return [
+            "Signature=" + base64_encoder(signature)
+            for signatures in self._executor.map(_sign_in_worker, chunks)
+            for signature in signatures
+        ]
+
+    def sign_batch(
+        self,
+        paths: Iterable[str],
+        path_type: str = "full_path",
+        start_time: datetime.datetime = None,
+        expiration_time: datetime.datetime = None,
+        session_id: str = None,
+        data: str = None,
+        headers: List[Dict[str, str]] = None,
+        ip_ranges: str = None,
+    ) -> List[str]:
+        """Signs a token for each path, with the same other fields.
+
+        Args:
+            paths: The values of the path field of the tokens.
+            path_type: The field the paths are used for, one of `url_prefix`,
+                `full_path` or `path_globs`.
+            start_time, expiration_time, session_id, data, headers, ip_ranges:
+                As for `dualtoken.sign_token`.
+
+        Returns:
+            The tokens, in the order of the paths.
+        """
+        if path_type not in ("url_prefix", "full_path", "path_globs"):
+            raise ValueError(f"Unknown path type: {path_type}")
+
+        # The fields after the path field are shared by all tokens.
+        tokens = []
+        to_sign = []
+        if start_time:
+            field = f"Starts={_epoch_seconds(start_time)}"
+            tokens.append(field)
+            to_sign.append(field)
+        if not expiration_time:
+            expiration_time = datetime.datetime.now() + datetime.timedelta(hours=1)
+        field = f"Expires={_epoch_seconds(expiration_time)}"
+        tokens.append(field)
+        to_sign.append(field)
+        if session_id:
+            field = f"SessionID={session_id}"
+            tokens.append(field)
+            to_sign.append(field)
+        if data:
+            field = f"Data={data}"
+            tokens.append(field)
+            to_sign.append(field)
+        if headers:
+            tokens.append("Headers=" + ",".join(each["name"] for each in headers))
+            to_sign.append(
+                "Headers="
+                + ",".join("%s=%s" % (each["name"], each["value"]) for each in headers)
+            )
+        if ip_ranges:
+            field = f"IPRanges={base64_encoder(ip_ranges.encode('ascii'))}"
+            tokens.append(field)
+            to_sign.append(field)
+        token_suffix = "~" + "~".join(tokens)
+        to_sign_suffix = "~" + "~".join(to_sign)
+
+        token_prefixes = []
+        messages = []
+        for path in paths:
+            token_field, to_sign_field = _path_field(**{path_type: path})
+            token_prefixes.append(token_field + token_suffix + "~")
+            messages.append((to_sign_field + to_sign_suffix).encode("utf-8"))
+        return [
+            prefix + signature
+            for prefix, signature in zip(
+                token_prefixes, self._signature_fields(messages)
+            )
+        ]
+
+    def sign(
+        self,
+        start_time: datetime.datetime = None,
+        expiration_time: datetime.datetime = None,
+        url_prefix: str = None,
+        full_path: str = None,
+        path_globs: str = None,
+        session_id: str = None,
+        data: str = None,
+        headers: List[Dict[str, str]] = None,
+        ip_ranges: str = None,
+    ) -> str:
+        """Signs a token. Takes the arguments of `dualtoken.sign_token`."""
+        if full_path:
+            path, path_type = full_path, "full_path"
+        elif path_globs:
+            path, path_type = path_globs, "path_globs"
+        elif url_prefix:
+            path, path_type = url_prefix, "url_prefix"
+        else:
+            _path_field()
+        return self.sign_batch(
+            [path],
+            path_type,
+            start_time,
+            expiration_time,
+            session_id,
+            data,
+            headers,
+            ip_ranges,
+        )[0]
+
+    def verify(
+        self,
+        token: str,
+        full_path: str = None,
+        headers: Dict[str, str] = None,
+        now: datetime.datetime = None,
+    ) -> bool:
+        """Checks a token signed with this key. See `verify_token`."""
+        if self.algorithm == "ed25519":
+            return _verify(
+                token, _ed25519_checker(self.public_key), full_path, headers, now
+            )
+        return _verify(token, self._hmac_checker, full_path, headers, now)
+
+    def _hmac_checker(self, name: str, signature: str, to_sign: bytes) -> bool:
+        if name != "hmac":
+            return False
+        mac = self._hmac.copy()
+        mac.update(to_sign)
+        return hmac.compare_digest(mac.hexdigest(), signature)
+
+
+def _ed25519_checker(
+    public_key: ed25519.Ed25519PublicKey,
+) -> Callable[[str, str, bytes], bool]:
+    def check(name: str, signature: str, to_sign: bytes) -> bool:
+        if name != "Signature":
+            return False
+        try:
+            public_key.verify(
+                base64.urlsafe_b64decode(signature + "=" * (-len(signature) % 4)),
+                to_sign,
+            )
+            return True
+        except (cryptography.exceptions.InvalidSignature, ValueError):
+            return False
+
+    return check
+
+
+def _verify(
+    token: str,
+    check_signature: Callable[[str, str, bytes], bool],
+    full_path: Optional[str],
+    headers: Optional[Dict[str, str]],
+    now: Optional[datetime.datetime],
+) -> bool:
+    now_seconds = _epoch_seconds(now or datetime.datetime.now(datetime.timezone.utc))
+    fields = token.split("~")
+    to_sign = []
+    expires = None
+    try:
+        for field in fields[:-1]:
+            name, _, value = field.partition("=")
+            if field == "FullPath":
+                if full_path is None:
+                    return False
+                field = f"FullPath={full_path}"
+            elif name == "Headers":
+                if headers is None or any(n not in headers for n in value.split(",")):
+                    return False
+                field = "Headers=" + ",".join(
+                    f"{n}={headers[n]}" for n in value.split(",")
+                )
+            elif name == "Starts" and int(value) > now_seconds:
+                return False
+            elif name == "Expires":
+                expires = int(value)
+            to_sign.append(field)
+    except ValueError:
+        return False
+    if expires is None or expires < now_seconds:
+        return False
+    name, _, signature = fields[-1].partition("=")
+    return check_signature(name, signature, "~".join(to_sign).encode("utf-8"))
+
+
+def verify_token(
+    token: str,
+    base64_key: bytes,
+    signature_algorithm: str,
+    full_path: str = None,
+    headers: Dict[str, str] = None,
+    now: datetime.datetime = None,
+) -> bool:
+    """Checks the signature and validity period of a dual token.
+
+    Whether the requested URL matches the `URLPrefix` or `PathGlobs` of the
+    token is not checked.
+
+    Args:
+        token: The token, as returned by `sign_token`.
+        base64_key: For `SHA1` and `SHA256`, the secret key as a base64 encoded
+            string. For `Ed25519`, the public key as a base64 encoded string.
+        signature_algorithm: Algorithm can be either `SHA1` or `SHA256` or `Ed25519`.
+        full_path: The requested path, for tokens with a `FullPath` field.
+        headers: The requested header values by name, for tokens with a
+            `Headers` field.
+        now: The time of the request. Defaults to the current time.
+
+    Returns:
+        True if the token is valid.
+    """
+    if signature_algorithm.lower() == "ed25519":
+        public_key = ed25519.Ed25519PublicKey.from_public_bytes(
+            base64.urlsafe_b64decode(base64_key)
+        )
+        return _verify(token, _ed25519_checker(public_key), full_path, headers, now)
+    return TokenSigner(base64_key, signature_algorithm).verify(
+        token, full_path, headers, now
+    )
+
+
+if __name__ == "__main__":
+    import dualtoken
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    keys = {
+        "sha1": b"g_SlMILiIWKqsC6Z2L7gy0sReDOqtSrJrE7CXNr5Nl8=",
+        "sha256": b"g_SlMILiIWKqsC6Z2L7gy0sReDOqtSrJrE7CXNr5Nl8=",
+        "ed25519": b"DJUcnLguVFKmVCFnWGubG1MZg7fWAnxacMjKDhVZMGI=",
+    }
+    paths = [f"/videos/{i}/manifest.m3u8" for i in range(args.tokens)]
+    expiration_time = datetime.datetime.now() + datetime.timedelta(hours=1)
+
+    def report(name: str, sign: Callable[[], List[str]]) -> List[str]:
+        start = time.perf_counter()
+        tokens = sign()
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(tokens) / elapsed:.0f} tokens/s")
+        return tokens
+
+    for algorithm, key in keys.items():
+        expected = report(
+            f"{algorithm} sign_token",
+            lambda: [
+                dualtoken.sign_token(
+                    key, algorithm, expiration_time=expiration_time, full_path=path
+                )
+                for path in paths
+            ],
+        )
+        signers = [(f"{algorithm} TokenSigner", TokenSigner(key, algorithm))]
+        if algorithm == "ed25519":
+            signers.append(
+                (
+                    f"{algorithm} TokenSigner, {args.processes} processes",
+                    TokenSigner(key, algorithm, args.processes),
+                )
+            )
+        for name, signer in signers:
+            with signer:
+                tokens = report(
+                    name,
+                    lambda: signer.sign_batch(paths, expiration_time=expiration_time),
+                )
+            assert tokens == expected
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#
+# Copyright 2024 Google, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for token_signer."""
+
+import base64
+import datetime
+
+import cryptography.hazmat.primitives.serialization as serialization
+import pytest
+
+import dualtoken
+import token_signer
+
+
+startTime = datetime.datetime.strptime("2022-09-13T00:00:00Z", "%Y-%m-%dT%H:%M:%S%z")
+expiresTime = datetime.datetime.strptime("2022-09-13T12:00:00Z", "%Y-%m-%dT%H:%M:%S%z")
+requestTime = datetime.datetime.strptime("2022-09-13T06:00:00Z", "%Y-%m-%dT%H:%M:%S%z")
+headers = [
+    {
+        "name": "Foo",
+        "value": "bar",
+    },
+    {
+        "name": "BAZ",
+        "value": "quux",
+    },
+]
+allParams = {
+    "start_time": startTime,
+    "expiration_time": expiresTime,
+    "session_id": "test-id",
+    "data": "test-data",
+    "headers": headers,
+    "ip_ranges": "203.0.113.0/24,2001:db8:4a7f:a732/64",
+}
+keys = {
+    "sha1": b"g_SlMILiIWKqsC6Z2L7gy0sReDOqtSrJrE7CXNr5Nl8=",
+    "sha256": b"g_SlMILiIWKqsC6Z2L7gy0sReDOqtSrJrE7CXNr5Nl8=",
+    "ed25519": b"DJUcnLguVFKmVCFnWGubG1MZg7fWAnxacMjKDhVZMGI=",
+}
+
+
+@pytest.mark.parametrize("algorithm", ["sha1", "SHA256", "Ed25519"])
+@pytest.mark.parametrize(
+    "path", [{"url_prefix": "http://10.20.30.40/"}, {"full_path": "/a.m3u8"}]
+)
+@pytest.mark.parametrize("params", [{"expiration_time": expiresTime}, allParams])
+def test_sign_matches_sign_token(algorithm: str, path: dict, params: dict) -> None:
+    key = keys[algorithm.lower()]
+    signer = token_signer.TokenSigner(key, algorithm)
+
+    assert signer.sign(**path, **params) == dualtoken.sign_token(
+        key, algorithm, **path, **params
+    )
+
+
+def test_sign_batch() -> None:
+    paths = [f"/videos/{i}/*" for i in range(10)]
+    with token_signer.TokenSigner(keys["ed25519"], "ed25519") as signer:
+        tokens = signer.sign_batch(paths, "path_globs", **allParams)
+
+    assert tokens == [
+        dualtoken.sign_token(keys["ed25519"], "ed25519", path_globs=path, **allParams)
+        for path in paths
+    ]
+
+
+def test_sign_batch_in_processes(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(token_signer, "PROCESS_POOL_MIN_BATCH", 4)
+    paths = [f"/videos/{i}.mp4" for i in range(10)]
+    with token_signer.TokenSigner(keys["ed25519"], "ed25519", processes=2) as signer:
+        tokens = signer.sign_batch(paths, expiration_time=expiresTime)
+
+    assert tokens == [
+        dualtoken.sign_token(
+            keys["ed25519"], "ed25519", full_path=path, expiration_time=expiresTime
+        )
+        for path in paths
+    ]
+
+
+@pytest.mark.parametrize("algorithm", ["sha1", "sha256", "ed25519"])
+def test_verify_token(algorithm: str) -> None:
+    signer = token_signer.TokenSigner(keys[algorithm], algorithm)
+    token = signer.sign(full_path="/a.m3u8", **allParams)
+    if algorithm == "ed25519":
+        key = base64.urlsafe_b64encode(
+            signer.public_key.public_bytes(
+                serialization.Encoding.Raw, serialization.PublicFormat.Raw
+            )
+        )
+    else:
+        key = keys[algorithm]
+    request_headers = {"Foo": "bar", "BAZ": "quux"}
+
+    def verify(token: str, **kwargs: object) -> bool:
+        kwargs = {
+            "full_path": "/a.m3u8",
+            "headers": request_headers,
+            "now": requestTime,
+            **kwargs,
+        }
+        return token_signer.verify_token(token, key, algorithm, **kwargs)
+
+    assert verify(token)
+    assert signer.verify(token, "/a.m3u8", request_headers, requestTime)
+    assert not verify(token, full_path="/b.m3u8")
+    assert not verify(token, headers={"Foo": "bar", "BAZ": "qux"})
+    assert not verify(token, headers={"Foo": "bar"})
+    assert not verify(token, now=startTime - datetime.timedelta(seconds=1))
+    assert not verify(token, now=expiresTime + datetime.timedelta(seconds=1))
+    assert not verify(token.replace("Data=test-data", "Data=other-data"))
+    assert not verify(token.replace("Expires=", "Expires=x"))
@@ -16,6 +16,8 @@ from __future__ import annotations
 
 import datetime
 import os
+import threading
+import time
 from typing import Any
 
 import sqlalchemy
@@ -24,6 +26,13 @@ from sqlalchemy.pool import NullPool
 
 import credentials
 from middleware import logger
+from vote_writer import VoteWriter
+
+CANDIDATES = ("CATS", "DOGS")
+
+# The index page is rendered from an in-process copy of its data for this
+# many seconds, so a burst of page loads costs a single round of queries.
+INDEX_CACHE_TTL = 2.0
 
 # This global variable is declared with a value of `None`, instead of calling
 # `init_connection_engine()` immediately, to simplify testing. In general, it
@@ -31,6 +40,10 @@ from middleware import logger
 # -- there is no need to wait for the first request.
 db = None
 
+# Set VOTE_BATCH_INTERVAL_MS to write concurrent votes in batches, see
+# vote_writer.py.
+vote_writer = None
+
 
 def init_connection_engine() -> sqlalchemy.engine.base.Engine:
     """Initializes a connection pool for a Cloud SQL instance of PostgreSQL.
@@ -155,7 +168,7 @@ def create_tables() -> None:
     """Initializes SQLAlchemy connection and creates database table."""
     # This is called before any request on the main app, ensuring the database has been setup
     logger.info("Creating tables")
-    global db
+    global db, vote_writer
     db = init_connection_engine()
     # Create pet_votes table if it doesn't already exist
     with db.begin() as conn:
@@ -170,14 +183,82 @@ def create_tables() -> None:
                 ");"
             )
         )
+        # Serves the recent votes query without sorting the whole table.
+        conn.execute(
+            sqlalchemy.text(
+                "CREATE INDEX IF NOT EXISTS pet_votes_time_cast_idx "
+                "ON pet_votes (time_cast);"
+            )
+        )
+        # Running totals per candidate, kept up to date by save_vote, so the
+        # index page never has to count the pet_votes table.
+        conn.execute(
+            sqlalchemy.text(
+                "CREATE TABLE IF NOT EXISTS pet_vote_tallies"
+                "( candidate VARCHAR(6) NOT NULL, "
+                "vote_count BIGINT NOT NULL, "
+                "PRIMARY KEY (candidate)"
+                ");"
+            )
+        )
+        # Count any votes cast before the tallies existed. Tallies that are
+        # already present are left untouched.
+        for candidate in CANDIDATES:
+            conn.execute(
+                sqlalchemy.text(
+                    "INSERT INTO pet_vote_tallies (candidate, vote_count) "
+                    "SELECT CAST(:candidate AS VARCHAR(6)), COUNT(vote_id) FROM pet_votes "
+                    "WHERE candidate=:candidate "
+                    "AND NOT EXISTS (SELECT 1 FROM pet_vote_tallies "
+                    "WHERE candidate=:candidate) "
+                    "ON CONFLICT (candidate) DO NOTHING"
+                ),
+                parameters={"candidate": candidate},
+            )
+
+    interval_ms = os.environ.get("VOTE_BATCH_INTERVAL_MS")
+    if interval_ms:
+        vote_writer = VoteWriter(
+            db,
+            sqlalchemy.table(
+                "pet_votes",
+                sqlalchemy.column("time_cast"),
+                sqlalchemy.column("candidate"),
+                sqlalchemy.column("uid"),
+            ),
+            add_to_tally,
+            interval=float(interval_ms) / 1000,
+        )
+
+
+# (engine, time fetched, context) of the last index page data
+_index_cache = None
+_index_cache_lock = threading.Lock()
+
+
+def invalidate_index_cache() -> None:
+    """Makes the next get_index_context call read from the database."""
+    global _index_cache
+    with _index_cache_lock:
+        _index_cache = None
 
 
-def get_index_context() -> dict[str, Any]:
+def get_index_context(max_age: float = INDEX_CACHE_TTL) -> dict[str, Any]:
     """Query PostgreSQL database and transform data for UI.
 
+    Args:
+        max_age: seconds for which previously fetched data may be reused
+
     Returns:
         A dictionary of counts and votes.
     """
+    global _index_cache
+    with _index_cache_lock:
+        cached = _index_cache
+    if cached and cached[0] is db and time.monotonic() - cached[1] < max_age:
+        return dict(cached[2])
+
+    fetched = time.monotonic()
     votes = []
     with db.connect() as conn:
         # Execute the query and fetch all results
@@ -195,18 +276,33 @@ def get_index_context() -> dict[str, Any]:
                     "time_cast": row[1],
                 }
             )
-        stmt = sqlalchemy.text(
-            "SELECT COUNT(vote_id) FROM pet_votes WHERE candidate=:candidate"
+        # Read the running totals instead of counting the pet_votes table
+        tallies = dict(
+            conn.execute(
+                sqlalchemy.text("SELECT candidate, vote_count FROM pet_vote_tallies")
+            ).fetchall()
         )
-        # Count number of votes for cats
-        cats_count = conn.execute(stmt, parameters={"candidate": "CATS"}).scalar()
-        # Count number of votes for dogs
-        dogs_count = conn.execute(stmt, parameters={"candidate": "DOGS"}).scalar()
-    return {
-        "dogs_count": dogs_count,
+    context = {
+        "dogs_count": tallies.get("DOGS", 0),
         "recent_votes": votes,
-        "cats_count": cats_count,
+        "cats_count": tallies.get("CATS", 0),
     }
+    with _index_cache_lock:
+        _index_cache = (db, fetched, context)
+    return dict(context)
+
+
+def add_to_tally(
+    conn: sqlalchemy.engine.base.Connection, candidate: str, count: int = 1
+) -> None:
+    """Adds votes to a candidate's tally in the caller's transaction."""
+    conn.execute(
+        sqlalchemy.text(
+            "UPDATE pet_vote_tallies SET vote_count = vote_count + :count"
+            " WHERE candidate=:candidate"
+        ),
+        parameters={"candidate": candidate, "count": count},
+    )
 
 
 def save_vote(team: str, uid: str, time_cast: datetime.datetime) -> None:
@@ -217,6 +313,13 @@ def save_vote(team: str, uid: str, time_cast: datetime.datetime) -> None:
         uid: the user id
         time_cast: the time of the vote
     """
+    if vote_writer is not None:
+        # Returns once the batch holding this vote has been committed.
+        vote_writer.write({"time_cast": time_cast, "candidate": team, "uid": uid})
+        invalidate_index_cache()
+        logger.info("Vote for %s saved.", team)
+        return
+
     # Preparing a statement before hand can help protect against injections.
     stmt = sqlalchemy.text(
         "INSERT INTO pet_votes (time_cast, candidate, uid)"
@@ -224,16 +327,22 @@ def save_vote(team: str, uid: str, time_cast: datetime.datetime) -> None:
     )
 
     # Using a with statement ensures that the connection is always released
-    # back into the pool at the end of statement (even if an error occurs)
+    # back into the pool at the end of statement (even if an error occurs).
+    # The vote and its tally are committed in the same transaction.
     with db.begin() as conn:
         conn.execute(
             stmt, parameters={"time_cast": time_cast, "candidate": team, "uid": uid}
         )
+        add_to_tally(conn, team)
+    # Show the new vote on the next page load served by this instance.
+    invalidate_index_cache()
     logger.info("Vote for %s saved.", team)
 
 
 def shutdown() -> None:
     """Clean up sessions and database connections."""
+    if vote_writer:
+        vote_writer.close()
     # Find all Sessions in memory and close them.
     close_all_sessions()
     logger.info("All sessions closed.")
@@ -13,15 +13,17 @@
 # limitations under the License.
 
 import datetime
+import os
 import signal
 import sys
 from types import FrameType
 
-from flask import Flask, render_template, request, Response
+from flask import Flask, jsonify, render_template, request, Response
 
 import database
 import middleware
 from middleware import jwt_authenticated, logger
+from vote_writer import pool_status
 
 app = Flask(__name__, static_folder="static", static_url_path="")
 
@@ -59,6 +61,22 @@ def index() -> str:
     return render_template("index.html", **context)
 
 
+@app.route("/metrics", methods=["GET"])
+@jwt_authenticated
+def metrics() -> Response:
+    """Reports connection pool usage and vote batching statistics.
+
+    Only served to signed-in users, and when the ENABLE_METRICS environment
+    variable is set.
+    """
+    if not os.environ.get("ENABLE_METRICS"):
+        return Response(status=404)
+    return jsonify(
+        pool=pool_status(database.db),
+        vote_writer=database.vote_writer.stats() if database.vote_writer else None,
+    )
+
+
 @app.route("/", methods=["POST"])
 @jwt_authenticated
 def save_vote() -> Response:
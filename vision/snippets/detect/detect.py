@@ -28,12 +28,52 @@ python detect.py ocr-uri gs://python-docs-samples-tests/HodgeConj.pdf \
 gs://BUCKET_NAME/PREFIX/
 python detect.py object-localization ./resources/puppies.jpg
 python detect.py object-localization-uri gs://...
+python detect.py batch ./resources labels,faces,text --output results.jsonl
+python detect.py batch gs://your-bucket/images/ labels,logos
 
 For more information, the documentation at
 https://cloud.google.com/vision/docs.
 """
 
 import argparse
+import concurrent.futures
+import json
+import os
+import sys
+
+# Maps the feature names accepted by the `batch` command to the Vision API
+# feature type names.
+BATCH_FEATURES = {
+    "faces": "FACE_DETECTION",
+    "labels": "LABEL_DETECTION",
+    "landmarks": "LANDMARK_DETECTION",
+    "logos": "LOGO_DETECTION",
+    "text": "TEXT_DETECTION",
+    "document": "DOCUMENT_TEXT_DETECTION",
+    "safe-search": "SAFE_SEARCH_DETECTION",
+    "properties": "IMAGE_PROPERTIES",
+    "web": "WEB_DETECTION",
+    "crophints": "CROP_HINTS",
+    "object-localization": "OBJECT_LOCALIZATION",
+}
+
+# Limits of a single `batch_annotate_images` call. Inline image content is
+# base64 encoded in the request, so the raw byte budget is kept well below
+# the API's request size limit.
+MAX_IMAGES_PER_REQUEST = 16
+MAX_CONTENT_BYTES_PER_REQUEST = 7 * 1024 * 1024
+
+IMAGE_EXTENSIONS = (
+    ".bmp",
+    ".gif",
+    ".ico",
+    ".jpeg",
+    ".jpg",
+    ".png",
+    ".tif",
+    ".tiff",
+    ".webp",
+)
 
 
 # [START vision_face_detection]
@@ -1036,6 +1076,156 @@ def localize_objects_uri(uri):
 # [END vision_localize_objects_gcs]
 
 
+def list_batch_images(source):
+    """Lists the images found in a local directory or under a GCS prefix.
+
+    Args:
+    source: A local directory or a `gs://bucket/prefix` URI.
+
+    Returns:
+    A sorted list of local file paths or `gs://` URIs.
+    """
+    if source.startswith("gs://"):
+        from google.cloud import storage
+
+        bucket_name, _, prefix = source[len("gs://") :].partition("/")
+        blobs = storage.Client().list_blobs(bucket_name, prefix=prefix)
+        return sorted(
+            f"gs://{bucket_name}/{blob.name}"
+            for blob in blobs
+            if blob.name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+
+    return sorted(
+        os.path.join(source, name)
+        for name in os.listdir(source)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+        and os.path.isfile(os.path.join(source, name))
+    )
+
+
+def _batch_chunks(images):
+    """Groups images into chunks that fit in one batch request.
+
+    Local files are read lazily, so only the chunks currently in flight are
+    held in memory.
+
+    Args:
+    images: An iterable of local file paths or `gs://` URIs.
+
+    Yields:
+    Lists of `(name, vision.Image)` tuples.
+    """
+    from google.cloud import vision
+
+    chunk = []
+    chunk_bytes = 0
+    for name in images:
+        if name.startswith("gs://"):
+            image = vision.Image(source=vision.ImageSource(image_uri=name))
+            size = 0
+        else:
+            with open(name, "rb") as image_file:
+                content = image_file.read()
+            image = vision.Image(content=content)
+            size = len(content)
+
+        if chunk and (
+            len(chunk) >= MAX_IMAGES_PER_REQUEST
+            or chunk_bytes + size > MAX_CONTENT_BYTES_PER_REQUEST
+        ):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+
+        chunk.append((name, image))
+        chunk_bytes += size
+
+    if chunk:
+        yield chunk
+
+
+def batch_annotate(images, features, out=sys.stdout, max_workers=4):
+    """Annotates many images with many features using batched requests.
+
+    Images are packed into `batch_annotate_images` requests up to the API
+    limits, every requested feature is applied to every image, and the
+    requests run concurrently. Each result is written to `out` as one JSON
+    line as soon as its request completes, so results are not necessarily
+    in input order.
+
+    Args:
+    images: An iterable of local file paths or `gs://` URIs.
+    features: Names of features to run, keys of `BATCH_FEATURES`.
+    out: A text file object the JSONL results are written to.
+    max_workers: The maximum number of requests in flight.
+
+    Returns:
+    The number of images annotated.
+    """
+    from google.cloud import vision
+
+    client = vision.ImageAnnotatorClient()
+    vision_features = [
+        vision.Feature(type_=vision.Feature.Type[BATCH_FEATURES[feature]])
+        for feature in features
+    ]
+
+    def annotate(chunk):
+        requests = [
+            vision.AnnotateImageRequest(image=image, features=vision_features)
+            for _, image in chunk
+        ]
+        response = client.batch_annotate_images(requests=requests)
+        return [name for name, _ in chunk], response.responses
+
+    def write(future):
+        names, responses = future.result()
+        for name, response in zip(names, responses):
+            record = {
+                "image": name,
+                "response": json.loads(vision.AnnotateImageResponse.to_json(response)),
+            }
+            out.write(json.dumps(record) + "\n")
+        return len(names)
+
+    count = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for chunk in _batch_chunks(images):
+            # Bound the number of chunks held in memory to the worker count.
+            if len(pending) >= max_workers:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                count += sum(write(future) for future in done)
+            pending.add(executor.submit(annotate, chunk))
+
+        for future in concurrent.futures.as_completed(pending):
+            count += write(future)
+
+    return count
+
+
+def run_batch(args):
+    features = [feature.strip() for feature in args.features.split(",") if feature]
+    unknown = [feature for feature in features if feature not in BATCH_FEATURES]
+    if unknown:
+        raise ValueError(
+            "Unknown features: {}. Choose from: {}".format(
+                ",".join(unknown), ",".join(sorted(BATCH_FEATURES))
+            )
+        )
+
+    images = list_batch_images(args.source)
+    if args.output:
+        with open(args.output, "w") as out:
+            count = batch_annotate(images, features, out, args.max_workers)
+    else:
+        count = batch_annotate(images, features, sys.stdout, args.max_workers)
+    print(f"Annotated {count} images.", file=sys.stderr)
+
+
 def run_local(args):
     if args.command == "faces":
         detect_faces(args.path)
@@ -1209,9 +1399,26 @@ if __name__ == "__main__":
     )
     object_localization_uri_parser.add_argument("uri")
 
+    batch_parser = subparsers.add_parser("batch", help=batch_annotate.__doc__)
+    batch_parser.add_argument(
+        "source", help="Local directory or gs://bucket/prefix of images."
+    )
+    batch_parser.add_argument(
+        "features",
+        help="Comma separated features: {}".format(",".join(sorted(BATCH_FEATURES))),
+    )
+    batch_parser.add_argument(
+        "--output", help="JSONL output file, defaults to stdout.", default=None
+    )
+    batch_parser.add_argument(
+        "--max-workers", type=int, default=4, help="Concurrent requests."
+    )
+
     args = parser.parse_args()
 
-    if "uri" in args.command:
+    if args.command == "batch":
+        run_batch(args)
+    elif "uri" in args.command:
         run_uri(args)
     else:
         run_local(args)
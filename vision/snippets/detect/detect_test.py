@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import os
 import re
 import uuid
@@ -269,3 +270,18 @@ def test_localize_objects_uri(capsys):
 
     out, _ = capsys.readouterr()
     assert "dog" in out.lower()
+
+
+def test_batch_annotate(tmp_path):
+    resources = os.path.join(os.path.dirname(__file__), "resources")
+    images = detect.list_batch_images(resources)
+    output = tmp_path / "results.jsonl"
+    with open(output, "w") as out:
+        count = detect.batch_annotate(images, ["labels", "faces"], out)
+    assert count == len(images)
+
+    with open(output) as results:
+        records = [json.loads(line) for line in results]
+    assert sorted(record["image"] for record in records) == images
+    cat = next(r for r in records if r["image"].endswith("wakeupcat.jpg"))
+    assert "labelAnnotations" in cat["response"]
@@ -23,6 +23,8 @@ Example:
 # [START vision_document_text_tutorial_imports]
 import argparse
 from enum import Enum
+import hashlib
+import os
 
 from google.cloud import vision
 from PIL import Image, ImageDraw
@@ -117,20 +119,131 @@ def get_document_bounds(image_file, feature):
 # [END vision_document_text_tutorial_detect_bounds]
 
 
-def render_doc_text(filein, fileout):
+def _detect_document(content, cache_dir=None):
+    """Runs document text detection, optionally through an on-disk cache.
+
+    Cached responses are keyed by the SHA-256 of the image bytes, so
+    rendering the same image again does not make another API call.
+
+    Args:
+        content: the raw image bytes.
+        cache_dir: optional directory in which responses are cached.
+
+    Returns:
+        The `AnnotateImageResponse` for the image.
+    """
+    cache_path = None
+    if cache_dir:
+        digest = hashlib.sha256(content).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{digest}.json")
+        if os.path.isfile(cache_path):
+            with open(cache_path) as cache_file:
+                return vision.AnnotateImageResponse.from_json(
+                    cache_file.read(), ignore_unknown_fields=True
+                )
+
+    client = vision.ImageAnnotatorClient()
+    image = vision.Image(content=content)
+    response = client.document_text_detection(image=image)
+
+    if cache_path and not response.error.message:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so a concurrent reader never
+        # sees a partially written response.
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as cache_file:
+            cache_file.write(vision.AnnotateImageResponse.to_json(response))
+        os.replace(tmp_path, cache_path)
+
+    return response
+
+
+def collect_document_bounds(document, features):
+    """Collects the bounds for several feature types in a single traversal.
+
+    Args:
+        document: a `TextAnnotation` returned by document text detection.
+        features: iterable of feature types to collect.
+
+    Returns:
+        Dict mapping each requested feature type to its list of bounds.
+    """
+    features = set(features)
+    bounds = {feature: [] for feature in features}
+
+    for page in document.pages:
+        if FeatureType.PAGE in features:
+            # Pages carry no bounding box of their own; use their extent.
+            bounds[FeatureType.PAGE].append(
+                vision.BoundingPoly(
+                    vertices=[
+                        {"x": 0, "y": 0},
+                        {"x": page.width, "y": 0},
+                        {"x": page.width, "y": page.height},
+                        {"x": 0, "y": page.height},
+                    ]
+                )
+            )
+        for block in page.blocks:
+            for paragraph in block.paragraphs:
+                for word in paragraph.words:
+                    if FeatureType.SYMBOL in features:
+                        for symbol in word.symbols:
+                            bounds[FeatureType.SYMBOL].append(symbol.bounding_box)
+
+                    if FeatureType.WORD in features:
+                        bounds[FeatureType.WORD].append(word.bounding_box)
+
+                if FeatureType.PARA in features:
+                    bounds[FeatureType.PARA].append(paragraph.bounding_box)
+
+            if FeatureType.BLOCK in features:
+                bounds[FeatureType.BLOCK].append(block.bounding_box)
+
+    return bounds
+
+
+def get_document_bounds_multi(image_file, features, cache_dir=None):
+    """Finds the document bounds for several feature types with one request.
+
+    Args:
+        image_file: path to the image file.
+        features: iterable of feature types to detect.
+        cache_dir: optional directory used to cache API responses.
+
+    Returns:
+        Dict mapping each requested feature type to its list of bounds.
+    """
+    with open(image_file, "rb") as f:
+        content = f.read()
+
+    response = _detect_document(content, cache_dir=cache_dir)
+    if response.error.message:
+        raise Exception(
+            "{}\nFor more info on error messages, check: "
+            "https://cloud.google.com/apis/design/errors".format(response.error.message)
+        )
+
+    return collect_document_bounds(response.full_text_annotation, features)
+
+
+def render_doc_text(filein, fileout, cache_dir=None):
     """Outlines document features (blocks, paragraphs and words) given an image.
 
     Args:
         filein: path to the input image.
         fileout: path to the output image.
+        cache_dir: optional directory used to cache API responses.
     """
     image = Image.open(filein)
-    bounds = get_document_bounds(filein, FeatureType.BLOCK)
-    draw_boxes(image, bounds, "blue")
-    bounds = get_document_bounds(filein, FeatureType.PARA)
-    draw_boxes(image, bounds, "red")
-    bounds = get_document_bounds(filein, FeatureType.WORD)
-    draw_boxes(image, bounds, "yellow")
+    bounds = get_document_bounds_multi(
+        filein,
+        [FeatureType.BLOCK, FeatureType.PARA, FeatureType.WORD],
+        cache_dir=cache_dir,
+    )
+    draw_boxes(image, bounds[FeatureType.BLOCK], "blue")
+    draw_boxes(image, bounds[FeatureType.PARA], "red")
+    draw_boxes(image, bounds[FeatureType.WORD], "yellow")
 
     if fileout != 0:
         image.save(fileout)
@@ -143,8 +256,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("detect_file", help="The image for text detection.")
     parser.add_argument("-out_file", help="Optional output file", default=0)
+    parser.add_argument(
+        "-cache_dir", help="Optional directory for cached API responses", default=None
+    )
     args = parser.parse_args()
 
-    render_doc_text(args.detect_file, args.out_file)
+    render_doc_text(args.detect_file, args.out_file, cache_dir=args.cache_dir)
     # [END vision_document_text_tutorial_run_application]
 # [END vision_document_text_tutorial]
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import os
+from unittest import mock
 
 import doctext
 
@@ -21,3 +22,28 @@ def test_text() -> None:
     """Checks the output image for drawing the crop hint is created."""
     doctext.render_doc_text("resources/text_menu.jpg", "output-text.jpg")
     assert os.path.isfile("output-text.jpg")
+
+
+def test_text_cached(tmp_path) -> None:
+    """Checks that a second render is served from the response cache."""
+    cache_dir = str(tmp_path / "cache")
+    out_file = str(tmp_path / "output-text-cached.jpg")
+    doctext.render_doc_text("resources/text_menu.jpg", out_file, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    os.remove(out_file)
+    with mock.patch.object(doctext.vision, "ImageAnnotatorClient") as client:
+        doctext.render_doc_text(
+            "resources/text_menu.jpg", out_file, cache_dir=cache_dir
+        )
+        client.assert_not_called()
+    assert os.path.isfile(out_file)
+
+
+def test_get_document_bounds_multi() -> None:
+    """Checks one request returns the same bounds as per-feature requests."""
+    features = [doctext.FeatureType.BLOCK, doctext.FeatureType.WORD]
+    bounds = doctext.get_document_bounds_multi("resources/text_menu.jpg", features)
+    for feature in features:
+        expected = doctext.get_document_bounds("resources/text_menu.jpg", feature)
+        assert bounds[feature] == expected
@@ -0,0 +1,217 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Content-addressed cache for Vision API annotation responses.
+
+Responses are keyed by the SHA-256 of the image bytes together with the
+requested features and request parameters, so identical images submitted
+again are answered locally. Entries live in one or more stores, typically
+an in-memory LRU in front of a SQLite file, and expire after a TTL.
+Concurrent requests for the same key are coalesced into a single call.
+"""
+
+import collections
+from concurrent import futures
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def make_key(content, features, params=None):
+    """Builds a cache key for an annotation request.
+
+    Args:
+        content: the raw image bytes.
+        features: iterable of feature names requested for the image.
+        params: optional dict of request parameters that affect the result.
+
+    Returns:
+        A hex digest identifying the request.
+    """
+    digest = hashlib.sha256(content)
+    digest.update(
+        json.dumps(
+            {"features": sorted(features), "params": params or {}},
+            sort_keys=True,
+            default=str,
+        ).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+class LRUStore:
+    """In-memory store that evicts the least recently used entries."""
+
+    def __init__(self, max_entries=1024):
+        self._max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns `(value, expires_at)` for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteStore:
+    """On-disk store backed by a single SQLite file."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS annotations ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        """Returns `(value, expires_at)` for `key`, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM annotations WHERE key = ?", (key,)
+            ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def set(self, key, value, expires_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM annotations WHERE key = ?", (key,))
+
+    def purge_expired(self, now=None):
+        """Deletes every expired entry and returns how many were removed."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM annotations WHERE expires_at <= ?",
+                (time.time() if now is None else now,),
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class AnnotationCache:
+    """Tiered annotation cache with TTL eviction and request coalescing.
+
+    Stores are consulted in order; a hit in a later store is copied into
+    the earlier ones. Values must be bytes when a `SQLiteStore` is used, so
+    callers cache serialized responses.
+
+    Args:
+        stores: list of stores, fastest first. Defaults to one `LRUStore`.
+        ttl: seconds an entry stays valid.
+        clock: function returning the current time, for tests.
+    """
+
+    def __init__(self, stores=None, ttl=24 * 60 * 60, clock=time.time):
+        self.stores = stores if stores is not None else [LRUStore()]
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    @classmethod
+    def with_sqlite(cls, path, max_entries=1024, ttl=24 * 60 * 60):
+        """Creates a cache with an in-memory LRU in front of a SQLite file."""
+        return cls([LRUStore(max_entries), SQLiteStore(path)], ttl=ttl)
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        now = self._clock()
+        for index, store in enumerate(self.stores):
+            entry = store.get(key)
+            if entry is None:
+                continue
+            value, expires_at = entry
+            if expires_at <= now:
+                store.delete(key)
+                continue
+            for upper in self.stores[:index]:
+                upper.set(key, value, expires_at)
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        expires_at = self._clock() + self.ttl
+        for store in self.stores:
+            store.set(key, value, expires_at)
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for `key`, calling `compute` on a miss.
+
+        If another thread is already computing the same key, this waits for
+        its result instead of issuing a second request. Exceptions raised
+        by `compute` are propagated to every waiter and nothing is cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = futures.Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+            self.put(key, value)
+            future.set_result(value)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return value
+
+    def stats(self):
+        """Returns a dict with the hit and miss counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,111 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import pytest
+
+import annotation_cache
+
+
+def test_make_key_depends_on_features_and_params():
+    key = annotation_cache.make_key(b"image", ["FACE_DETECTION"], {"max_results": 4})
+    assert key == annotation_cache.make_key(
+        b"image", ["FACE_DETECTION"], {"max_results": 4}
+    )
+    assert key != annotation_cache.make_key(
+        b"image", ["FACE_DETECTION"], {"max_results": 5}
+    )
+    assert key != annotation_cache.make_key(b"image", ["LABEL_DETECTION"])
+    assert key != annotation_cache.make_key(
+        b"other", ["FACE_DETECTION"], {"max_results": 4}
+    )
+
+
+def test_ttl_eviction_and_counters():
+    now = [1000.0]
+    cache = annotation_cache.AnnotationCache(ttl=10, clock=lambda: now[0])
+
+    assert cache.get("key") is None
+    cache.put("key", b"value")
+    assert cache.get("key") == b"value"
+
+    now[0] += 11
+    assert cache.get("key") is None
+    assert cache.stats() == {"hits": 1, "misses": 2}
+
+
+def test_lru_evicts_oldest():
+    store = annotation_cache.LRUStore(max_entries=2)
+    cache = annotation_cache.AnnotationCache([store])
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.get("a")
+    cache.put("c", b"3")
+
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"3"
+
+
+def test_sqlite_store_persists(tmp_path):
+    path = str(tmp_path / "annotations.db")
+    cache = annotation_cache.AnnotationCache.with_sqlite(path)
+    cache.put("key", b"value")
+    cache.stores[-1].close()
+
+    reopened = annotation_cache.AnnotationCache.with_sqlite(path)
+    assert reopened.get("key") == b"value"
+    # The disk hit is copied into the in-memory tier.
+    assert reopened.stores[0].get("key")[0] == b"value"
+
+
+def test_get_or_compute_coalesces_in_flight_requests():
+    cache = annotation_cache.AnnotationCache()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return b"value"
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_compute("key", compute))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [b"value"] * 8
+
+
+def test_get_or_compute_does_not_cache_errors():
+    cache = annotation_cache.AnnotationCache()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("key", fail)
+    assert cache.get_or_compute("key", lambda: b"value") == b"value"
@@ -24,6 +24,8 @@ from PIL import Image, ImageDraw
 
 # [END vision_face_detection_tutorial_imports]
 
+import annotation_cache
+
 
 # [START vision_face_detection_tutorial_send_request]
 def detect_face(face_file, max_results=4):
@@ -48,6 +50,41 @@ def detect_face(face_file, max_results=4):
 # [END vision_face_detection_tutorial_send_request]
 
 
+def detect_face_cached(face_file, cache, max_results=4):
+    """Like `detect_face`, but answers repeated images from `cache`.
+
+    Args:
+        face_file: A file-like object containing an image with faces.
+        cache: An `annotation_cache.AnnotationCache`.
+        max_results: The maximum number of faces to return.
+
+    Returns:
+        An array of Face objects with information about the picture.
+    """
+    content = face_file.read()
+    key = annotation_cache.make_key(
+        content, ["FACE_DETECTION"], {"max_results": max_results}
+    )
+
+    def annotate():
+        client = vision.ImageAnnotatorClient()
+        image = vision.Image(content=content)
+        response = client.face_detection(image=image, max_results=max_results)
+        if response.error.message:
+            raise Exception(
+                "{}\nFor more info on error messages, check: "
+                "https://cloud.google.com/apis/design/errors".format(
+                    response.error.message
+                )
+            )
+        return vision.AnnotateImageResponse.serialize(response)
+
+    response = vision.AnnotateImageResponse.deserialize(
+        cache.get_or_compute(key, annotate)
+    )
+    return response.face_annotations
+
+
 # [START vision_face_detection_tutorial_process_response]
 def highlight_faces(image, faces, output_filename):
     """Draws a polygon around the faces, then saves to output_filename.
@@ -82,9 +119,12 @@ def highlight_faces(image, faces, output_filename):
 
 
 # [START vision_face_detection_tutorial_run_application]
-def main(input_filename, output_filename, max_results):
+def main(input_filename, output_filename, max_results, cache=None):
     with open(input_filename, "rb") as image:
-        faces = detect_face(image, max_results)
+        if cache is None:
+            faces = detect_face(image, max_results)
+        else:
+            faces = detect_face_cached(image, cache, max_results)
         print("Found {} face{}".format(len(faces), "" if len(faces) == 1 else "s"))
 
         print(f"Writing to file {output_filename}")
@@ -112,6 +152,15 @@ if __name__ == "__main__":
         type=int,
         help="the max results of face detection.",
     )
+    parser.add_argument(
+        "--cache",
+        dest="cache",
+        default=None,
+        help="optional SQLite file used to cache API responses.",
+    )
     args = parser.parse_args()
 
-    main(args.input_image, args.output, args.max_results)
+    cache = None
+    if args.cache:
+        cache = annotation_cache.AnnotationCache.with_sqlite(args.cache)
+    main(args.input_image, args.output, args.max_results, cache)
@@ -15,6 +15,7 @@ import os
 
 from PIL import Image
 
+import annotation_cache
 from faces import main
 
 RESOURCES = os.path.join(os.path.dirname(__file__), "resources")
@@ -37,3 +38,17 @@ def test_main(tmpdir):
     pixels = im.getdata()
     greens = sum(1 for (r, g, b) in pixels if r == 0 and g == 255 and b == 0)
     assert greens > 10
+
+
+def test_main_cached(tmpdir):
+    out_file = os.path.join(tmpdir.dirname, "face-output-cached.jpg")
+    in_file = os.path.join(RESOURCES, "face-input.jpg")
+    cache = annotation_cache.AnnotationCache.with_sqlite(
+        os.path.join(tmpdir, "annotations.db")
+    )
+
+    main(in_file, out_file, 10, cache)
+    main(in_file, out_file, 10, cache)
+
+    assert cache.stats() == {"hits": 1, "misses": 1}
+    assert os.path.isfile(out_file)
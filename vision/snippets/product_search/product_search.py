@@ -31,6 +31,8 @@ from google.cloud import vision
 # [END vision_product_search_get_similar_products]
 # [END vision_product_search_get_similar_products_gcs]
 
+import annotation_cache
+
 
 # [START vision_product_search_get_similar_products]
 def get_similar_products_file(
@@ -105,6 +107,86 @@ def get_similar_products_file(
 # [END vision_product_search_get_similar_products]
 
 
+def get_similar_products_file_cached(
+    project_id,
+    location,
+    product_set_id,
+    product_category,
+    file_path,
+    filter,
+    max_results,
+    cache,
+):
+    """Search similar products to image, answering repeated images from cache.
+    Args:
+        project_id: Id of the project.
+        location: A compute region name.
+        product_set_id: Id of the product set.
+        product_category: Category of the product.
+        file_path: Local file path of the image to be searched.
+        filter: Condition to be applied on the labels.
+        max_results: The maximum number of results (matches) to return.
+        cache: An annotation_cache.AnnotationCache.
+    """
+    with open(file_path, "rb") as image_file:
+        content = image_file.read()
+
+    product_set_path = vision.ProductSearchClient.product_set_path(
+        project=project_id, location=location, product_set=product_set_id
+    )
+    key = annotation_cache.make_key(
+        content,
+        ["PRODUCT_SEARCH"],
+        {
+            "product_set": product_set_path,
+            "product_categories": [product_category],
+            "filter": filter,
+            "max_results": max_results,
+        },
+    )
+
+    def search():
+        image_annotator_client = vision.ImageAnnotatorClient()
+        product_search_params = vision.ProductSearchParams(
+            product_set=product_set_path,
+            product_categories=[product_category],
+            filter=filter,
+        )
+        image_context = vision.ImageContext(product_search_params=product_search_params)
+        response = image_annotator_client.product_search(
+            vision.Image(content=content),
+            image_context=image_context,
+            max_results=max_results,
+        )
+        if response.error.message:
+            raise Exception(
+                "{}\nFor more info on error messages, check: "
+                "https://cloud.google.com/apis/design/errors".format(
+                    response.error.message
+                )
+            )
+        return vision.AnnotateImageResponse.serialize(response)
+
+    response = vision.AnnotateImageResponse.deserialize(
+        cache.get_or_compute(key, search)
+    )
+
+    print("Product set index time: ")
+    print(response.product_search_results.index_time)
+
+    print("Search results:")
+    for result in response.product_search_results.results:
+        product = result.product
+
+        print(f"Score(Confidence): {result.score}")
+        print(f"Image name: {result.image}")
+
+        print(f"Product name: {product.name}")
+        print("Product display name: {}".format(product.display_name))
+        print(f"Product description: {product.description}\n")
+        print(f"Product labels: {product.product_labels}\n")
+
+
 # [START vision_product_search_get_similar_products_gcs]
 def get_similar_products_uri(
     project_id, location, product_set_id, product_category, image_uri, filter
@@ -177,6 +259,9 @@ if __name__ == "__main__":
     parser.add_argument("--product_category")
     parser.add_argument("--filter", default="")
     parser.add_argument("--max_results", default="")
+    parser.add_argument(
+        "--cache", help="Optional SQLite file used to cache search responses."
+    )
 
     get_similar_products_file_parser = subparsers.add_parser(
         "get_similar_products_file", help=get_similar_products_file.__doc__
@@ -190,7 +275,18 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    if args.command == "get_similar_products_file":
+    if args.command == "get_similar_products_file" and args.cache:
+        get_similar_products_file_cached(
+            args.project_id,
+            args.location,
+            args.product_set_id,
+            args.product_category,
+            args.file_path,
+            args.filter,
+            args.max_results,
+            annotation_cache.AnnotationCache.with_sqlite(args.cache),
+        )
+    elif args.command == "get_similar_products_file":
         get_similar_products_file(
             args.project_id,
             args.location,
@@ -16,7 +16,12 @@ import os
 
 import pytest
 
-from product_search import get_similar_products_file, get_similar_products_uri
+import annotation_cache
+from product_search import (
+    get_similar_products_file,
+    get_similar_products_file_cached,
+    get_similar_products_uri,
+)
 
 
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
@@ -80,3 +85,21 @@ def test_get_similar_products_uri_with_filter(capsys):
     out, _ = capsys.readouterr()
     assert PRODUCT_ID_1 in out
     assert PRODUCT_ID_2 not in out
+
+
+def test_get_similar_products_file_cached(capsys, tmp_path):
+    cache = annotation_cache.AnnotationCache.with_sqlite(str(tmp_path / "cache.db"))
+    for _ in range(2):
+        get_similar_products_file_cached(
+            PROJECT_ID,
+            LOCATION,
+            PRODUCT_SET_ID,
+            PRODUCT_CATEGORY,
+            FILE_PATH_1,
+            "",
+            MAX_RESULTS,
+            cache,
+        )
+    out, _ = capsys.readouterr()
+    assert out.count(PRODUCT_ID_1) >= 2
+    assert cache.stats() == {"hits": 1, "misses": 1}